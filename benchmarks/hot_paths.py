@@ -0,0 +1,276 @@
+"""
+Hot-Path Benchmarks
+
+This script times the main local compute paths on synthetic 64-band
+embedding rasters, so it needs neither Earth Engine nor network access:
+
+- change: ``LocalBackend.calculate_change`` on float32 and int8 rasters
+- composite: rendering a 3-band RGB composite and encoding it as PNG
+- pca: the streaming 64x64 covariance pass and the 3-component projection
+- zonal: zone rasterization plus per-zone changed-area statistics
+- import: ``import alphaearth_viz`` in a fresh interpreter
+
+Each case reports the best wall time over ``--repeat`` runs (at least
+``IMPORT_REPEAT`` interpreters for the import case), throughput in
+Mpixel/s and peak traced memory (``tracemalloc``). Results are compared
+with a stored baseline for the same raster size, and the script exits
+with status 1 if any case is slower than the baseline by more than
+``--tolerance`` and by more than ``MIN_REGRESSION_SECONDS``.
+
+Usage:
+    python benchmarks/hot_paths.py
+    python benchmarks/hot_paths.py --size 2048 --repeat 5
+    python benchmarks/hot_paths.py --save-baseline
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from alphaearth_viz.backends import LocalBackend  # noqa: E402
+from alphaearth_viz.pca import BandCovariance  # noqa: E402
+from alphaearth_viz.quantize import quantize  # noqa: E402
+from alphaearth_viz.raster import Raster  # noqa: E402
+from alphaearth_viz.render import render  # noqa: E402
+from alphaearth_viz.tiles import encode_png  # noqa: E402
+from alphaearth_viz.utils import get_vis_params  # noqa: E402
+from alphaearth_viz.zonal import rasterize_zones, zonal_statistics  # noqa: E402
+
+from import_time import measure as measure_import  # noqa: E402
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# Synthetic scene: roughly 0.1 degree across, like a 10 km analysis window
+BOUNDS = (-122.5, 37.7, -122.4, 37.8)
+BANDS = ["A01", "A16", "A09"]
+
+# Fresh interpreters timed for the import case; a few milliseconds of
+# process start-up noise needs more samples than the compute cases
+IMPORT_REPEAT = 10
+
+# Slowdowns smaller than this are treated as timer noise, whatever the
+# tolerance, so millisecond-scale cases cannot fail on jitter alone
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def synthetic_embeddings(size, seed=0, changed_fraction=0.1):
+    """
+    Build two years of unit-length 64-band embeddings over a square grid.
+
+    Most pixels keep nearly the same embedding; a block covering about
+    ``changed_fraction`` of the scene gets an unrelated one.
+
+    Args:
+        size: Height and width of the rasters in pixels.
+        seed: Random seed. Defaults to 0.
+        changed_fraction: Share of pixels that change. Defaults to 0.1.
+
+    Returns:
+        Tuple of (Raster for 2017, Raster for 2024).
+    """
+    rng = np.random.default_rng(seed)
+    emb1 = rng.standard_normal((size, size, 64), dtype=np.float32)
+    emb2 = emb1 + 0.2 * rng.standard_normal((size, size, 64), dtype=np.float32)
+    side = int(size * changed_fraction ** 0.5)
+    emb2[:side, :side] = rng.standard_normal((side, side, 64), dtype=np.float32)
+    for emb in (emb1, emb2):
+        emb /= np.linalg.norm(emb, axis=-1, keepdims=True)
+    return Raster(emb1, BOUNDS, year=2017), Raster(emb2, BOUNDS, year=2024)
+
+
+def grid_zones(zones_per_side):
+    """
+    Split the synthetic scene into square parcels.
+
+    Args:
+        zones_per_side: Number of parcels along each side.
+
+    Returns:
+        List of polygon rings as (lon, lat) vertices.
+    """
+    west, south, east, north = BOUNDS
+    xs = np.linspace(west, east, zones_per_side + 1)
+    ys = np.linspace(south, north, zones_per_side + 1)
+    return [
+        [(xs[i], ys[j]), (xs[i + 1], ys[j]), (xs[i + 1], ys[j + 1]), (xs[i], ys[j + 1])]
+        for j in range(zones_per_side)
+        for i in range(zones_per_side)
+    ]
+
+
+def time_case(function, repeat):
+    """
+    Time a callable, keeping the best run and the peak traced memory.
+
+    Args:
+        function: Callable taking no arguments.
+        repeat: Number of timed runs.
+
+    Returns:
+        Tuple of (best seconds, peak bytes allocated during one run).
+    """
+    function()  # warm up caches and lazy imports
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def run(size, repeat, zones_per_side):
+    """
+    Run every benchmark case.
+
+    Args:
+        size: Height and width of the synthetic rasters in pixels.
+        repeat: Number of timed runs per case.
+        zones_per_side: Parcels along each side for the zonal case.
+
+    Returns:
+        Dict of case name to {"seconds", "mpixels_per_second", "peak_mb"}.
+    """
+    image1, image2 = synthetic_embeddings(size)
+    codes1, params1 = quantize(image1.data)
+    codes2, params2 = quantize(image2.data)
+    quantized1 = Raster(codes1, BOUNDS, year=2017, quantization=params1)
+    quantized2 = Raster(codes2, BOUNDS, year=2024, quantization=params2)
+
+    backend = LocalBackend()
+    similarity = backend.calculate_change(image1, image2)
+    rings = grid_zones(zones_per_side)
+    vis_params = get_vis_params(BANDS)
+    components = BandCovariance().update(image1).components()
+
+    def zonal():
+        runs = rasterize_zones(rings, similarity.bounds, similarity.shape)
+        return zonal_statistics(similarity, runs, len(rings))
+
+    cases = {
+        "change_float32": lambda: backend.calculate_change(image1, image2),
+        "change_int8": lambda: backend.calculate_change(quantized1, quantized2),
+        "composite_render": lambda: render(image1, vis_params),
+        "composite_png": lambda: encode_png(render(image1, vis_params)),
+        "pca_covariance": lambda: BandCovariance().update(image1),
+        "pca_project_int8": lambda: components.project(quantized1),
+        "zonal_area": zonal,
+    }
+
+    pixels = size * size
+    results = {}
+    for name, function in cases.items():
+        seconds, peak = time_case(function, repeat)
+        results[name] = {
+            "seconds": seconds,
+            "mpixels_per_second": pixels / seconds / 1e6,
+            "peak_mb": peak / 2**20,
+        }
+
+    imported = measure_import(max(repeat, IMPORT_REPEAT))
+    results["import"] = {
+        "seconds": imported["min_seconds"],
+        "mpixels_per_second": None,
+        "peak_mb": None,
+    }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Find cases that got slower than the baseline.
+
+    A case regresses when it is slower than the baseline by more than
+    ``tolerance`` and by more than ``MIN_REGRESSION_SECONDS``.
+
+    Args:
+        results: Output of :func:`run`.
+        baseline: Stored results for the same configuration.
+        tolerance: Allowed slowdown as a fraction, e.g. 0.25 for 25%.
+
+    Returns:
+        List of (case, baseline seconds, current seconds) for regressions.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        allowed = max(reference["seconds"] * tolerance, MIN_REGRESSION_SECONDS)
+        if result["seconds"] > reference["seconds"] + allowed:
+            regressions.append((name, reference["seconds"], result["seconds"]))
+    return regressions
+
+
+def main():
+    """Run the benchmarks, print a table and check for regressions."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=1024, help="raster height and width")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case")
+    parser.add_argument("--zones", type=int, default=32, help="parcels along each side")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store these results as the baseline for this configuration",
+    )
+    args = parser.parse_args()
+
+    key = f"size={args.size},zones={args.zones}"
+    print(f"Synthetic 64-band rasters: {args.size}x{args.size} px, "
+          f"{args.zones ** 2} zones, best of {args.repeat}")
+
+    results = run(args.size, args.repeat, args.zones)
+    print(f"{'case':<18}{'seconds':>10}{'Mpx/s':>10}{'peak MB':>10}")
+    for name, result in results.items():
+        throughput = result["mpixels_per_second"]
+        peak = result["peak_mb"]
+        print(f"{name:<18}{result['seconds']:>10.4f}"
+              f"{'-' if throughput is None else f'{throughput:.1f}':>10}"
+              f"{'-' if peak is None else f'{peak:.1f}':>10}")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            baselines = json.load(fh)
+
+    if args.save_baseline:
+        baselines[key] = results
+        tmp_path = f"{args.baseline}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(baselines, fh, indent=2, sort_keys=True)
+        os.replace(tmp_path, args.baseline)
+        print(f"Baseline saved to {args.baseline} ({key})")
+        return 0
+
+    if key not in baselines:
+        print(f"No baseline for {key}; run with --save-baseline to store one")
+        return 0
+
+    regressions = compare(results, baselines[key], args.tolerance)
+    for name, before, after in regressions:
+        print(f"REGRESSION: {name} {before:.4f}s -> {after:.4f}s "
+              f"({(after / before - 1) * 100:+.0f}%)")
+    if not regressions:
+        print(f"No regressions against baseline ({key}, tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Import-Time Benchmark
+
+This script measures how long ``import alphaearth_viz`` takes in a fresh
+interpreter and checks that the heavy optional dependencies (Earth Engine,
+leafmap) are not imported until a function that needs them is called.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeat 10 --max-seconds 0.2
+
+The script exits with status 1 if a heavy module is imported eagerly or if
+the median import time exceeds ``--max-seconds``.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+# Modules that must not be loaded by a bare ``import alphaearth_viz``
+HEAVY_MODULES = ["ee", "leafmap", "numpy"]
+
+# Measured in a child interpreter so earlier imports cannot hide the cost
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import alphaearth_viz
+elapsed = time.perf_counter() - start
+alphaearth_viz.validate_year(2024)
+alphaearth_viz.format_band_names([1, 16, 9])
+loaded = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{"seconds": elapsed, "loaded": loaded}}))
+"""
+
+
+def measure(repeat=5):
+    """
+    Time ``import alphaearth_viz`` in fresh interpreters.
+
+    Args:
+        repeat: Number of interpreters to start. Defaults to 5.
+
+    Returns:
+        Dict with "median_seconds", "min_seconds" and "loaded" (heavy
+        modules found in ``sys.modules`` after the import).
+    """
+    source = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [os.path.abspath(source), env.get("PYTHONPATH")])
+    )
+
+    timings = []
+    loaded = set()
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(heavy=HEAVY_MODULES)],
+            check=True,
+            capture_output=True,
+            text=True,
+            env=env,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        loaded.update(result["loaded"])
+
+    return {
+        "median_seconds": statistics.median(timings),
+        "min_seconds": min(timings),
+        "loaded": sorted(loaded),
+    }
+
+
+def main():
+    """Run the benchmark and report regressions."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="interpreters to start")
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=None,
+        help="fail if the median import time exceeds this",
+    )
+    args = parser.parse_args()
+
+    result = measure(args.repeat)
+    print(f"import alphaearth_viz: median {result['median_seconds'] * 1000:.1f} ms, "
+          f"min {result['min_seconds'] * 1000:.1f} ms over {args.repeat} runs")
+
+    failed = False
+    if result["loaded"]:
+        print(f"FAIL: imported eagerly: {', '.join(result['loaded'])}")
+        failed = True
+    if args.max_seconds is not None and result["median_seconds"] > args.max_seconds:
+        print(f"FAIL: median import time exceeds {args.max_seconds * 1000:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+AlphaEarth Change Reports for Many Sites
+
+This script demonstrates how to publish change-detection reports for a
+list of locations. Instead of one self-contained ``to_html`` export per
+map, all pages share a single script bundle, so each page is a few
+kilobytes. Running the script again only rebuilds sites whose settings
+changed.
+
+Usage:
+    python batch_reports.py
+
+Open reports/index.html to switch between sites, or reports/<site>.html
+for a single site.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import ee
+
+from alphaearth_viz import export_reports
+
+
+# Configuration - Modify these values for your analysis
+LOCATIONS = {
+    "San Francisco": {"lat": 37.8, "lon": -122.4},
+    "New York City": {"lat": 40.7, "lon": -74.0},
+    "Amazon Rainforest": {"lat": -3.0, "lon": -60.0},
+    "Sahara Desert": {"lat": 25.0, "lon": 10.0},
+    "Tokyo": {"lat": 35.7, "lon": 139.7},
+}
+YEAR1 = 2017
+YEAR2 = 2024
+OUTPUT_DIR = "reports"
+
+
+def main():
+    """Write change-detection reports for every location."""
+
+    # Initialize Earth Engine
+    # Uncomment and configure these lines before running:
+    # ee.Authenticate()
+    # ee.Initialize(project="YOUR_PROJECT_ID")
+
+    print(f"Writing reports for {len(LOCATIONS)} sites ({YEAR1} vs {YEAR2})")
+
+    result = export_reports(
+        LOCATIONS,
+        OUTPUT_DIR,
+        year1=YEAR1,
+        year2=YEAR2,
+        progress=lambda slug: print(f"  wrote {slug}"),
+    )
+
+    print(f"{len(result['written'])} sites written, {len(result['skipped'])} unchanged")
+    print(f"Open {OUTPUT_DIR}/index.html in a web browser to browse the sites.")
+
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -36,4 +36,10 @@ setup(
     packages=find_packages(where="src"),
     python_requires=">=3.8",
     install_requires=requirements,
+    extras_require={
+        # Map layers from a LocalBackend and GeoTIFF export of change maps
+        "local": ["rasterio>=1.3"],
+        # WebP map tiles
+        "webp": ["Pillow>=9.0"],
+    },
 )
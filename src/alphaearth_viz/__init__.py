@@ -8,15 +8,8 @@ The AlphaEarth Foundations Satellite Embedding dataset is produced by
 Google and Google DeepMind.
 """
 
-from .core import (
-    create_globe_map,
-    add_alphaearth_gui,
-    load_embeddings,
-    compare_years,
-    calculate_change,
-    analyze_location,
-    explore_bands,
-)
+import importlib
+from typing import Any, List
 
 from .utils import (
     format_band_names,
@@ -26,6 +19,78 @@ from .utils import (
     get_dataset,
 )
 
+# Public names and the submodules defining them. Submodules are imported on
+# first access, so ``import alphaearth_viz`` does not load Earth Engine,
+# leafmap or NumPy until something that needs them is used.
+_LAZY_IMPORTS = {
+    "create_globe_map": "core",
+    "add_alphaearth_gui": "core",
+    "load_embeddings": "core",
+    "compare_years": "core",
+    "calculate_change": "core",
+    "analyze_location": "core",
+    "explore_bands": "core",
+    "AsyncSession": "aio",
+    "acalculate_change": "aio",
+    "acompare_years": "aio",
+    "aload_embeddings": "aio",
+    "batch_change_analysis": "batch",
+    "EmbeddingBackend": "backends",
+    "EarthEngineBackend": "backends",
+    "LocalBackend": "backends",
+    "SimulatedLatencyBackend": "backends",
+    "get_backend": "backends",
+    "set_backend": "backends",
+    "TileCache": "cache",
+    "ExpressionCache": "expressions",
+    "Manifest": "ingest",
+    "discover_years": "ingest",
+    "ingest_years": "ingest",
+    "KMeans": "clustering",
+    "cluster_region": "clustering",
+    "BandCovariance": "pca",
+    "ComponentCatalog": "pca",
+    "PrincipalComponents": "pca",
+    "SimilarityPyramid": "pyramid",
+    "export_reports": "report",
+    "extract_change_polygons": "polygons",
+    "iter_change_polygons": "polygons",
+    "Raster": "raster",
+    "TileScheduler": "scheduler",
+    "SimilarityIndex": "search",
+    "SharedEmbeddingStore": "shared",
+    "shared_change": "shared",
+    "BandStatistics": "stats",
+    "StatsCatalog": "stats",
+    "stream_change": "streaming",
+    "TileRenderer": "tiles",
+    "TileServer": "tiles",
+    "seed_case_studies": "tiles",
+    "TemporalStack": "temporal",
+    "load_year_stack": "temporal",
+    "temporal_change": "temporal",
+    "TileIndex": "tile_index",
+    "Tracer": "instrumentation",
+    "tracing": "instrumentation",
+    "enable_tracing": "instrumentation",
+    "disable_tracing": "instrumentation",
+    "zonal_change_stats": "zonal",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
+
+
 __version__ = "0.1.0"
 __author__ = "EdGeoInnovations"
 
@@ -42,4 +107,49 @@ __all__ = [
     "get_similarity_vis",
     "validate_year",
     "get_dataset",
+    "batch_change_analysis",
+    "AsyncSession",
+    "aload_embeddings",
+    "acalculate_change",
+    "acompare_years",
+    "stream_change",
+    "load_year_stack",
+    "temporal_change",
+    "TemporalStack",
+    "EmbeddingBackend",
+    "EarthEngineBackend",
+    "LocalBackend",
+    "SimulatedLatencyBackend",
+    "get_backend",
+    "set_backend",
+    "Raster",
+    "BandCovariance",
+    "ComponentCatalog",
+    "PrincipalComponents",
+    "SimilarityPyramid",
+    "export_reports",
+    "extract_change_polygons",
+    "iter_change_polygons",
+    "TileCache",
+    "ExpressionCache",
+    "Manifest",
+    "discover_years",
+    "ingest_years",
+    "KMeans",
+    "cluster_region",
+    "TileScheduler",
+    "SimilarityIndex",
+    "SharedEmbeddingStore",
+    "shared_change",
+    "BandStatistics",
+    "StatsCatalog",
+    "TileIndex",
+    "TileRenderer",
+    "TileServer",
+    "seed_case_studies",
+    "Tracer",
+    "tracing",
+    "enable_tracing",
+    "disable_tracing",
+    "zonal_change_stats",
 ]
@@ -0,0 +1,257 @@
+"""
+Asyncio API for AlphaEarth loads and change computations.
+
+Backend calls block on network or disk I/O and NumPy work. The coroutines
+here run them on a thread pool shared through an :class:`AsyncSession`, with
+a semaphore bounding how many run at once, so an async web service can
+serve many location/year requests concurrently without blocking its event
+loop. A session belongs to the event loop it is first used on; the
+module-level coroutines keep one default session per loop.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import asyncio
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, TypeVar
+
+from .backends import EmbeddingBackend, backend_for, get_backend
+from .raster import Raster
+
+
+T = TypeVar("T")
+
+
+class AsyncSession:
+    """
+    Shared executor and concurrency limit for async AlphaEarth calls.
+
+    Args:
+        backend: Backend used by the session. Defaults to the backend set
+            with ``set_backend`` at call time.
+        max_concurrency: Maximum number of backend calls running at once,
+            which is also the size of the thread pool. Defaults to 8.
+
+    The session is bound to the event loop of its first call; using it from
+    another loop raises RuntimeError.
+
+    Example:
+        >>> async with AsyncSession(LocalBackend("~/alphaearth_cache")) as session:
+        ...     images = await asyncio.gather(
+        ...         *(session.load_embeddings(lon, lat, 2024) for lon, lat in points)
+        ...     )
+    """
+
+    def __init__(
+        self,
+        backend: Optional[EmbeddingBackend] = None,
+        max_concurrency: int = 8,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self._backend = backend
+        self.max_concurrency = max_concurrency
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def backend(self) -> EmbeddingBackend:
+        """Backend used by the session."""
+        return self._backend or get_backend()
+
+    async def __aenter__(self) -> "AsyncSession":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shut down the session's thread pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run a blocking function on the session's pool, within the concurrency limit.
+
+        Args:
+            func: Function to call.
+            *args: Positional arguments for ``func``.
+            **kwargs: Keyword arguments for ``func``.
+
+        Returns:
+            The function's return value.
+
+        Raises:
+            RuntimeError: If the session is already bound to another event loop.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        elif self._loop is not loop:
+            raise RuntimeError(
+                "AsyncSession is bound to another event loop; create one session per loop"
+            )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.max_concurrency, thread_name_prefix="alphaearth-async"
+            )
+
+        async with self._semaphore:
+            return await loop.run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs)
+            )
+
+    async def load_embeddings(self, lon: float, lat: float, year: int) -> Any:
+        """Async counterpart of :func:`alphaearth_viz.load_embeddings`."""
+        return await self.run(self.backend.load, lon, lat, year)
+
+    async def fetch_region(
+        self,
+        bbox: Sequence[float],
+        year: int,
+        scale: Optional[float] = None,
+        bands: Optional[List[str]] = None,
+    ) -> Raster:
+        """Async counterpart of ``backend.fetch_region``."""
+        return await self.run(
+            self.backend.fetch_region, bbox, year, scale=scale, bands=bands
+        )
+
+    async def calculate_change(self, image1: Any, image2: Any) -> Any:
+        """Async counterpart of :func:`alphaearth_viz.calculate_change`."""
+        return await self.run(backend_for(image1).calculate_change, image1, image2)
+
+    async def compare_years(
+        self,
+        lon: float,
+        lat: float,
+        year1: int,
+        year2: int,
+        **kwargs: Any,
+    ) -> Any:
+        """Async counterpart of :func:`alphaearth_viz.compare_years`."""
+        from .core import compare_years
+
+        return await self.run(
+            compare_years, lon, lat, year1, year2, **{"backend": self.backend, **kwargs}
+        )
+
+    async def change_at(self, lon: float, lat: float, year1: int, year2: int) -> Any:
+        """
+        Load both years at a location and compute their change.
+
+        The two loads run concurrently.
+
+        Args:
+            lon: Longitude of the location (degrees).
+            lat: Latitude of the location (degrees).
+            year1: First year for comparison.
+            year2: Second year for comparison.
+
+        Returns:
+            The similarity image (ee.Image or Raster).
+        """
+        image1, image2 = await asyncio.gather(
+            self.load_embeddings(lon, lat, year1),
+            self.load_embeddings(lon, lat, year2),
+        )
+        return await self.calculate_change(image1, image2)
+
+
+# Default session of each running event loop
+_default_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncSession]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_session() -> AsyncSession:
+    """
+    Get the session used by the module-level coroutines.
+
+    Each event loop gets its own default session, so consecutive
+    ``asyncio.run`` calls do not share one.
+
+    Raises:
+        RuntimeError: If called outside a running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    session = _default_sessions.get(loop)
+    if session is None:
+        session = _default_sessions[loop] = AsyncSession()
+    return session
+
+
+async def aload_embeddings(
+    lon: float,
+    lat: float,
+    year: int,
+    session: Optional[AsyncSession] = None,
+) -> Any:
+    """
+    Load AlphaEarth embeddings for a location and year without blocking.
+
+    Args:
+        lon: Longitude of the location (degrees).
+        lat: Latitude of the location (degrees).
+        year: Year to load embeddings for (2017-2024).
+        session: Session to run on. Defaults to a shared module-level session.
+
+    Returns:
+        An ee.Image or Raster, as returned by ``load_embeddings``.
+
+    Example:
+        >>> image = await aload_embeddings(-122.4, 37.8, 2024)
+    """
+    return await (session or get_session()).load_embeddings(lon, lat, year)
+
+
+async def acalculate_change(
+    image1: Any,
+    image2: Any,
+    session: Optional[AsyncSession] = None,
+) -> Any:
+    """
+    Calculate similarity between two embedding images without blocking.
+
+    Args:
+        image1: First ee.Image or Raster with AlphaEarth embeddings.
+        image2: Second ee.Image or Raster with AlphaEarth embeddings.
+        session: Session to run on. Defaults to a shared module-level session.
+
+    Returns:
+        The similarity image, as returned by ``calculate_change``.
+    """
+    return await (session or get_session()).calculate_change(image1, image2)
+
+
+async def acompare_years(
+    lon: float,
+    lat: float,
+    year1: int,
+    year2: int,
+    session: Optional[AsyncSession] = None,
+    **kwargs: Any,
+) -> Any:
+    """
+    Create a map comparing two years without blocking.
+
+    Args:
+        lon: Longitude of the center location (degrees).
+        lat: Latitude of the center location (degrees).
+        year1: First year to compare (2017-2024).
+        year2: Second year to compare (2017-2024).
+        session: Session to run on. Defaults to a shared module-level session.
+        **kwargs: Further arguments for ``compare_years``.
+
+    Returns:
+        A leafmap Map object with both years as layers.
+    """
+    session = session or get_session()
+    return await session.compare_years(lon, lat, year1, year2, **kwargs)
@@ -0,0 +1,899 @@
+"""
+Embedding backends for AlphaEarth data.
+
+A backend knows how to load AlphaEarth embeddings, compute change between
+two years and put results on a map. Two implementations are provided:
+
+- :class:`EarthEngineBackend` builds Earth Engine expressions (the default).
+- :class:`LocalBackend` serves 64-band tiles cached on local disk as
+  memory-mapped chunk files and computes with NumPy.
+
+The functions in ``core`` accept a ``backend`` argument so the same pipeline
+runs online against Earth Engine or offline against cached data.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import math
+import os
+import random
+import tempfile
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .cache import TileCache, cache_key
+from .compute import similarity
+from .expressions import ExpressionCache, get_expression_cache
+from .quantize import Quantization, quantized_similarity
+from .raster import Raster, bbox_window, window_bounds
+from .render import render
+from .store import META_FILE, ChunkStore
+from .tile_index import TileIndex
+from .instrumentation import count, traced
+from .utils import (
+    ALPHAEARTH_DATASET_ID,
+    NUM_BANDS,
+    get_all_band_names,
+    get_available_years,
+    get_dataset,
+    register_years,
+    validate_year,
+)
+
+if TYPE_CHECKING:
+    import ee
+
+
+# Length of one degree of longitude at the equator, in metres
+METERS_PER_DEGREE = 111320.0
+
+# Features sent to Earth Engine per reduceRegions request
+REDUCE_BATCH_SIZE = 1000
+
+# Default chunk side in pixels for region-wide processing
+DEFAULT_CHUNK_PIXELS = 1024
+
+# Largest response of one ee.data.computePixels request, in bytes
+EE_REQUEST_BYTES = 48 * 2**20
+
+
+class NoDataError(ValueError):
+    """Raised when no embeddings cover a requested location or region."""
+
+
+class EmbeddingBackend:
+    """
+    Base class for embedding backends.
+
+    Subclasses implement :meth:`load`, :meth:`load_region`,
+    :meth:`fetch_region`, :meth:`calculate_change` and :meth:`add_layer`.
+    """
+
+    def load(self, lon: float, lat: float, year: int) -> Any:
+        """Load the embedding tile covering a location for a year."""
+        raise NotImplementedError
+
+    def load_region(self, bbox: Sequence[float], year: int) -> Any:
+        """Load embeddings covering a bounding box for a year."""
+        raise NotImplementedError
+
+    def fetch_region(
+        self,
+        bbox: Sequence[float],
+        year: int,
+        scale: Optional[float] = None,
+        bands: Optional[List[str]] = None,
+    ) -> Raster:
+        """Read embeddings covering a bounding box into a local Raster."""
+        raise NotImplementedError
+
+    def calculate_change(self, image1: Any, image2: Any) -> Any:
+        """Compute the clamped dot-product similarity between two images."""
+        raise NotImplementedError
+
+    def add_layer(self, map_object: Any, image: Any, vis_params: Dict[str, Any], name: str) -> None:
+        """Add an image to a leafmap Map as a layer."""
+        raise NotImplementedError
+
+    def project_components(self, image: Any, components: Any) -> Any:
+        """Project an embedding image onto PrincipalComponents, one band each."""
+        raise NotImplementedError
+
+    def export_layer(self, image: Any, vis_params: Dict[str, Any], path: str) -> Dict[str, Any]:
+        """
+        Describe an image as a MapLibre source for a standalone web page.
+
+        Args:
+            image: Image to export.
+            vis_params: Visualization parameters.
+            path: File path, without extension, the backend may write the
+                rendered image to.
+
+        Returns:
+            MapLibre source dict; "url" of an image source is a file path.
+        """
+        raise NotImplementedError
+
+    def available_years(self) -> List[int]:
+        """List the years this backend holds data for, in ascending order."""
+        return get_available_years()
+
+    def chunk_pixels(self, bands: int = NUM_BANDS) -> int:
+        """
+        Chunk side in pixels suited to reading ``bands`` bands at once.
+
+        Used as the default chunk size of region-wide processing such as
+        ``stream_change``.
+
+        Args:
+            bands: Number of bands read per chunk. Defaults to 64.
+
+        Returns:
+            Chunk side in pixels.
+        """
+        return DEFAULT_CHUNK_PIXELS
+
+    def data_version(self, bbox: Sequence[float], years: Sequence[int]) -> str:
+        """
+        Identify the backend and the version of its data covering a region.
+
+        Products derived from the embeddings and kept on disk, such as
+        rendered map tiles, include it in their cache keys so they are
+        rebuilt when the backend or its data changes.
+
+        Args:
+            bbox: Region as (west, south, east, north) in degrees.
+            years: Years the product reads.
+
+        Returns:
+            A string that differs between backends and changes whenever the
+            data of the region does.
+        """
+        return f"{type(self).__module__}.{type(self).__qualname__}"
+
+
+class EarthEngineBackend(EmbeddingBackend):
+    """
+    Backend that builds Earth Engine expressions.
+
+    Args:
+        tile_index: Optional TileIndex used to resolve covering tiles locally
+            instead of filtering the collection by geometry on the server.
+        cache: Optional TileCache serving pixels fetched with
+            :meth:`fetch_region`.
+        expressions: ExpressionCache memoizing the image, selection and
+            similarity expressions. Defaults to the cache shared by all
+            Earth Engine backends.
+
+    Example:
+        >>> backend = EarthEngineBackend(cache=TileCache())
+        >>> image = backend.load(lon=-122.4, lat=37.8, year=2024)
+        >>> pixels = backend.fetch_region((-122.45, 37.75, -122.35, 37.85), 2024)
+    """
+
+    def __init__(
+        self,
+        tile_index: Optional[TileIndex] = None,
+        cache: Optional[TileCache] = None,
+        expressions: Optional[ExpressionCache] = None,
+    ):
+        self.tile_index = tile_index
+        self.cache = cache
+        self.expressions = expressions if expressions is not None else get_expression_cache()
+
+    @traced("ee.load")
+    def load(self, lon: float, lat: float, year: int) -> "ee.Image":
+        validate_year(year)
+
+        tile_ids = None
+        if self.tile_index is not None:
+            tile_ids = self.tile_index.lookup(lon, lat, year)
+            if not tile_ids:
+                raise NoDataError(
+                    f"No AlphaEarth tile covers ({lon}, {lat}) in {year}."
+                )
+
+        return self.expressions.image_at(lon, lat, year, tile_ids)
+
+    @traced("ee.load_region")
+    def load_region(self, bbox: Sequence[float], year: int) -> "ee.Image":
+        validate_year(year)
+
+        tile_ids = None
+        if self.tile_index is not None:
+            tile_ids = self.tile_index.lookup_bbox(bbox, year)
+
+        return self.expressions.mosaic(year, bbox=bbox, tile_ids=tile_ids)
+
+    def fetch_region(
+        self,
+        bbox: Sequence[float],
+        year: int,
+        scale: Optional[float] = 10.0,
+        bands: Optional[List[str]] = None,
+    ) -> Raster:
+        """
+        Download embeddings for a bounding box as a local Raster.
+
+        Pixels are requested with ``ee.data.computePixels`` on a regular
+        longitude/latitude grid and served from the cache when one is set.
+
+        Args:
+            bbox: Bounding box as (west, south, east, north) in degrees.
+            year: Year to fetch.
+            scale: Pixel size in metres at the equator. Defaults to 10.
+            bands: Bands to fetch. Defaults to all 64 embedding bands.
+
+        Returns:
+            A float32 Raster covering the bounding box.
+        """
+        bands = list(bands) if bands is not None else get_all_band_names()
+        scale = scale or 10.0
+
+        def fetch() -> Raster:
+            return self._compute_pixels(bbox, year, scale, bands)
+
+        if self.cache is None:
+            return fetch()
+        return self.cache.get_or_fetch(cache_key(year, bbox, bands, scale), fetch)
+
+    @traced("ee.calculate_change")
+    def calculate_change(self, image1: "ee.Image", image2: "ee.Image") -> "ee.Image":
+        # Dot product of the embedding bands clamped to [0, 1], built once
+        # per pair of images
+        return self.expressions.similarity(image1, image2)
+
+    def chunk_pixels(self, bands: int = NUM_BANDS) -> int:
+        # Largest multiple of 64 whose float32 chunk fits in one
+        # computePixels response, leaving a pixel of rounding slack
+        # (384 px for 64 bands)
+        side = math.isqrt(EE_REQUEST_BYTES // (4 * max(1, bands))) - 1
+        return max(64, min(DEFAULT_CHUNK_PIXELS, side // 64 * 64))
+
+    @traced("ee.available_years")
+    def available_years(self) -> List[int]:
+        """List the years published in the Earth Engine collection."""
+        count("ee.remote_calls")
+        years = get_dataset().aggregate_array("year").distinct().sort().getInfo()
+        return [int(year) for year in years]
+
+    def data_version(self, bbox: Sequence[float], years: Sequence[int]) -> str:
+        """Identify the Earth Engine collection the data is read from."""
+        return f"ee:{ALPHAEARTH_DATASET_ID}"
+
+    @traced("ee.add_layer")
+    def add_layer(self, map_object: Any, image: "ee.Image", vis_params: Dict[str, Any], name: str) -> None:
+        # add_ee_layer requests a tile URL (getMapId) from Earth Engine
+        count("ee.remote_calls")
+        map_object.add_ee_layer(image, vis_params, name)
+
+    @traced("ee.project_components")
+    def project_components(self, image: "ee.Image", components: Any) -> "ee.Image":
+        import ee
+
+        # One server-side matrix product per pixel: (components x 64) @ (64 x 1)
+        centered = self.expressions.select(image).subtract(
+            ee.Image.constant(components.mean.tolist())
+        )
+        weights = ee.Image(ee.Array(components.vectors.tolist()))
+        projected = weights.matrixMultiply(centered.toArray().toArray(1))
+        return projected.arrayProject([0]).arrayFlatten([components.names])
+
+    @traced("ee.reduce_change")
+    def reduce_change(
+        self,
+        year1: int,
+        year2: int,
+        geometries: Sequence["ee.Geometry"],
+        threshold: float,
+        distribution: "ee.Reducer",
+        scale: float,
+        batch_size: int = REDUCE_BATCH_SIZE,
+    ) -> List[Dict[str, Any]]:
+        """
+        Summarise the similarity between two years over many geometries.
+
+        Each geometry gets its pixel count, mean similarity, the output of
+        ``distribution`` (e.g. percentiles or a histogram), its area and
+        the area whose similarity is below ``threshold``, in square metres.
+        Geometries are sent in batches of ``reduceRegions`` calls.
+
+        Args:
+            year1: First year for comparison.
+            year2: Second year for comparison.
+            geometries: Regions to summarise.
+            threshold: Similarity below which a pixel counts as changed.
+            distribution: Reducer applied to the similarity band alongside
+                count and mean.
+            scale: Pixel size in metres for the reduction.
+            batch_size: Geometries per ``reduceRegions`` call.
+
+        Returns:
+            One dict of reducer outputs per geometry, in input order, with
+            "count", "mean", the distribution outputs, "changed_area" and
+            "area".
+        """
+        import ee
+
+        similarity = self.calculate_change(
+            self.expressions.mosaic(year1), self.expressions.mosaic(year2)
+        )
+        # Multiplying by the 0/1 change mask keeps both area bands on the
+        # similarity footprint without a second mask
+        pixel_area = ee.Image.pixelArea()
+        changed_area = pixel_area.multiply(similarity.lt(threshold)).rename("changed_area")
+        stats_image = similarity.addBands(changed_area).addBands(pixel_area.rename("area"))
+        reducer = (
+            ee.Reducer.count()
+            .combine(ee.Reducer.mean(), sharedInputs=True)
+            .combine(distribution, sharedInputs=True)
+            .combine(ee.Reducer.sum().setOutputs(["changed_area"]), sharedInputs=False)
+            .combine(ee.Reducer.sum().setOutputs(["area"]), sharedInputs=False)
+        )
+
+        results: List[Dict[str, Any]] = [{} for _ in geometries]
+        for start in range(0, len(geometries), batch_size):
+            features = [
+                ee.Feature(geometry, {"feature_index": start + i})
+                for i, geometry in enumerate(geometries[start:start + batch_size])
+            ]
+            count("ee.remote_calls")
+            result = stats_image.reduceRegions(
+                collection=ee.FeatureCollection(features),
+                reducer=reducer,
+                scale=scale,
+            ).getInfo()
+            for feature in result["features"]:
+                props = feature["properties"]
+                results[props.pop("feature_index")] = props
+        return results
+
+    @traced("ee.export_layer")
+    def export_layer(self, image: "ee.Image", vis_params: Dict[str, Any], path: str) -> Dict[str, Any]:
+        # Earth Engine keeps rendering the tiles; only the URL template is kept
+        count("ee.remote_calls")
+        map_id = image.getMapId(vis_params)
+        return {
+            "type": "raster",
+            "tiles": [map_id["tile_fetcher"].url_format],
+            "tileSize": 256,
+            "attribution": "Google/DeepMind AlphaEarth",
+        }
+
+    @traced("ee.compute_pixels")
+    def _compute_pixels(
+        self,
+        bbox: Sequence[float],
+        year: int,
+        scale: float,
+        bands: List[str],
+    ) -> Raster:
+        import ee
+
+        west, south, east, north = bbox
+        step = scale / METERS_PER_DEGREE
+        width = max(1, math.ceil((east - west) / step))
+        height = max(1, math.ceil((north - south) / step))
+
+        grid = {
+            "dimensions": {"width": width, "height": height},
+            "affineTransform": {
+                "scaleX": step,
+                "shearX": 0,
+                "translateX": west,
+                "shearY": 0,
+                "scaleY": -step,
+                "translateY": north,
+            },
+            "crsCode": "EPSG:4326",
+        }
+        # Bands are split across requests when one response would exceed
+        # the computePixels size limit
+        group = max(1, EE_REQUEST_BYTES // (4 * width * height))
+        region = self.load_region(bbox, year)
+        planes: Dict[str, np.ndarray] = {}
+        for start in range(0, len(bands), group):
+            names = bands[start:start + group]
+            pixels = ee.data.computePixels(
+                {
+                    "expression": self.expressions.select(region, names),
+                    "fileFormat": "NUMPY_NDARRAY",
+                    "grid": grid,
+                }
+            )
+            count("ee.remote_calls")
+            count("ee.bytes_received", pixels.nbytes)
+            for name in names:
+                planes[name] = pixels[name]
+        data = np.stack([planes[band] for band in bands], axis=-1).astype(np.float32)
+        bounds = (west, north - height * step, west + width * step, north)
+        return Raster(data, bounds, band_names=bands, year=year)
+
+
+class LocalBackend(EmbeddingBackend):
+    """
+    Backend serving AlphaEarth tiles cached on local disk.
+
+    Tiles are stored under ``root`` as ``<year>/<tile_id>/``, each a
+    :class:`~alphaearth_viz.store.ChunkStore` of shape (height, width, 64) on
+    a regular longitude/latitude grid, with its footprint recorded in the
+    ``bounds`` attribute. Chunks are memory-mapped on read.
+
+    Args:
+        root: Directory holding the cached tiles. Created if missing. When
+            None, the backend only computes on in-memory rasters.
+        cache: Optional TileCache serving regions mosaicked from several tiles.
+
+    Example:
+        >>> backend = LocalBackend("~/alphaearth_cache")
+        >>> backend.write_tile(2024, "sf", array, bounds=(-123, 37, -122, 38))
+        >>> image = backend.load(lon=-122.4, lat=37.8, year=2024)
+    """
+
+    def __init__(self, root: Optional[str] = None, cache: Optional[TileCache] = None):
+        self.root = os.path.expanduser(root) if root is not None else None
+        self.cache = cache
+        self.tile_index = TileIndex()
+        if self.root is not None:
+            os.makedirs(self.root, exist_ok=True)
+            self._scan()
+
+    def write_tile(
+        self,
+        year: int,
+        tile_id: str,
+        data: np.ndarray,
+        bounds: Sequence[float],
+        chunks: Sequence[int] = (512, 512),
+        quantize: bool = False,
+    ) -> ChunkStore:
+        """
+        Add a tile of embeddings to the local store.
+
+        A year beyond the release-time range, such as a newly published
+        one, is registered as valid so the tile can be loaded.
+
+        Args:
+            year: Year of the tile.
+            tile_id: Identifier of the tile (e.g. its Earth Engine system:index).
+            data: Array of shape (height, width, 64).
+            bounds: Footprint as (west, south, east, north) in degrees.
+            chunks: Chunk size as (rows, columns). Defaults to (512, 512).
+            quantize: Store per-band int8 codes instead of the original values,
+                using a quarter of the space of float32.
+
+        Returns:
+            The ChunkStore holding the tile.
+        """
+        if data.ndim != 3 or data.shape[2] != NUM_BANDS:
+            raise ValueError(f"Tile data must have shape (height, width, {NUM_BANDS})")
+        register_years([year])
+
+        attrs = {"bounds": list(bounds), "year": year, "tile_id": tile_id}
+        if quantize:
+            params = Quantization.fit(data)
+            data = params.quantize(data)
+            attrs["quantization"] = params.to_dict()
+
+        store = ChunkStore.create(
+            self._tile_path(year, tile_id),
+            data.shape,
+            data.dtype,
+            chunks=chunks,
+            attrs=attrs,
+        )
+        store.write(data)
+        self.tile_index.add(year, tile_id, bounds)
+        return store
+
+    def open_tile(self, year: int, tile_id: str) -> ChunkStore:
+        """Open the ChunkStore of a cached tile."""
+        return ChunkStore.open(self._tile_path(year, tile_id))
+
+    def available_years(self) -> List[int]:
+        """List the years with at least one cached tile."""
+        return self.tile_index.years
+
+    def data_version(self, bbox: Sequence[float], years: Sequence[int]) -> str:
+        """
+        Identify the store and the cached tiles covering a region.
+
+        The version lists the tiles intersecting ``bbox`` in each year with
+        the modification time of their descriptor, so writing, replacing or
+        adding a tile there changes it.
+        """
+        parts = [f"local:{self.root}"]
+        for year in years:
+            for tile_id in self.tile_index.lookup_bbox(bbox, year):
+                parts.append(self.tile_version(year, tile_id))
+        return ";".join(parts)
+
+    def tile_version(self, year: int, tile_id: str) -> str:
+        """Version of one cached tile, changing whenever the tile is rewritten."""
+        meta = os.stat(os.path.join(self._tile_path(year, tile_id), META_FILE))
+        return f"{year}/{tile_id}@{meta.st_mtime_ns}"
+
+    @traced("local.load")
+    def load(self, lon: float, lat: float, year: int) -> Raster:
+        validate_year(year)
+
+        tile_ids = self.tile_index.lookup(lon, lat, year)
+        if not tile_ids:
+            raise NoDataError(f"No cached tile covers ({lon}, {lat}) in {year}.")
+        return self._tile_raster(year, tile_ids[0])
+
+    @traced("local.load_region")
+    def load_region(self, bbox: Sequence[float], year: int) -> Raster:
+        validate_year(year)
+
+        tile_ids = self.tile_index.lookup_bbox(bbox, year)
+        if not tile_ids:
+            raise NoDataError(f"No cached tile intersects {tuple(bbox)} in {year}.")
+
+        if len(tile_ids) == 1:
+            return self._tile_raster(year, tile_ids[0], bbox)
+
+        if self.cache is None:
+            return self._mosaic(bbox, year, tile_ids)
+        # The data version changes when a tile under the bbox is rewritten
+        key = cache_key(year, bbox, dataset_id=self.data_version(bbox, [year]))
+        return self.cache.get_or_fetch(key, lambda: self._mosaic(bbox, year, tile_ids))
+
+    def fetch_region(
+        self,
+        bbox: Sequence[float],
+        year: int,
+        scale: Optional[float] = None,
+        bands: Optional[List[str]] = None,
+    ) -> Raster:
+        """
+        Read cached embeddings for a bounding box at native resolution.
+
+        Args:
+            bbox: Bounding box as (west, south, east, north) in degrees.
+            year: Year to read.
+            scale: Ignored; local tiles are read at their stored resolution.
+            bands: Bands to read. Defaults to all 64 embedding bands.
+
+        Returns:
+            A Raster covering the bounding box.
+        """
+        raster = self.load_region(bbox, year)
+        return raster.select(bands) if bands is not None else raster
+
+    @traced("local.sample_grid")
+    def sample_grid(
+        self,
+        bounds: Sequence[float],
+        lons: np.ndarray,
+        lats: np.ndarray,
+        year: int,
+    ) -> Raster:
+        """
+        Read the cached pixels under a grid of points.
+
+        Each tile chunk containing grid points is memory-mapped and only the
+        pixels under the points are copied, so the cost follows the size of
+        the grid rather than the native-resolution area it spans.
+
+        Args:
+            bounds: Footprint of the grid as (west, south, east, north).
+            lons: Increasing longitudes of the grid columns.
+            lats: Decreasing latitudes of the grid rows.
+            year: Year to read.
+
+        Returns:
+            A float32 Raster of shape (len(lats), len(lons)) with all 64
+            bands, NaN where no tile covers a point.
+
+        Raises:
+            NoDataError: If no cached tile intersects ``bounds``.
+        """
+        validate_year(year)
+        tile_ids = self.tile_index.lookup_bbox(bounds, year)
+        if not tile_ids:
+            raise NoDataError(f"No cached tile intersects {tuple(bounds)} in {year}.")
+
+        out = np.full((len(lats), len(lons), NUM_BANDS), np.nan, np.float32)
+        for tile_id in tile_ids:
+            store = self.open_tile(year, tile_id)
+            count("local.tiles_opened")
+            west, south, east, north = store.attrs["bounds"]
+            height, width = store.shape[:2]
+            rows = np.floor((north - lats) / ((north - south) / height)).astype(np.int64)
+            cols = np.floor((lons - west) / ((east - west) / width)).astype(np.int64)
+            row_idx = np.flatnonzero((rows >= 0) & (rows < height))
+            col_idx = np.flatnonzero((cols >= 0) & (cols < width))
+            if not len(row_idx) or not len(col_idx):
+                continue
+            quantization = store.attrs.get("quantization")
+            if quantization is not None:
+                quantization = Quantization.from_dict(quantization)
+
+            chunk_rows, chunk_cols = store.chunks
+            row_chunk = rows[row_idx] // chunk_rows
+            col_chunk = cols[col_idx] // chunk_cols
+            for chunk_row in np.unique(row_chunk):
+                r_sel = row_idx[row_chunk == chunk_row]
+                for chunk_col in np.unique(col_chunk):
+                    c_sel = col_idx[col_chunk == chunk_col]
+                    chunk = store.read_chunk(int(chunk_row), int(chunk_col))
+                    values = chunk[
+                        (rows[r_sel] - chunk_row * chunk_rows)[:, np.newaxis],
+                        cols[c_sel] - chunk_col * chunk_cols,
+                    ]
+                    if quantization is not None:
+                        values = quantization.dequantize(values)
+                    out[np.ix_(r_sel, c_sel)] = values
+        return Raster(out, bounds, year=year)
+
+    def _mosaic(self, bbox: Sequence[float], year: int, tile_ids: List[str]) -> Raster:
+        # Only the window of each tile that intersects the bbox is read
+        stores = [self.open_tile(year, tile_id) for tile_id in tile_ids]
+        count("local.tiles_opened", len(stores))
+
+        # Mosaic onto the pixel grid of the first tile
+        west, south, east, north = stores[0].attrs["bounds"]
+        x_size = (east - west) / stores[0].shape[1]
+        y_size = (north - south) / stores[0].shape[0]
+        col0 = int(np.floor((bbox[0] - west) / x_size))
+        col1 = int(np.ceil((bbox[2] - west) / x_size))
+        row0 = int(np.floor((north - bbox[3]) / y_size))
+        row1 = int(np.ceil((north - bbox[1]) / y_size))
+
+        out = np.full((row1 - row0, col1 - col0, NUM_BANDS), np.nan, np.float32)
+        for store in stores:
+            tile_bounds = store.attrs["bounds"]
+            tile_row = int(round((north - tile_bounds[3]) / y_size))
+            tile_col = int(round((tile_bounds[0] - west) / x_size))
+            height, width = store.shape[:2]
+            r0, r1 = max(row0, tile_row), min(row1, tile_row + height)
+            c0, c1 = max(col0, tile_col), min(col1, tile_col + width)
+            if r0 >= r1 or c0 >= c1:
+                continue
+            block = store.read((r0 - tile_row, r1 - tile_row, c0 - tile_col, c1 - tile_col))
+            quantization = store.attrs.get("quantization")
+            if quantization is not None:
+                block = Quantization.from_dict(quantization).dequantize(block)
+            out[r0 - row0:r1 - row0, c0 - col0:c1 - col0] = block
+
+        out_bounds = (
+            west + col0 * x_size,
+            north - row1 * y_size,
+            west + col1 * x_size,
+            north - row0 * y_size,
+        )
+        return Raster(out, out_bounds, year=year)
+
+    @traced("local.calculate_change")
+    def calculate_change(self, image1: Raster, image2: Raster) -> Raster:
+        if image1.shape != image2.shape:
+            raise ValueError(
+                f"Rasters must share a grid, got {image1.shape} and {image2.shape}"
+            )
+        band_names = get_all_band_names()
+        emb1 = image1.select(band_names)
+        emb2 = image2.select(band_names)
+
+        if emb1.quantization is not None and emb2.quantization is not None:
+            result = quantized_similarity(
+                emb1.data, emb2.data, emb1.quantization, emb2.quantization
+            )
+        else:
+            result = similarity(emb1.values(), emb2.values())
+
+        return Raster(result, image1.bounds, band_names=["similarity"])
+
+    @traced("local.add_layer")
+    def add_layer(self, map_object: Any, image: Raster, vis_params: Dict[str, Any], name: str) -> None:
+        # Requires rasterio, installed with the "local" extra
+        import rasterio
+        from rasterio.transform import from_bounds
+
+        rgba = render(image, vis_params)
+        height, width = image.shape
+        directory = tempfile.mkdtemp(prefix="alphaearth_")
+        path = os.path.join(directory, f"{name.replace(' ', '_')}.tif")
+        with rasterio.open(
+            path,
+            "w",
+            driver="GTiff",
+            height=height,
+            width=width,
+            count=4,
+            dtype="uint8",
+            crs="EPSG:4326",
+            transform=from_bounds(*image.bounds, width, height),
+        ) as dst:
+            dst.write(np.moveaxis(rgba, -1, 0))
+
+        map_object.add_raster(path, name=name)
+
+    @traced("local.project_components")
+    def project_components(self, image: Raster, components: Any) -> Raster:
+        return components.project(image)
+
+    def export_layer(self, image: Raster, vis_params: Dict[str, Any], path: str) -> Dict[str, Any]:
+        from .tiles import encode_png
+
+        west, south, east, north = image.bounds
+        path = f"{path}.png"
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(encode_png(render(image, vis_params)))
+        os.replace(tmp_path, path)
+        return {
+            "type": "image",
+            "url": path,
+            "coordinates": [[west, north], [east, north], [east, south], [west, south]],
+        }
+
+    def _tile_path(self, year: int, tile_id: str) -> str:
+        if self.root is None:
+            raise ValueError("This LocalBackend has no tile store (root is None)")
+        return os.path.join(self.root, str(year), tile_id)
+
+    def _tile_raster(
+        self, year: int, tile_id: str, bbox: Optional[Sequence[float]] = None
+    ) -> Raster:
+        # Read a cached tile, or only its window covering bbox. Windows inside
+        # one chunk stay memory-mapped instead of being copied into RAM.
+        store = self.open_tile(year, tile_id)
+        count("local.tiles_opened")
+        quantization = store.attrs.get("quantization")
+        if quantization is not None:
+            quantization = Quantization.from_dict(quantization)
+        bounds = store.attrs["bounds"]
+        window = None
+        if bbox is not None:
+            window = bbox_window(bounds, store.shape, bbox)
+            bounds = window_bounds(bounds, store.shape, window)
+        return Raster(store.read(window), bounds, year=year, quantization=quantization)
+
+    def _scan(self) -> None:
+        for year_dir in sorted(os.listdir(self.root)):
+            year_path = os.path.join(self.root, year_dir)
+            if not (year_dir.isdigit() and os.path.isdir(year_path)):
+                continue
+            for tile_id in sorted(os.listdir(year_path)):
+                tile_path = os.path.join(year_path, tile_id)
+                if ChunkStore.exists(tile_path):
+                    store = ChunkStore.open(tile_path)
+                    self.tile_index.add(int(year_dir), tile_id, store.attrs["bounds"])
+        register_years(self.tile_index.years)
+
+
+class SimulatedLatencyBackend(EmbeddingBackend):
+    """
+    Wrapper adding artificial latency and failures to another backend.
+
+    Useful for exercising schedulers, retries and async code against a
+    LocalBackend as if every read were a remote round trip.
+
+    Args:
+        backend: Backend to delegate to.
+        latency: Mean delay in seconds added to each load or fetch. Defaults to 0.1.
+        jitter: Maximum random deviation from ``latency`` in seconds.
+            Defaults to 0.
+        failure_rate: Probability that a call raises ConnectionError.
+            Defaults to 0.
+        seed: Optional seed for the random generator.
+
+    Example:
+        >>> slow = SimulatedLatencyBackend(LocalBackend("~/alphaearth_cache"), latency=0.2)
+    """
+
+    def __init__(
+        self,
+        backend: EmbeddingBackend,
+        latency: float = 0.1,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.backend = backend
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def load(self, lon: float, lat: float, year: int) -> Any:
+        self._wait()
+        return self.backend.load(lon, lat, year)
+
+    def load_region(self, bbox: Sequence[float], year: int) -> Any:
+        self._wait()
+        return self.backend.load_region(bbox, year)
+
+    def fetch_region(
+        self,
+        bbox: Sequence[float],
+        year: int,
+        scale: Optional[float] = None,
+        bands: Optional[List[str]] = None,
+    ) -> Raster:
+        self._wait()
+        return self.backend.fetch_region(bbox, year, scale=scale, bands=bands)
+
+    def calculate_change(self, image1: Any, image2: Any) -> Any:
+        return self.backend.calculate_change(image1, image2)
+
+    def add_layer(self, map_object: Any, image: Any, vis_params: Dict[str, Any], name: str) -> None:
+        self.backend.add_layer(map_object, image, vis_params, name)
+
+    def project_components(self, image: Any, components: Any) -> Any:
+        return self.backend.project_components(image, components)
+
+    def export_layer(self, image: Any, vis_params: Dict[str, Any], path: str) -> Dict[str, Any]:
+        return self.backend.export_layer(image, vis_params, path)
+
+    def available_years(self) -> List[int]:
+        self._wait()
+        return self.backend.available_years()
+
+    def chunk_pixels(self, bands: int = NUM_BANDS) -> int:
+        return self.backend.chunk_pixels(bands)
+
+    def data_version(self, bbox: Sequence[float], years: Sequence[int]) -> str:
+        return self.backend.data_version(bbox, years)
+
+    def _wait(self) -> None:
+        self.calls += 1
+        delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, delay))
+        if self._random.random() < self.failure_rate:
+            raise ConnectionError("Simulated backend failure")
+
+
+_default_backend: Optional[EmbeddingBackend] = None
+
+
+def get_backend() -> EmbeddingBackend:
+    """
+    Get the backend used when none is passed explicitly.
+
+    Returns:
+        The default backend, an EarthEngineBackend unless changed with
+        :func:`set_backend`.
+    """
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = EarthEngineBackend()
+    return _default_backend
+
+
+def set_backend(backend: Optional[EmbeddingBackend]) -> None:
+    """
+    Set the backend used when none is passed explicitly.
+
+    Args:
+        backend: Backend to use by default, or None to restore Earth Engine.
+
+    Example:
+        >>> set_backend(LocalBackend("~/alphaearth_cache"))
+    """
+    global _default_backend
+    _default_backend = backend
+
+
+def backend_for(image: Any) -> EmbeddingBackend:
+    """
+    Pick a backend able to compute with an image.
+
+    Local rasters are handled by a LocalBackend and anything else is treated
+    as an Earth Engine object. The default backend is used when it matches.
+
+    Args:
+        image: An ee.Image or a local Raster.
+
+    Returns:
+        A backend whose calculate_change accepts the image.
+    """
+    backend = get_backend()
+    if isinstance(image, Raster):
+        return backend if isinstance(backend, LocalBackend) else LocalBackend()
+    return backend if isinstance(backend, EarthEngineBackend) else EarthEngineBackend()
@@ -0,0 +1,270 @@
+"""
+Disk-backed LRU cache of fetched AlphaEarth rasters.
+
+Rasters are stored as ``.npy`` files with a small JSON sidecar and reopened
+memory-mapped on a hit. Recency is tracked through file modification times,
+so the LRU order survives restarts and is shared by processes using the same
+directory. The cache evicts least recently used entries once it exceeds its
+size or entry limit.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .quantize import Quantization
+from .raster import Raster
+from .instrumentation import cache_lookup
+from .utils import ALPHAEARTH_DATASET_ID, DEFAULT_CACHE_DIR
+
+
+DEFAULT_TILE_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, "tiles")
+
+# Default size limit of the tile cache (4 GiB)
+DEFAULT_MAX_BYTES = 4 * 2**30
+
+
+def cache_key(
+    year: int,
+    region: Any,
+    bands: Optional[Sequence[str]] = None,
+    scale: Optional[float] = None,
+    dataset_id: str = ALPHAEARTH_DATASET_ID,
+) -> Tuple[Hashable, ...]:
+    """
+    Build the cache key for a fetched raster.
+
+    Args:
+        year: Year of the embeddings.
+        region: Tile ID or (west, south, east, north) bounding box.
+        bands: Band names fetched, or None for all bands.
+        scale: Pixel size in metres, or None for native resolution.
+        dataset_id: Earth Engine dataset ID.
+
+    Returns:
+        A hashable key tuple.
+
+    Example:
+        >>> cache_key(2024, (-122.5, 37.7, -122.3, 37.9), scale=10)
+    """
+    if not isinstance(region, str):
+        region = tuple(round(float(v), 9) for v in region)
+    return (
+        dataset_id,
+        int(year),
+        region,
+        tuple(bands) if bands is not None else None,
+        float(scale) if scale is not None else None,
+    )
+
+
+class TileCache:
+    """
+    Size-bounded, disk-backed LRU cache of rasters.
+
+    Args:
+        directory: Directory holding the cache files. Created if missing.
+        max_bytes: Maximum total size of cached arrays in bytes.
+            Defaults to 4 GiB.
+        max_entries: Optional maximum number of cached rasters.
+
+    Example:
+        >>> cache = TileCache(max_bytes=2 * 2**30)
+        >>> raster = cache.get_or_fetch(key, lambda: backend.fetch_region(bbox, 2024))
+        >>> cache.stats()
+        {'hits': 0, 'misses': 1, ...}
+    """
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_TILE_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_entries: Optional[int] = None,
+    ):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._scan()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._digest(key) in self._entries
+
+    def get(self, key: Hashable) -> Optional[Raster]:
+        """
+        Look up a raster, marking it as most recently used.
+
+        Args:
+            key: Cache key, e.g. from :func:`cache_key`.
+
+        Returns:
+            The memory-mapped Raster, or None on a miss.
+        """
+        digest = self._digest(key)
+        with self._lock:
+            if digest not in self._entries:
+                self.misses += 1
+                cache_lookup("tile_cache", False)
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+
+        data_path, meta_path = self._paths(digest)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as fh:
+                meta = json.load(fh)
+            data = np.load(data_path, mmap_mode="r")
+            now = time.time()
+            os.utime(data_path, (now, now))
+        except (OSError, ValueError):
+            # Evicted by another process sharing the directory
+            with self._lock:
+                self._forget(digest)
+                self.hits -= 1
+                self.misses += 1
+            cache_lookup("tile_cache", False)
+            return None
+
+        cache_lookup("tile_cache", True)
+        quantization = meta.get("quantization")
+        return Raster(
+            data,
+            meta["bounds"],
+            band_names=meta["band_names"],
+            year=meta.get("year"),
+            quantization=Quantization.from_dict(quantization) if quantization else None,
+        )
+
+    def put(self, key: Hashable, raster: Raster) -> None:
+        """
+        Store a raster, evicting least recently used entries if needed.
+
+        Args:
+            key: Cache key, e.g. from :func:`cache_key`.
+            raster: Raster to store.
+        """
+        digest = self._digest(key)
+        data_path, meta_path = self._paths(digest)
+        meta = {
+            "bounds": list(raster.bounds),
+            "band_names": raster.band_names,
+            "year": raster.year,
+            "quantization": raster.quantization.to_dict() if raster.quantization else None,
+        }
+
+        tmp_path = f"{data_path}.tmp.npy"
+        np.save(tmp_path, np.ascontiguousarray(raster.data))
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        os.replace(f"{meta_path}.tmp", meta_path)
+        os.replace(tmp_path, data_path)
+
+        with self._lock:
+            self._forget(digest)
+            size = os.path.getsize(data_path)
+            self._entries[digest] = size
+            self._bytes += size
+            self._evict()
+
+    def get_or_fetch(self, key: Hashable, fetch: Callable[[], Raster]) -> Raster:
+        """
+        Return a cached raster, calling ``fetch`` and storing the result on a miss.
+
+        Args:
+            key: Cache key, e.g. from :func:`cache_key`.
+            fetch: Function returning the raster when it is not cached.
+
+        Returns:
+            The cached or freshly fetched raster.
+        """
+        raster = self.get(key)
+        if raster is None:
+            raster = fetch()
+            self.put(key, raster)
+        return raster
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        Returns:
+            Dictionary with hits, misses, hit_rate, evictions, entries and bytes.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def clear(self) -> None:
+        """Remove every cached raster and reset the counters."""
+        with self._lock:
+            for digest in list(self._entries):
+                self._remove(digest)
+            self.hits = self.misses = self.evictions = 0
+
+    def _scan(self) -> None:
+        found = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy") and not name.endswith(".tmp.npy"):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                found.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, digest, size in sorted(found):
+            self._entries[digest] = size
+            self._bytes += size
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._entries and (
+            self._bytes > self.max_bytes
+            or (self.max_entries is not None and len(self._entries) > self.max_entries)
+        ):
+            digest = next(iter(self._entries))
+            self._remove(digest)
+            self.evictions += 1
+
+    def _remove(self, digest: str) -> None:
+        self._forget(digest)
+        for path in self._paths(digest):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _forget(self, digest: str) -> None:
+        size = self._entries.pop(digest, None)
+        if size is not None:
+            self._bytes -= size
+
+    def _paths(self, digest: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, digest)
+        return f"{base}.npy", f"{base}.json"
+
+    @staticmethod
+    def _digest(key: Hashable) -> str:
+        return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
@@ -0,0 +1,395 @@
+"""
+Mini-batch k-means clustering of AlphaEarth embeddings.
+
+The web viewer segments the globe by training ``ee.Clusterer.wekaKMeans``
+on a fresh sample every time clustering is switched on. :class:`KMeans`
+is the local counterpart: centroids are updated from mini-batches drawn
+from one tile at a time, so a model can be trained across a region tile by
+tile, saved, and later used to label new tiles without retraining.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .backends import EmbeddingBackend, get_backend
+from .compute import DEFAULT_MEMORY_BUDGET, block_rows, iter_row_blocks
+from .raster import Raster
+from .utils import validate_year
+
+
+# Colours used for clusters by the web viewer
+CLUSTER_PALETTE = [
+    "#1f77b4", "#ff7f0e", "#2ca02c", "#d62728",
+    "#9467bd", "#8c564b", "#e377c2", "#7f7f7f",
+]
+
+# Label written for pixels without data
+NO_CLUSTER = -1
+
+Embeddings = Union[Raster, np.ndarray]
+
+
+class KMeans:
+    """
+    Mini-batch k-means over 64-D embeddings.
+
+    Each call to :meth:`partial_fit` draws shuffled mini-batches from one
+    tile and moves every centroid towards the mean of the pixels assigned
+    to it, with a per-centroid learning rate of one over the number of
+    pixels it has seen. Pixels with NaN values are ignored.
+
+    Args:
+        n_clusters: Number of clusters. Defaults to 8, as in the web viewer.
+        batch_size: Pixels per mini-batch. Defaults to 4096.
+        max_samples: Maximum pixels drawn from one tile per
+            :meth:`partial_fit` call. Defaults to all pixels.
+        seed: Seed for sampling and initialisation.
+
+    Example:
+        >>> model = KMeans(n_clusters=8)
+        >>> for tile in tiles:
+        ...     model.partial_fit(tile)
+        >>> model.save("landcover.npz")
+        >>> labels = KMeans.load("landcover.npz").predict(new_tile)
+    """
+
+    def __init__(
+        self,
+        n_clusters: int = 8,
+        batch_size: int = 4096,
+        max_samples: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        if n_clusters < 1:
+            raise ValueError("n_clusters must be at least 1")
+        self.n_clusters = n_clusters
+        self.batch_size = batch_size
+        self.max_samples = max_samples
+        self.centroids: Optional[np.ndarray] = None
+        self.counts = np.zeros(n_clusters, dtype=np.int64)
+        self.band_names: Optional[List[str]] = None
+        self._rng = np.random.default_rng(seed)
+
+    def __repr__(self) -> str:
+        return (
+            f"KMeans(n_clusters={self.n_clusters}, fitted={self.fitted}, "
+            f"samples={int(self.counts.sum())})"
+        )
+
+    @property
+    def fitted(self) -> bool:
+        """True once centroids have been initialised."""
+        return self.centroids is not None
+
+    def partial_fit(self, data: Embeddings) -> "KMeans":
+        """
+        Update the centroids with mini-batches drawn from one tile.
+
+        The first call initialises the centroids with k-means++ seeding on
+        a sample of the tile.
+
+        Args:
+            data: Raster or array of shape (..., bands). Quantized rasters
+                are dequantized one mini-batch at a time.
+
+        Returns:
+            The model, for chaining.
+
+        Raises:
+            ValueError: If the first tile has fewer valid pixels than
+                ``n_clusters``, or the bands differ from earlier tiles.
+        """
+        flat, decode = self._pixels(data)
+        order = self._rng.permutation(flat.shape[0])
+        if self.max_samples is not None:
+            order = order[:self.max_samples]
+
+        if self.centroids is None:
+            sample = decode(flat[np.sort(order[:max(self.batch_size, 3 * self.n_clusters)])])
+            self.centroids = _kmeans_plusplus(sample, self.n_clusters, self._rng)
+
+        for start in range(0, order.size, self.batch_size):
+            batch = decode(flat[np.sort(order[start:start + self.batch_size])])
+            if batch.shape[0]:
+                self._update(batch)
+        return self
+
+    def fit(self, tiles: Union[Embeddings, Sequence[Embeddings]], epochs: int = 1) -> "KMeans":
+        """
+        Fit the model on one tile or a sequence of tiles.
+
+        Args:
+            tiles: A Raster or array, or a sequence of them.
+            epochs: Number of passes over the tiles. Defaults to 1.
+
+        Returns:
+            The model, for chaining.
+        """
+        if isinstance(tiles, (Raster, np.ndarray)):
+            tiles = [tiles]
+        for _ in range(epochs):
+            for tile in tiles:
+                self.partial_fit(tile)
+        return self
+
+    def predict(
+        self,
+        data: Embeddings,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    ) -> Union[Raster, np.ndarray]:
+        """
+        Assign every pixel to its nearest centroid.
+
+        Args:
+            data: Raster or array of shape (..., bands).
+            memory_budget: Working-memory budget in bytes for one block.
+
+        Returns:
+            Int32 labels of shape data.shape[:-1], with -1 where the input
+            has no data. A Raster input gives a single-band "cluster" Raster.
+
+        Raises:
+            ValueError: If the model has not been fitted.
+        """
+        if self.centroids is None:
+            raise ValueError("KMeans model has not been fitted")
+        flat, decode = self._pixels(data, drop_invalid=False)
+        labels = np.empty(flat.shape[0], dtype=np.int32)
+
+        rows = block_rows(1, flat.shape[1] + self.n_clusters, 4, memory_budget)
+        for row0, row1 in iter_row_blocks(flat.shape[0], rows):
+            block = decode(flat[row0:row1])
+            valid = ~np.isnan(block).any(axis=1)
+            labels[row0:row1] = NO_CLUSTER
+            labels[row0:row1][valid] = self._assign(block[valid])
+
+        array = data.data if isinstance(data, Raster) else data
+        labels = labels.reshape(array.shape[:-1])
+        if isinstance(data, Raster):
+            return Raster(labels, data.bounds, band_names=["cluster"], year=data.year)
+        return labels
+
+    def inertia(self, data: Embeddings) -> float:
+        """
+        Sum of squared distances from each valid pixel to its nearest centroid.
+
+        Args:
+            data: Raster or array of shape (..., bands).
+
+        Returns:
+            The inertia, lower for tighter clusters.
+        """
+        if self.centroids is None:
+            raise ValueError("KMeans model has not been fitted")
+        flat, decode = self._pixels(data)
+        total = 0.0
+        for row0, row1 in iter_row_blocks(flat.shape[0], self.batch_size):
+            block = decode(flat[row0:row1])
+            distances = _squared_distances(block, self.centroids)
+            total += float(np.maximum(distances.min(axis=1), 0).sum())
+        return total
+
+    def vis_params(self) -> Dict[str, Any]:
+        """Visualization parameters for cluster labels, as in the web viewer."""
+        palette = CLUSTER_PALETTE * (-(-self.n_clusters // len(CLUSTER_PALETTE)))
+        return {"min": 0, "max": self.n_clusters - 1, "palette": palette[:self.n_clusters]}
+
+    def save(self, path: str) -> None:
+        """
+        Persist the centroids and per-centroid counts to an .npz file.
+
+        Args:
+            path: Destination file.
+        """
+        if self.centroids is None:
+            raise ValueError("KMeans model has not been fitted")
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as fh:
+            np.savez(
+                fh,
+                centroids=self.centroids,
+                counts=self.counts,
+                band_names=np.array(self.band_names or [], dtype=str),
+                batch_size=self.batch_size,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, seed: Optional[int] = None) -> "KMeans":
+        """
+        Load a model written with :meth:`save`.
+
+        Training can continue with :meth:`partial_fit`.
+
+        Args:
+            path: File written by :meth:`save`.
+            seed: Seed for further sampling.
+
+        Returns:
+            The KMeans model.
+        """
+        with np.load(path) as saved:
+            centroids = saved["centroids"].astype(np.float32)
+            model = cls(centroids.shape[0], batch_size=int(saved["batch_size"]), seed=seed)
+            model.centroids = centroids
+            model.counts = saved["counts"].astype(np.int64)
+            model.band_names = saved["band_names"].tolist() or None
+        return model
+
+    def _pixels(self, data: Embeddings, drop_invalid: bool = True):
+        # Flatten to (pixels, bands) and return a per-batch decoder to float32
+        if isinstance(data, Raster):
+            if data.data.ndim != 3:
+                raise ValueError("Clustering needs a multi-band raster")
+            self._check_bands(data.band_names)
+            flat = data.data.reshape(-1, data.data.shape[-1])
+            quantization = data.quantization
+        else:
+            flat = np.asarray(data).reshape(-1, np.shape(data)[-1])
+            quantization = None
+        if self.centroids is not None and flat.shape[1] != self.centroids.shape[1]:
+            raise ValueError(
+                f"Got {flat.shape[1]} bands, the model has {self.centroids.shape[1]}"
+            )
+
+        def decode(block: np.ndarray) -> np.ndarray:
+            if quantization is not None:
+                block = quantization.dequantize(block)
+            block = np.asarray(block, dtype=np.float32)
+            if drop_invalid:
+                block = block[~np.isnan(block).any(axis=1)]
+            return block
+
+        return flat, decode
+
+    def _check_bands(self, band_names: List[str]) -> None:
+        if self.band_names is None:
+            self.band_names = list(band_names)
+        elif list(band_names) != self.band_names:
+            raise ValueError("Raster bands differ from the bands the model was fitted on")
+
+    def _assign(self, block: np.ndarray) -> np.ndarray:
+        # ||x||^2 is the same for every centroid, so it does not affect argmin
+        scores = block @ (-2 * self.centroids.T)
+        scores += np.einsum("ij,ij->i", self.centroids, self.centroids)
+        return scores.argmin(axis=1)
+
+    def _update(self, batch: np.ndarray) -> None:
+        labels = self._assign(batch)
+        batch_counts = np.bincount(labels, minlength=self.n_clusters)
+        sums = np.zeros_like(self.centroids)
+        np.add.at(sums, labels, batch)
+
+        hit = batch_counts > 0
+        self.counts += batch_counts
+        rate = batch_counts[hit] / self.counts[hit]
+        means = sums[hit] / batch_counts[hit, np.newaxis]
+        self.centroids[hit] += rate[:, np.newaxis] * (means - self.centroids[hit])
+
+
+def cluster_region(
+    bbox: Sequence[float],
+    year: int,
+    n_clusters: int = 8,
+    model: Optional[KMeans] = None,
+    scale: float = 10.0,
+    sample_size: int = 5000,
+    backend: Optional[EmbeddingBackend] = None,
+) -> Raster:
+    """
+    Segment a region into clusters of similar embeddings.
+
+    Mirrors the web viewer's clustering view: a model is trained on a sample
+    of pixels (5000 by default) and then every pixel of the region is
+    labelled. Pass a fitted ``model`` to label with existing centroids.
+
+    Args:
+        bbox: Region as (west, south, east, north) in degrees.
+        year: Year of the embeddings (2017-2024).
+        n_clusters: Number of clusters when training. Defaults to 8.
+        model: Fitted model to assign clusters with. Trained on the region
+            when not given.
+        scale: Pixel size in metres. Defaults to 10.
+        sample_size: Pixels sampled for training. Defaults to 5000.
+        backend: Backend to read embeddings from. Defaults to the backend
+            set with ``set_backend``.
+
+    Returns:
+        A single-band Raster of int32 cluster labels (-1 where there is no data).
+
+    Example:
+        >>> clusters = cluster_region((-122.45, 37.75, -122.35, 37.85), 2024)
+    """
+    validate_year(year)
+    backend = backend or get_backend()
+    raster = backend.fetch_region(bbox, year, scale=scale)
+    if model is None:
+        model = KMeans(n_clusters, max_samples=sample_size)
+        model.partial_fit(raster)
+    return model.predict(raster)
+
+
+def fit_tiles(
+    tiles: Iterable[Embeddings],
+    n_clusters: int = 8,
+    batch_size: int = 4096,
+    max_samples: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> KMeans:
+    """
+    Train a model by streaming tiles through :meth:`KMeans.partial_fit`.
+
+    Only one tile needs to be in memory at a time, so ``tiles`` can be a
+    generator over a large region.
+
+    Args:
+        tiles: Iterable of Rasters or arrays of shape (..., bands).
+        n_clusters: Number of clusters. Defaults to 8.
+        batch_size: Pixels per mini-batch. Defaults to 4096.
+        max_samples: Maximum pixels drawn from each tile.
+        seed: Seed for sampling and initialisation.
+
+    Returns:
+        The fitted KMeans model.
+    """
+    model = KMeans(n_clusters, batch_size=batch_size, max_samples=max_samples, seed=seed)
+    for tile in tiles:
+        model.partial_fit(tile)
+    return model
+
+
+def _squared_distances(block: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2, computed with one matrix product
+    distances = block @ (-2 * centroids.T)
+    distances += np.einsum("ij,ij->i", block, block)[:, np.newaxis]
+    distances += np.einsum("ij,ij->i", centroids, centroids)
+    return distances
+
+
+def _kmeans_plusplus(sample: np.ndarray, n_clusters: int, rng: np.random.Generator) -> np.ndarray:
+    # k-means++ seeding: each new centroid is drawn with probability
+    # proportional to its squared distance from the nearest existing one
+    if sample.shape[0] < n_clusters:
+        raise ValueError(
+            f"Need at least {n_clusters} valid pixels to initialise, got {sample.shape[0]}"
+        )
+    centroids = np.empty((n_clusters, sample.shape[1]), dtype=np.float32)
+    centroids[0] = sample[rng.integers(sample.shape[0])]
+    closest = _squared_distances(sample, centroids[:1])[:, 0]
+    for i in range(1, n_clusters):
+        weights = np.maximum(closest, 0)
+        total = weights.sum()
+        if total > 0:
+            index = rng.choice(sample.shape[0], p=weights / total)
+        else:
+            index = rng.integers(sample.shape[0])
+        centroids[i] = sample[index]
+        closest = np.minimum(closest, _squared_distances(sample, centroids[i:i + 1])[:, 0])
+    return centroids
@@ -0,0 +1,164 @@
+"""
+Vectorized local change-detection kernels.
+
+These functions compute the same clamped dot-product similarity as
+``calculate_change`` on NumPy arrays. Work is split into row blocks sized
+from a memory budget, so memory-mapped rasters larger than RAM are processed
+with bounded memory.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .store import ChunkStore
+
+
+# Default working-memory budget for one block of both inputs, in bytes
+DEFAULT_MEMORY_BUDGET = 256 * 2**20
+
+
+def block_rows(
+    width: int,
+    bands: int,
+    itemsize: int,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+) -> int:
+    """
+    Number of rows per block so two input blocks fit in a memory budget.
+
+    Args:
+        width: Raster width in pixels.
+        bands: Number of bands per pixel.
+        itemsize: Bytes per value of the input dtype.
+        memory_budget: Budget in bytes. Defaults to 256 MiB.
+
+    Returns:
+        Rows per block, at least 1.
+    """
+    row_bytes = 2 * width * bands * max(itemsize, 4)
+    return max(1, memory_budget // max(row_bytes, 1))
+
+
+def iter_row_blocks(height: int, rows: int) -> Iterator[Tuple[int, int]]:
+    """Yield (row0, row1) ranges covering ``height`` rows in steps of ``rows``."""
+    for row0 in range(0, height, rows):
+        yield row0, min(row0 + rows, height)
+
+
+def dot_product(emb1: np.ndarray, emb2: np.ndarray) -> np.ndarray:
+    """
+    Per-pixel dot product of two (..., bands) embedding blocks.
+
+    Float inputs are multiplied in float32. Integer inputs (e.g. int8) are
+    multiplied exactly and accumulated in float32, which is exact for 64
+    int8 bands.
+
+    Args:
+        emb1: First block of embeddings.
+        emb2: Second block of embeddings with the same shape.
+
+    Returns:
+        Float32 array of shape emb1.shape[:-1].
+    """
+    return np.einsum("...k,...k->...", emb1, emb2, dtype=np.float32)
+
+
+def similarity(
+    emb1: np.ndarray,
+    emb2: np.ndarray,
+    out: Optional[np.ndarray] = None,
+    scale: float = 1.0,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+) -> np.ndarray:
+    """
+    Compute clamped dot-product similarity between two embedding rasters.
+
+    Equivalent to ``calculate_change``: for each pixel, the dot product of
+    the two 64-D embeddings clamped to [0, 1].
+
+    Args:
+        emb1: First raster of shape (height, width, bands). May be memory-mapped.
+        emb2: Second raster with the same shape.
+        out: Optional float32 (height, width) output array, e.g. a memory-mapped
+            file for results larger than RAM.
+        scale: Factor applied to the raw dot product before clamping, e.g. the
+            squared quantization step for integer inputs. Defaults to 1.0.
+        memory_budget: Working-memory budget in bytes for one block.
+
+    Returns:
+        The similarity array (``out`` when given).
+
+    Example:
+        >>> sim = similarity(tile_2017, tile_2024)
+    """
+    if emb1.shape != emb2.shape:
+        raise ValueError(f"Shape mismatch: {emb1.shape} and {emb2.shape}")
+    height, width, bands = emb1.shape
+
+    if out is None:
+        out = np.empty((height, width), dtype=np.float32)
+    elif out.shape != (height, width):
+        raise ValueError(f"out has shape {out.shape}, expected {(height, width)}")
+
+    rows = block_rows(width, bands, emb1.dtype.itemsize, memory_budget)
+    for row0, row1 in iter_row_blocks(height, rows):
+        block = dot_product(emb1[row0:row1], emb2[row0:row1])
+        if scale != 1.0:
+            block *= scale
+        np.clip(block, 0, 1, out=block)
+        out[row0:row1] = block
+
+    return out
+
+
+def similarity_chunked(
+    store1: ChunkStore,
+    store2: ChunkStore,
+    path: str,
+    scale: float = 1.0,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+) -> ChunkStore:
+    """
+    Compute similarity between two chunk stores into a new chunk store.
+
+    Chunks are processed one at a time, so memory use depends on the chunk
+    size and not on the raster size.
+
+    Args:
+        store1: First embedding store of shape (height, width, bands).
+        store2: Second embedding store with the same shape and chunking.
+        path: Directory for the output (height, width) float32 store.
+        scale: Factor applied to the raw dot product before clamping.
+        memory_budget: Working-memory budget in bytes for one block.
+
+    Returns:
+        The output ChunkStore with a single "similarity" band. Its attrs
+        keep the footprint ("bounds") and the years of the inputs ("year1"
+        and "year2") when the input stores record them.
+    """
+    if store1.shape != store2.shape or store1.chunks != store2.chunks:
+        raise ValueError("Stores must share shape and chunking")
+
+    attrs: Dict[str, Any] = {"band_names": ["similarity"]}
+    if "bounds" in store1.attrs:
+        attrs["bounds"] = store1.attrs["bounds"]
+    for key, store in (("year1", store1), ("year2", store2)):
+        if "year" in store.attrs:
+            attrs[key] = store.attrs["year"]
+    out = ChunkStore.create(path, store1.shape[:2], "float32", chunks=store1.chunks, attrs=attrs)
+    for chunk_row, chunk_col in store1.iter_chunks():
+        out.write_chunk(
+            chunk_row,
+            chunk_col,
+            similarity(
+                store1.read_chunk(chunk_row, chunk_col),
+                store2.read_chunk(chunk_row, chunk_col),
+                scale=scale,
+                memory_budget=memory_budget,
+            ),
+        )
+    return out
@@ -8,21 +8,31 @@ The AlphaEarth Foundations Satellite Embedding dataset is produced by
 Google and Google DeepMind.
 """
 
-from typing import List, Optional, Tuple
-
-import ee
-import leafmap.maplibregl as leafmap
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
 
+from .backends import (
+    EarthEngineBackend,
+    EmbeddingBackend,
+    backend_for,
+    get_backend,
+)
+from .pca import ComponentCatalog, get_component_catalog, view_region
+from .stats import StatsCatalog, get_stats_catalog
+from .tile_index import TileIndex
+from .instrumentation import traced
 from .utils import (
     format_band_names,
     get_vis_params,
     get_similarity_vis,
     validate_year,
-    get_dataset,
 )
 
+if TYPE_CHECKING:
+    import leafmap.maplibregl as leafmap
+
 
-def create_globe_map(sidebar_visible: bool = True) -> leafmap.Map:
+@traced("core.create_globe_map")
+def create_globe_map(sidebar_visible: bool = True) -> "leafmap.Map":
     """
     Create a basic 3D globe map with USGS imagery basemap.
 
@@ -36,12 +46,15 @@ def create_globe_map(sidebar_visible: bool = True) -> leafmap.Map:
         >>> m = create_globe_map()
         >>> m
     """
+    import leafmap.maplibregl as leafmap
+
     m = leafmap.Map(projection="globe", sidebar_visible=sidebar_visible)
     m.add_basemap("USGS.Imagery")
     return m
 
 
-def add_alphaearth_gui(map_object: leafmap.Map) -> None:
+@traced("core.add_alphaearth_gui")
+def add_alphaearth_gui(map_object: "leafmap.Map") -> None:
     """
     Add the AlphaEarth interactive GUI panel to a map.
 
@@ -61,32 +74,49 @@ def add_alphaearth_gui(map_object: leafmap.Map) -> None:
     map_object.add_alphaearth_gui()
 
 
-def load_embeddings(lon: float, lat: float, year: int) -> ee.Image:
+@traced("core.load_embeddings")
+def load_embeddings(
+    lon: float,
+    lat: float,
+    year: int,
+    tile_index: Optional[TileIndex] = None,
+    backend: Optional[EmbeddingBackend] = None,
+) -> Any:
     """
     Load AlphaEarth embeddings for a specific location and year.
 
+    The returned image is the annual tile covering the location. When a
+    ``tile_index`` is given the covering tile is resolved locally and
+    requested by ID; otherwise Earth Engine filters the collection by the
+    point geometry.
+
     Args:
         lon: Longitude of the location (degrees, -180 to 180).
         lat: Latitude of the location (degrees, -90 to 90).
         year: Year to load embeddings for (2017-2024).
+        tile_index: Optional TileIndex used to resolve the covering tile
+            with the Earth Engine backend.
+        backend: Backend to load from. Defaults to the backend set with
+            ``set_backend`` (Earth Engine unless changed).
 
     Returns:
-        An ee.Image object containing the 64-band embeddings.
+        An ee.Image object containing the 64-band embeddings, or a local
+        Raster when using a LocalBackend.
 
     Raises:
-        ValueError: If year is not between 2017 and 2024.
+        ValueError: If year is not between 2017 and 2024, or if no tile
+            covers the location.
 
     Example:
         >>> image = load_embeddings(lon=-122.4, lat=37.8, year=2024)
     """
-    validate_year(year)
-
-    dataset = get_dataset()
-    image = dataset.filter(ee.Filter.eq("year", year)).first()
+    if backend is None:
+        backend = EarthEngineBackend(tile_index) if tile_index is not None else get_backend()
 
-    return image
+    return backend.load(lon, lat, year)
 
 
+@traced("core.compare_years")
 def compare_years(
     lon: float,
     lat: float,
@@ -94,7 +124,8 @@ def compare_years(
     year2: int,
     bands: Optional[List[str]] = None,
     zoom: int = 12,
-) -> leafmap.Map:
+    backend: Optional[EmbeddingBackend] = None,
+) -> "leafmap.Map":
     """
     Create a map comparing AlphaEarth embeddings from two years.
 
@@ -106,6 +137,8 @@ def compare_years(
         bands: List of band names to visualize (e.g., ["A01", "A16", "A09"]).
                Defaults to ["A01", "A16", "A09"].
         zoom: Initial zoom level. Defaults to 12.
+        backend: Backend to load embeddings from. Defaults to the backend
+            set with ``set_backend``.
 
     Returns:
         A leafmap Map object with both years as layers.
@@ -117,31 +150,73 @@ def compare_years(
     validate_year(year1)
     validate_year(year2)
 
-    if bands is None:
-        bands = ["A01", "A16", "A09"]
+    import leafmap.maplibregl as leafmap
 
     # Create map centered on location
     m = leafmap.Map(center=[lat, lon], zoom=zoom)
     m.add_basemap("USGS.Imagery")
 
-    # Load images for both years
-    dataset = get_dataset()
-    image1 = dataset.filter(ee.Filter.eq("year", year1)).first()
-    image2 = dataset.filter(ee.Filter.eq("year", year2)).first()
-
-    # Visualization parameters
-    vis_params = get_vis_params(bands)
-
-    # Add layers
-    m.add_ee_layer(image1, vis_params, f"AlphaEarth {year1}")
-    m.add_ee_layer(image2, vis_params, f"AlphaEarth {year2}")
+    # Add layers for both years
+    backend = backend or get_backend()
+    for image, vis_params, name in comparison_layers(lon, lat, year1, year2, bands, backend=backend):
+        backend.add_layer(m, image, vis_params, name)
 
     m.add_layer_control()
 
     return m
 
 
-def calculate_change(image1: ee.Image, image2: ee.Image) -> ee.Image:
+@traced("core.comparison_layers")
+def comparison_layers(
+    lon: float,
+    lat: float,
+    year1: int,
+    year2: int,
+    bands: Optional[List[str]] = None,
+    backend: Optional[EmbeddingBackend] = None,
+    change: bool = False,
+) -> List[Tuple[Any, Dict[str, Any], str]]:
+    """
+    Build the layers shown by ``compare_years`` and ``analyze_location``.
+
+    Args:
+        lon: Longitude of the location (degrees).
+        lat: Latitude of the location (degrees).
+        year1: First year to compare.
+        year2: Second year to compare.
+        bands: Band names shown as RGB. Defaults to ["A01", "A16", "A09"].
+        backend: Backend to load embeddings from. Defaults to the backend
+            set with ``set_backend``.
+        change: Also add the change detection layer. Defaults to False.
+
+    Returns:
+        List of (image, vis_params, layer name) in drawing order.
+
+    Example:
+        >>> for image, vis, name in comparison_layers(-122.4, 37.8, 2017, 2024):
+        ...     backend.add_layer(m, image, vis, name)
+    """
+    if bands is None:
+        bands = ["A01", "A16", "A09"]
+
+    # Load images for both years
+    backend = backend or get_backend()
+    image1 = backend.load(lon, lat, year1)
+    image2 = backend.load(lon, lat, year2)
+
+    vis_params = get_vis_params(bands)
+    layers = [
+        (image1, vis_params, f"AlphaEarth {year1}"),
+        (image2, vis_params, f"AlphaEarth {year2}"),
+    ]
+    if change:
+        change_image = backend.calculate_change(image1, image2)
+        layers.append((change_image, get_similarity_vis(), "Change Detection"))
+    return layers
+
+
+@traced("core.calculate_change")
+def calculate_change(image1: Any, image2: Any) -> Any:
     """
     Calculate similarity/change between two embedding images using dot product.
 
@@ -149,42 +224,33 @@ def calculate_change(image1: ee.Image, image2: ee.Image) -> ee.Image:
     - Values closer to 1 indicate high similarity (stable areas)
     - Values closer to 0 indicate low similarity (changed areas)
 
+    Earth Engine images produce an Earth Engine expression; local Rasters
+    are computed immediately with NumPy.
+
     Args:
-        image1: First ee.Image with AlphaEarth embeddings.
-        image2: Second ee.Image with AlphaEarth embeddings.
+        image1: First ee.Image or Raster with AlphaEarth embeddings.
+        image2: Second ee.Image or Raster with AlphaEarth embeddings.
 
     Returns:
-        An ee.Image with similarity values (0-1, higher = more similar).
+        An ee.Image or Raster with similarity values (0-1, higher = more similar).
 
     Example:
         >>> img1 = load_embeddings(-122.4, 37.8, 2017)
         >>> img2 = load_embeddings(-122.4, 37.8, 2024)
         >>> change = calculate_change(img1, img2)
     """
-    # Get all band names (A01-A64)
-    band_names = [f"A{str(i).zfill(2)}" for i in range(1, 65)]
-
-    # Select embedding bands
-    emb1 = image1.select(band_names)
-    emb2 = image2.select(band_names)
-
-    # Calculate dot product (sum of element-wise multiplication)
-    dot_product = emb1.multiply(emb2).reduce(ee.Reducer.sum())
-
-    # Normalize to 0-1 range (embeddings are typically normalized)
-    # Clamp to handle any edge cases
-    similarity = dot_product.clamp(0, 1)
-
-    return similarity.rename("similarity")
+    return backend_for(image1).calculate_change(image1, image2)
 
 
+@traced("core.analyze_location")
 def analyze_location(
     lon: float,
     lat: float,
     year1: int = 2017,
     year2: int = 2024,
     zoom: int = 12,
-) -> leafmap.Map:
+    backend: Optional[EmbeddingBackend] = None,
+) -> "leafmap.Map":
     """
     Perform full analysis with embeddings and change detection for a location.
 
@@ -199,6 +265,8 @@ def analyze_location(
         year1: First year for comparison. Defaults to 2017.
         year2: Second year for comparison. Defaults to 2024.
         zoom: Initial zoom level. Defaults to 12.
+        backend: Backend to load embeddings from. Defaults to the backend
+            set with ``set_backend``.
 
     Returns:
         A leafmap Map object with embeddings and change detection layers.
@@ -210,88 +278,116 @@ def analyze_location(
     validate_year(year1)
     validate_year(year2)
 
+    import leafmap.maplibregl as leafmap
+
     # Create map centered on location
     m = leafmap.Map(center=[lat, lon], zoom=zoom)
     m.add_basemap("USGS.Imagery")
 
-    # Load images for both years
-    dataset = get_dataset()
-    image1 = dataset.filter(ee.Filter.eq("year", year1)).first()
-    image2 = dataset.filter(ee.Filter.eq("year", year2)).first()
-
-    # Default band visualization
-    bands = ["A01", "A16", "A09"]
-    vis_params = get_vis_params(bands)
-
-    # Add embedding layers
-    m.add_ee_layer(image1, vis_params, f"AlphaEarth {year1}")
-    m.add_ee_layer(image2, vis_params, f"AlphaEarth {year2}")
-
-    # Calculate and add change detection layer
-    change = calculate_change(image1, image2)
-    change_vis = get_similarity_vis()
-    m.add_ee_layer(change, change_vis, "Change Detection")
+    # Add embedding layers and the change detection layer
+    backend = backend or get_backend()
+    layers = comparison_layers(lon, lat, year1, year2, backend=backend, change=True)
+    for image, vis_params, name in layers:
+        backend.add_layer(m, image, vis_params, name)
 
     m.add_layer_control()
 
     return m
 
 
+@traced("core.explore_bands")
 def explore_bands(
     lon: float,
     lat: float,
     year: int = 2024,
-    band_combo: Optional[List[int]] = None,
+    band_combo: Optional[Union[List[int], str]] = None,
     zoom: int = 12,
-) -> leafmap.Map:
+    backend: Optional[EmbeddingBackend] = None,
+    auto_stretch: bool = False,
+    catalog: Optional[StatsCatalog] = None,
+    components: Optional[ComponentCatalog] = None,
+) -> "leafmap.Map":
     """
     Visualize custom band combinations from AlphaEarth embeddings.
 
     The 64 embedding bands capture different semantic features of the Earth's
-    surface. Different combinations can highlight different aspects.
+    surface. Different combinations can highlight different aspects. With
+    ``band_combo="pca"`` the first three principal components of the
+    embeddings around the location are shown instead, which usually carry
+    most of the information of all 64 bands.
 
     Args:
         lon: Longitude of the center location (degrees).
         lat: Latitude of the center location (degrees).
         year: Year to visualize. Defaults to 2024.
-        band_combo: List of 3 band numbers (1-64) to use as RGB.
-                   Defaults to [1, 16, 9].
+        band_combo: List of 3 band numbers (1-64) to use as RGB, or "pca"
+                   for a principal-component composite. Defaults to [1, 16, 9].
         zoom: Initial zoom level. Defaults to 12.
+        backend: Backend to load embeddings from. Defaults to the backend
+            set with ``set_backend``.
+        auto_stretch: Stretch the bands to their 2nd-98th percentiles from
+            the band statistics catalogue instead of the fixed [-0.3, 0.3]
+            range. Falls back to the fixed range when nothing is catalogued
+            for the year. Defaults to False.
+        catalog: StatsCatalog to look statistics up in. Defaults to the
+            catalogue in the package cache directory, opened once and shared
+            across calls.
+        components: ComponentCatalog caching the principal components of
+            each region and year. Defaults to the shared cache in the
+            package cache directory.
 
     Returns:
         A leafmap Map object with the custom band visualization.
 
     Example:
         >>> m = explore_bands(lon=-122.4, lat=37.8, year=2024, band_combo=[1, 16, 9])
-        >>> m
+        >>> m = explore_bands(lon=-122.4, lat=37.8, year=2024, band_combo="pca")
     """
     validate_year(year)
 
     if band_combo is None:
         band_combo = [1, 16, 9]
 
-    if len(band_combo) != 3:
+    if isinstance(band_combo, str):
+        if band_combo != "pca":
+            raise ValueError(f'band_combo must be a list of band numbers or "pca", got {band_combo!r}')
+    elif len(band_combo) != 3:
         raise ValueError("band_combo must contain exactly 3 band numbers")
+    else:
+        for band in band_combo:
+            if not 1 <= band <= 64:
+                raise ValueError(f"Band number {band} must be between 1 and 64")
 
-    for band in band_combo:
-        if not 1 <= band <= 64:
-            raise ValueError(f"Band number {band} must be between 1 and 64")
+    import leafmap.maplibregl as leafmap
 
     # Create map centered on location
     m = leafmap.Map(center=[lat, lon], zoom=zoom)
     m.add_basemap("USGS.Imagery")
 
     # Load image
-    dataset = get_dataset()
-    image = dataset.filter(ee.Filter.eq("year", year)).first()
+    backend = backend or get_backend()
+    image = backend.load(lon, lat, year)
+
+    if band_combo == "pca":
+        # Components of the region in view, cached per region and year
+        bbox, scale = view_region(lon, lat, zoom)
+        basis = (components or get_component_catalog()).components(bbox, year, backend, scale)
+        backend.add_layer(
+            m, backend.project_components(image, basis), basis.vis_params(), "Principal components"
+        )
+        m.add_layer_control()
+        return m
 
     # Format band names and create visualization
     bands = format_band_names(band_combo)
-    vis_params = get_vis_params(bands)
+    stats = None
+    if auto_stretch:
+        stats = (catalog or get_stats_catalog()).lookup(lon, lat, year)
+    vis_params = get_vis_params(bands, stats=stats)
 
     # Add layer
     band_str = ", ".join([str(b) for b in band_combo])
-    m.add_ee_layer(image, vis_params, f"Bands [{band_str}]")
+    backend.add_layer(m, image, vis_params, f"Bands [{band_str}]")
 
     m.add_layer_control()
 
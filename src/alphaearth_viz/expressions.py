@@ -0,0 +1,286 @@
+"""
+Memoized construction of Earth Engine expressions.
+
+Building an Earth Engine expression is cheap once, but a batch over
+thousands of sites rebuilds the same collection filters, band selections
+and similarity expressions for every site, and each rebuilt graph is a new
+object that is serialized again when it is sent. An
+:class:`ExpressionCache` builds each expression once and hands out the same
+object for every later request with the same structure.
+
+Every memoized expression is keyed by a description of how it was built,
+e.g. ``("select", ("mosaic", 2024, ("tiles", ("a", "b"))), bands)``, so
+identical subgraphs resolve to one shared object whichever call site asks
+for them. Images built elsewhere are keyed by identity.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import itertools
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Optional, Sequence
+
+from .instrumentation import cache_lookup
+from .utils import get_all_band_names, get_dataset, validate_year
+
+if TYPE_CHECKING:
+    import ee
+
+
+# Default number of memoized expressions kept per cache
+DEFAULT_MAX_ENTRIES = 4096
+
+_EMBEDDING_BANDS = tuple(get_all_band_names())
+
+
+class ExpressionCache:
+    """
+    Bounded, thread-safe memo of Earth Engine expressions.
+
+    Args:
+        max_entries: Number of expressions kept; the least recently used
+            are dropped beyond it. Defaults to 4096.
+
+    Example:
+        >>> expressions = ExpressionCache()
+        >>> image = expressions.mosaic(2024)
+        >>> expressions.mosaic(2024) is image
+        True
+        >>> change = expressions.similarity(expressions.mosaic(2017), image)
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._keys: Dict[int, Hashable] = {}
+        self._counter = itertools.count()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def year_collection(self, year: int) -> "ee.ImageCollection":
+        """
+        Get the annual collection for a year.
+
+        Args:
+            year: Year to filter on (2017-2024).
+
+        Returns:
+            The filtered ImageCollection.
+        """
+        import ee
+
+        validate_year(year)
+        return self._memo(
+            ("year", year),
+            lambda: get_dataset().filter(ee.Filter.eq("year", year)),
+        )
+
+    def image_at(
+        self,
+        lon: float,
+        lat: float,
+        year: int,
+        tile_ids: Optional[Sequence[str]] = None,
+    ) -> "ee.Image":
+        """
+        Get the annual tile covering a point.
+
+        With ``tile_ids`` the tile is selected by ID, so every point inside
+        the same tile shares one expression; otherwise the collection is
+        filtered by the point geometry.
+
+        Args:
+            lon: Longitude of the point (degrees).
+            lat: Latitude of the point (degrees).
+            year: Year to load.
+            tile_ids: IDs of the covering tiles, e.g. from a TileIndex.
+
+        Returns:
+            The first matching ee.Image.
+        """
+        import ee
+
+        collection = self.year_collection(year)
+        if tile_ids is not None:
+            ids = tuple(tile_ids)
+            return self._memo(
+                ("first", year, ("tiles", ids)),
+                lambda: collection.filter(ee.Filter.inList("system:index", list(ids))).first(),
+            )
+        point = (float(lon), float(lat))
+        return self._memo(
+            ("first", year, ("point", point)),
+            lambda: collection.filterBounds(ee.Geometry.Point(list(point))).first(),
+        )
+
+    def mosaic(
+        self,
+        year: int,
+        bbox: Optional[Sequence[float]] = None,
+        tile_ids: Optional[Sequence[str]] = None,
+    ) -> "ee.Image":
+        """
+        Get the mosaic of a year's tiles.
+
+        Args:
+            year: Year to mosaic.
+            bbox: Optional (west, south, east, north) box the tiles must
+                intersect. Ignored when ``tile_ids`` is given.
+            tile_ids: Optional IDs of the tiles to mosaic.
+
+        Returns:
+            The mosaicked ee.Image (of the whole year when neither filter
+            is given).
+        """
+        import ee
+
+        collection = self.year_collection(year)
+        if tile_ids is not None:
+            ids = tuple(tile_ids)
+            return self._memo(
+                ("mosaic", year, ("tiles", ids)),
+                lambda: collection.filter(ee.Filter.inList("system:index", list(ids))).mosaic(),
+            )
+        if bbox is not None:
+            box = tuple(float(v) for v in bbox)
+            return self._memo(
+                ("mosaic", year, ("bbox", box)),
+                lambda: collection.filterBounds(ee.Geometry.Rectangle(list(box))).mosaic(),
+            )
+        return self._memo(("mosaic", year), collection.mosaic)
+
+    def select(self, image: "ee.Image", bands: Optional[Sequence[str]] = None) -> "ee.Image":
+        """
+        Select bands of an image.
+
+        Args:
+            image: Image to select from.
+            bands: Band names. Defaults to the 64 embedding bands.
+
+        Returns:
+            The band selection.
+        """
+        names = tuple(bands) if bands is not None else _EMBEDDING_BANDS
+        return self._memo(
+            ("select", self.key_of(image), names),
+            lambda: image.select(list(names)),
+        )
+
+    def similarity(self, image1: "ee.Image", image2: "ee.Image") -> "ee.Image":
+        """
+        Get the clamped dot-product similarity of two embedding images.
+
+        The dot product is symmetric, so the expression for (a, b) is also
+        used for (b, a).
+
+        Args:
+            image1: First image with the 64 embedding bands.
+            image2: Second image with the 64 embedding bands.
+
+        Returns:
+            Single-band "similarity" image with values in [0, 1].
+        """
+        import ee
+
+        key1, key2 = self.key_of(image1), self.key_of(image2)
+        if repr(key2) < repr(key1):
+            image1, image2, key1, key2 = image2, image1, key2, key1
+
+        def build() -> "ee.Image":
+            emb1 = self.select(image1)
+            emb2 = self.select(image2)
+            dot_product = emb1.multiply(emb2).reduce(ee.Reducer.sum())
+            return dot_product.clamp(0, 1).rename("similarity")
+
+        return self._memo(("similarity", key1, key2), build)
+
+    def key_of(self, image: Any) -> Hashable:
+        """
+        Get the structural key of an expression.
+
+        Expressions built by this cache are keyed by how they were built.
+        Other objects get a fresh key and are kept alive while cached, so
+        the key cannot be reused by another object.
+
+        Args:
+            image: An Earth Engine object.
+
+        Returns:
+            A hashable key.
+        """
+        with self._lock:
+            key = self._keys.get(id(image))
+            if key is None:
+                key = ("object", next(self._counter))
+                self._store(key, image)
+            return key
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        Returns:
+            Dictionary with hits, misses, hit_rate and entries.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+    def clear(self) -> None:
+        """Drop every memoized expression and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _memo(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                cache_lookup("ee_expressions", True)
+                return value
+            self.misses += 1
+            cache_lookup("ee_expressions", False)
+            value = build()
+            self._store(key, value)
+            return value
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = value
+        self._keys[id(value)] = key
+        while len(self._entries) > self.max_entries:
+            old_key, old_value = self._entries.popitem(last=False)
+            if self._keys.get(id(old_value)) == old_key:
+                del self._keys[id(old_value)]
+
+
+_shared: Optional[ExpressionCache] = None
+
+
+def get_expression_cache() -> ExpressionCache:
+    """
+    Get the expression cache shared by Earth Engine backends by default.
+
+    Returns:
+        The process-wide ExpressionCache.
+    """
+    global _shared
+    if _shared is None:
+        _shared = ExpressionCache()
+    return _shared
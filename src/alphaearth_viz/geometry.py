@@ -0,0 +1,152 @@
+"""
+Geometry helpers for local AlphaEarth rasters.
+
+Local rasters use a regular longitude/latitude grid, so a pixel's ground
+area depends on its row. These helpers compute per-row pixel areas, buffer
+points into bounding boxes and rasterize polygons with a scan-line fill.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import math
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+Bounds = Tuple[float, float, float, float]
+
+# Mean Earth radius in metres
+EARTH_RADIUS = 6371008.8
+
+
+def pixel_areas(bounds: Sequence[float], shape: Sequence[int]) -> np.ndarray:
+    """
+    Ground area of the pixels in each row of a longitude/latitude grid.
+
+    Uses the exact spherical area of each latitude band, so it stays
+    accurate for large pixels and high latitudes.
+
+    Args:
+        bounds: Grid extent as (west, south, east, north) in degrees.
+        shape: Grid dimensions as (height, width).
+
+    Returns:
+        Float64 array of length height with the area of one pixel in each
+        row, in square metres, ordered north to south.
+
+    Example:
+        >>> pixel_areas((0, 0, 1, 1), (1, 1))
+        array([1.23633e+10])
+    """
+    west, south, east, north = bounds
+    height, width = shape[:2]
+    edges = np.radians(np.linspace(north, south, height + 1))
+    d_lon = math.radians((east - west) / width)
+    return EARTH_RADIUS**2 * d_lon * (np.sin(edges[:-1]) - np.sin(edges[1:]))
+
+
+def point_bbox(lon: float, lat: float, radius: float) -> Bounds:
+    """
+    Bounding box of a square buffer around a point.
+
+    Args:
+        lon: Longitude of the point (degrees).
+        lat: Latitude of the point (degrees).
+        radius: Half the side of the square, in metres.
+
+    Returns:
+        Bounding box as (west, south, east, north) in degrees.
+    """
+    d_lat = math.degrees(radius / EARTH_RADIUS)
+    d_lon = d_lat / max(math.cos(math.radians(lat)), 1e-6)
+    return (lon - d_lon, lat - d_lat, lon + d_lon, lat + d_lat)
+
+
+def ring_bbox(ring: Sequence[Sequence[float]]) -> Bounds:
+    """Bounding box of a polygon ring given as (lon, lat) vertices."""
+    lons = [point[0] for point in ring]
+    lats = [point[1] for point in ring]
+    return (min(lons), min(lats), max(lons), max(lats))
+
+
+def scanline_spans(
+    ring: Sequence[Sequence[float]],
+    bounds: Sequence[float],
+    shape: Sequence[int],
+) -> np.ndarray:
+    """
+    Pixel spans covered by a polygon, one or more per scan line.
+
+    A pixel is inside the polygon when its centre is, using the even-odd
+    rule, so holes can be encoded by including their rings. All edge and
+    scan-line crossings are computed at once rather than row by row.
+
+    Args:
+        ring: Polygon vertices as (lon, lat) pairs. The ring may be open or closed.
+        bounds: Grid extent as (west, south, east, north) in degrees.
+        shape: Grid dimensions as (height, width).
+
+    Returns:
+        Int64 array of shape (spans, 3) whose rows (row, col0, col1) cover
+        columns col0 to col1 - 1, ordered by row and column.
+    """
+    west, south, east, north = bounds
+    height, width = shape[:2]
+    x_size = (east - west) / width
+    y_size = (north - south) / height
+
+    vertices = np.asarray(ring, dtype=np.float64).reshape(-1, 2)
+    x0, y0 = vertices[:, 0], vertices[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    keep = y0 != y1
+    x0, y0, x1, y1 = x0[keep], y0[keep], x1[keep], y1[keep]
+    if not len(x0):
+        return np.empty((0, 3), dtype=np.int64)
+
+    # Candidate rows of each edge, one row wider on each side; the exact
+    # crossing test below drops the extra ones
+    low, high = np.minimum(y0, y1), np.maximum(y0, y1)
+    first = np.clip(np.floor((north - high) / y_size - 0.5), 0, height).astype(np.int64)
+    stop = np.clip(np.floor((north - low) / y_size - 0.5) + 2, 0, height).astype(np.int64)
+    counts = np.maximum(stop - first, 0)
+    edges = np.repeat(np.arange(len(x0)), counts)
+    rows = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+    y = north - (rows + 0.5) * y_size
+    crosses = (y0[edges] <= y) != (y1[edges] <= y)
+    edges, rows, y = edges[crosses], rows[crosses], y[crosses]
+    t = (y - y0[edges]) / (y1[edges] - y0[edges])
+    xs = x0[edges] + t * (x1[edges] - x0[edges])
+
+    # Each scan line crosses the closed ring an even number of times, so
+    # consecutive crossings in (row, x) order pair up into spans
+    order = np.lexsort((xs, rows))
+    rows, xs = rows[order], xs[order]
+    # Columns whose centre lies in [x_left, x_right)
+    cols = np.clip(np.ceil((xs - west) / x_size - 0.5).astype(np.int64), 0, width)
+    spans = np.stack([rows[0::2], cols[0::2], cols[1::2]], axis=1)
+    return spans[spans[:, 2] > spans[:, 1]]
+
+
+def polygon_mask(
+    ring: Sequence[Sequence[float]],
+    bounds: Sequence[float],
+    shape: Sequence[int],
+) -> np.ndarray:
+    """
+    Boolean mask of the pixels whose centre lies inside a polygon.
+
+    Args:
+        ring: Polygon vertices as (lon, lat) pairs.
+        bounds: Grid extent as (west, south, east, north) in degrees.
+        shape: Grid dimensions as (height, width).
+
+    Returns:
+        Boolean array of shape (height, width).
+    """
+    mask = np.zeros(tuple(shape[:2]), dtype=bool)
+    for row, col0, col1 in scanline_spans(ring, bounds, shape):
+        mask[row, col0:col1] = True
+    return mask
@@ -0,0 +1,351 @@
+"""
+Incremental ingestion of new AlphaEarth years.
+
+Derived products (per-band statistics, change maps between consecutive
+years and their similarity pyramids) are expensive to compute, and each
+new annual layer only adds a few of them: one year of statistics and one
+new consecutive-year pair. :func:`ingest_years` discovers the years the
+backend actually holds, instead of relying on the release-time year
+constants, computes only the products missing from a manifest and merges
+them into the existing stores.
+
+Products are kept under one directory::
+
+    <directory>/manifest.json                      what has been computed
+    <directory>/band_stats/<year>/<tile>.npz       StatsCatalog entries
+    <directory>/change/<year1>_<year2>/<tile>/     similarity ChunkStores
+    <directory>/pyramid/<year1>_<year2>/<tile>/    SimilarityPyramid overviews
+
+With a LocalBackend every cached tile is processed; with any other backend
+a ``bbox`` is required and the region is processed as a single "region"
+tile.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import json
+import os
+import shutil
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .backends import EmbeddingBackend, LocalBackend, get_backend
+from .compute import similarity_chunked
+from .pyramid import SimilarityPyramid
+from .stats import BandStatistics, StatsCatalog
+from .store import ChunkStore
+from .streaming import ChunkGrid, fetch_chunk, stream_change
+from .utils import DEFAULT_CACHE_DIR, register_years
+
+
+DEFAULT_PRODUCTS_DIR = os.path.join(DEFAULT_CACHE_DIR, "products")
+
+# Products computed by default, in dependency order
+PRODUCTS = ("stats", "change", "pyramid")
+
+# Tile name used for products of a bounding box
+REGION = "region"
+
+
+class Manifest:
+    """
+    JSON record of the products already computed.
+
+    Keys look like ``"stats/2024/<tile>"``, ``"change/2024-2025/<tile>"`` or
+    ``"pyramid/2024-2025/<tile>"``; each maps to a dict of details such as
+    the output path, the version of its source data and the time it was
+    recorded.
+
+    Args:
+        path: Manifest file. Loaded if it exists.
+
+    Example:
+        >>> manifest = Manifest("products/manifest.json")
+        >>> "change/2024-2025/region" in manifest
+        False
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.years: List[int] = []
+        self.products: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as fh:
+                payload = json.load(fh)
+            self.years = payload.get("years", [])
+            self.products = payload.get("products", {})
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.products
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Details recorded for a product, or None."""
+        return self.products.get(key)
+
+    def record(self, key: str, **details: Any) -> None:
+        """
+        Mark a product as computed and save the manifest.
+
+        Args:
+            key: Product key.
+            **details: JSON-serialisable details stored with the product.
+        """
+        self.products[key] = {"recorded": time.time(), **details}
+        self.save()
+
+    def set_years(self, years: Sequence[int]) -> None:
+        """Record the years products have been computed for and save."""
+        self.years = sorted(int(year) for year in years)
+        self.save()
+
+    def save(self) -> None:
+        """Write the manifest atomically."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        payload = {"version": 1, "years": self.years, "products": self.products}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(payload, fh, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def discover_years(backend: Optional[EmbeddingBackend] = None) -> List[int]:
+    """
+    List the years a backend holds data for and accept them as valid.
+
+    Args:
+        backend: Backend to ask. Defaults to the backend set with
+            ``set_backend``.
+
+    Returns:
+        Sorted list of available years.
+
+    Example:
+        >>> discover_years()
+        [2017, 2018, 2019, 2020, 2021, 2022, 2023, 2024, 2025]
+    """
+    backend = backend or get_backend()
+    years = sorted(set(int(year) for year in backend.available_years()))
+    register_years(years)
+    return years
+
+
+def consecutive_pairs(years: Sequence[int]) -> List[Tuple[int, int]]:
+    """
+    Pair each year with the next available one.
+
+    Args:
+        years: Available years.
+
+    Returns:
+        List of (year, next_year) pairs in ascending order.
+
+    Example:
+        >>> consecutive_pairs([2023, 2024, 2025])
+        [(2023, 2024), (2024, 2025)]
+    """
+    years = sorted(set(years))
+    return list(zip(years[:-1], years[1:]))
+
+
+def ingest_years(
+    backend: Optional[EmbeddingBackend] = None,
+    directory: str = DEFAULT_PRODUCTS_DIR,
+    bbox: Optional[Sequence[float]] = None,
+    products: Sequence[str] = PRODUCTS,
+    scale: float = 10.0,
+    chunk_pixels: Optional[int] = None,
+    progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Compute the derived products that are missing for the available years.
+
+    Running it again after a new year is published computes that year's
+    statistics and the change map and pyramid of the new consecutive pair
+    only; everything recorded in the manifest is skipped. Products of an
+    interrupted run are resumed or recomputed. Each product records the
+    version of the embeddings it was derived from (``tile_version`` of
+    the cached tiles, or the backend's ``data_version`` of the region), and
+    products whose embeddings have changed since are recomputed.
+
+    Args:
+        backend: Backend to read embeddings from. Defaults to the backend
+            set with ``set_backend``.
+        directory: Directory holding the products and manifest.
+        bbox: Region as (west, south, east, north) in degrees. Required
+            unless the backend is a LocalBackend, whose cached tiles are
+            processed one by one.
+        products: Products to keep up to date, from "stats", "change" and
+            "pyramid". Defaults to all three.
+        scale: Pixel size in metres for region products. Defaults to 10.
+        chunk_pixels: Chunk side in pixels for region products. Defaults
+            to the backend's ``chunk_pixels()``.
+        progress: Optional callback called with each product key as it is
+            computed.
+
+    Returns:
+        Dict with "years" (available), "new_years" (not seen by earlier
+        runs), "computed" (product keys computed now) and "skipped" (number
+        of products already up to date).
+
+    Raises:
+        ValueError: If ``bbox`` is missing for a non-local backend, or
+            differs from the region of existing products.
+
+    Example:
+        >>> report = ingest_years(LocalBackend("~/alphaearth_cache"))
+        >>> report["new_years"], report["computed"]
+        ([2025], ['stats/2025/sf', 'change/2024-2025/sf', 'pyramid/2024-2025/sf'])
+    """
+    backend = backend or get_backend()
+    chunk_pixels = chunk_pixels or backend.chunk_pixels()
+    unknown = set(products) - set(PRODUCTS)
+    if unknown:
+        raise ValueError(f"Unknown products: {sorted(unknown)}")
+    tiled = bbox is None
+    if tiled and not isinstance(backend, LocalBackend):
+        raise ValueError("bbox is required unless the backend is a LocalBackend")
+
+    manifest = Manifest(os.path.join(directory, "manifest.json"))
+    years = discover_years(backend)
+    new_years = [year for year in years if year not in manifest.years]
+    computed: List[str] = []
+    skipped = 0
+
+    def tiles(year: int) -> List[Tuple[str, Sequence[float]]]:
+        if tiled:
+            return backend.tile_index.tiles(year)
+        return [(REGION, tuple(bbox))]
+
+    def version(tile_id: str, *product_years: int) -> str:
+        # Version of the embeddings a product is derived from
+        if tiled:
+            return ";".join(backend.tile_version(year, tile_id) for year in product_years)
+        return backend.data_version(bbox, product_years)
+
+    def pending(key: str, current: str) -> bool:
+        nonlocal skipped
+        details = manifest.get(key)
+        if details is None:
+            return True
+        if not tiled and details.get("bbox") != list(bbox):
+            raise ValueError(f"{key} was computed for a different region: {details.get('bbox')}")
+        if details.get("version") != current:
+            # The embeddings changed: drop the stale output, don't resume it
+            if details.get("path") and os.path.isdir(details["path"]):
+                shutil.rmtree(details["path"])
+            return True
+        skipped += 1
+        return False
+
+    def done(key: str, current: str, **details: Any) -> None:
+        if not tiled:
+            details["bbox"] = list(bbox)
+        manifest.record(key, version=current, **details)
+        computed.append(key)
+        if progress is not None:
+            progress(key)
+
+    if "stats" in products:
+        catalog = StatsCatalog(os.path.join(directory, "band_stats"))
+        for year in years:
+            for tile_id, bounds in tiles(year):
+                key = f"stats/{year}/{tile_id}"
+                current = version(tile_id, year)
+                if not pending(key, current):
+                    continue
+                if tiled:
+                    catalog.compute(backend.open_tile(year, tile_id), year, tile_id, bounds)
+                else:
+                    stats = _region_statistics(backend, bbox, year, scale, chunk_pixels)
+                    catalog.add(year, tile_id, stats, ChunkGrid(bbox, scale).bounds)
+                done(key, current)
+
+    for year1, year2 in consecutive_pairs(years):
+        pair = f"{year1}-{year2}"
+        shared = {tile_id for tile_id, _ in tiles(year1)}
+        for tile_id, _ in tiles(year2):
+            if tile_id not in shared:
+                continue
+            change_path = os.path.join(directory, "change", f"{year1}_{year2}", tile_id)
+            current = version(tile_id, year1, year2)
+
+            if "change" in products and pending(f"change/{pair}/{tile_id}", current):
+                if tiled:
+                    _tile_change(backend, year1, year2, tile_id, change_path)
+                else:
+                    stream_change(
+                        bbox, year1, year2, change_path,
+                        scale=scale, chunk_pixels=chunk_pixels, backend=backend,
+                    )
+                done(f"change/{pair}/{tile_id}", current, path=change_path)
+
+            if "pyramid" in products and pending(f"pyramid/{pair}/{tile_id}", current):
+                if not ChunkStore.exists(change_path):
+                    continue
+                pyramid_path = os.path.join(directory, "pyramid", f"{year1}_{year2}", tile_id)
+                SimilarityPyramid.build(ChunkStore.open(change_path), path=pyramid_path)
+                done(f"pyramid/{pair}/{tile_id}", current, path=pyramid_path)
+
+    manifest.set_years(years)
+    return {
+        "years": years,
+        "new_years": new_years,
+        "computed": computed,
+        "skipped": skipped,
+    }
+
+
+def _tile_change(
+    backend: LocalBackend,
+    year1: int,
+    year2: int,
+    tile_id: str,
+    path: str,
+) -> ChunkStore:
+    # Similarity of one cached tile between two years, chunk by chunk when
+    # both tiles hold float embeddings on the same grid
+    store1 = backend.open_tile(year1, tile_id)
+    store2 = backend.open_tile(year2, tile_id)
+    quantized = "quantization" in store1.attrs or "quantization" in store2.attrs
+    if not quantized and store1.shape == store2.shape and store1.chunks == store2.chunks:
+        return similarity_chunked(store1, store2, path)
+
+    change = backend.calculate_change(
+        backend._tile_raster(year1, tile_id), backend._tile_raster(year2, tile_id)
+    )
+    out = ChunkStore.create(
+        path,
+        change.shape,
+        "float32",
+        chunks=store1.chunks,
+        attrs={
+            "bounds": store1.attrs["bounds"],
+            "year1": year1,
+            "year2": year2,
+            "band_names": ["similarity"],
+        },
+    )
+    out.write(change.data)
+    return out
+
+
+def _region_statistics(
+    backend: EmbeddingBackend,
+    bbox: Sequence[float],
+    year: int,
+    scale: float,
+    chunk_pixels: int,
+) -> BandStatistics:
+    # Band statistics of a region, fetched and accumulated chunk by chunk
+    grid = ChunkGrid(bbox, scale=scale, chunk_pixels=chunk_pixels)
+    stats = BandStatistics()
+    for chunk_row, chunk_col in grid:
+        raster = fetch_chunk(backend, grid, chunk_row, chunk_col, year)
+        if raster is not None:
+            stats.update(raster)
+    return stats
@@ -0,0 +1,393 @@
+"""
+Opt-in timing spans and counters for the hot paths.
+
+Tracing is off by default. While it is off, instrumented functions only
+check a module-level variable before running, so the overhead is a single
+attribute lookup per call. Once enabled with :func:`enable_tracing` or the
+:func:`tracing` context manager, a :class:`Tracer` records:
+
+- spans: nested wall-clock intervals with a name, thread and attributes,
+  e.g. ``core.analyze_location`` > ``ee.add_layer``;
+- counters: remote calls, bytes transferred and other totals;
+- cache lookups: hits and misses per cache, reported as hit rates.
+
+A trace can be exported as JSON or in the Chrome trace event format, which
+opens in ``chrome://tracing`` or https://ui.perfetto.dev.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Tracer receiving events, or None while tracing is disabled
+_active: Optional["Tracer"] = None
+
+
+class _NullSpan:
+    """Context manager standing in for a span while tracing is disabled."""
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+    def set(self, **attrs: Any) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    A timed interval recorded by a :class:`Tracer`.
+
+    Use it as a context manager; attributes can be added while it is open
+    with :meth:`set`.
+    """
+
+    __slots__ = ("tracer", "name", "attrs", "start", "duration", "thread", "depth")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self.duration = 0.0
+        self.thread = threading.get_ident()
+        self.depth = 0
+
+    def __enter__(self) -> "Span":
+        stack = self.tracer._stack()
+        self.depth = len(stack)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, traceback: Any) -> None:
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._stack().pop()
+        self.tracer._finish(self)
+
+    def set(self, **attrs: Any) -> None:
+        """Attach attributes to the span, e.g. a tile count or a byte size."""
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """
+    Collector of spans, counters and cache lookups.
+
+    Example:
+        >>> with tracing() as tracer:
+        ...     m = analyze_location(lon=-122.4, lat=37.8)
+        ...     with span("html"):
+        ...         m.to_html("site.html")
+        >>> tracer.summary()["spans"]["ee.add_layer"]["count"]
+        3
+        >>> tracer.to_chrome_trace("trace.json")
+    """
+
+    def __init__(self) -> None:
+        self.spans: List[Span] = []
+        self.counters: Dict[str, float] = {}
+        self.cache: Dict[str, Dict[str, int]] = {}
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def span(self, name: str, **attrs: Any) -> Span:
+        """
+        Open a span; use the result as a context manager.
+
+        Args:
+            name: Span name, e.g. "core.analyze_location".
+            **attrs: Attributes recorded with the span.
+
+        Returns:
+            The Span.
+        """
+        return Span(self, name, attrs)
+
+    def count(self, name: str, value: float = 1) -> None:
+        """
+        Add to a counter.
+
+        Args:
+            name: Counter name, e.g. "ee.remote_calls".
+            value: Amount to add. Defaults to 1.
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def cache_lookup(self, name: str, hit: bool) -> None:
+        """
+        Record a cache lookup.
+
+        Args:
+            name: Cache name, e.g. "tile_cache".
+            hit: Whether the lookup was served from the cache.
+        """
+        with self._lock:
+            entry = self.cache.setdefault(name, {"hits": 0, "misses": 0})
+            entry["hits" if hit else "misses"] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Aggregate the recorded events.
+
+        Returns:
+            Dict with "spans" (per name: count, total_ms, mean_ms, max_ms),
+            "counters" and "cache" (per cache: hits, misses, hit_rate).
+        """
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+            cache = {name: dict(entry) for name, entry in self.cache.items()}
+
+        totals: Dict[str, Dict[str, float]] = {}
+        for item in spans:
+            entry = totals.setdefault(item.name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += item.duration * 1000
+            entry["max_ms"] = max(entry["max_ms"], item.duration * 1000)
+        for entry in totals.values():
+            entry["mean_ms"] = entry["total_ms"] / entry["count"]
+
+        for entry in cache.values():
+            lookups = entry["hits"] + entry["misses"]
+            entry["hit_rate"] = entry["hits"] / lookups if lookups else 0.0
+
+        return {"spans": totals, "counters": counters, "cache": cache}
+
+    def to_json(self, path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Export the summary and every span as JSON.
+
+        Args:
+            path: File to write. Defaults to only returning the payload.
+
+        Returns:
+            The exported payload.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        payload = self.summary()
+        payload["events"] = [
+            {
+                "name": item.name,
+                "start_ms": (item.start - self.origin) * 1000,
+                "duration_ms": item.duration * 1000,
+                "thread": item.thread,
+                "depth": item.depth,
+                "attrs": item.attrs,
+            }
+            for item in spans
+        ]
+        if path is not None:
+            _write_json(path, payload)
+        return payload
+
+    def to_chrome_trace(self, path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Export spans and counters in the Chrome trace event format.
+
+        Args:
+            path: File to write. Defaults to only returning the payload.
+
+        Returns:
+            The trace as a dict with a "traceEvents" list.
+        """
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+        pid = os.getpid()
+        events = [
+            {
+                "name": item.name,
+                "cat": item.name.split(".", 1)[0],
+                "ph": "X",
+                "ts": (item.start - self.origin) * 1e6,
+                "dur": item.duration * 1e6,
+                "pid": pid,
+                "tid": item.thread,
+                "args": {key: _jsonable(value) for key, value in item.attrs.items()},
+            }
+            for item in spans
+        ]
+        end = max((item.start + item.duration for item in spans), default=self.origin)
+        events.extend(
+            {
+                "name": name,
+                "ph": "C",
+                "ts": (end - self.origin) * 1e6,
+                "pid": pid,
+                "args": {"value": value},
+            }
+            for name, value in sorted(counters.items())
+        )
+        payload = {"traceEvents": events, "displayTimeUnit": "ms"}
+        if path is not None:
+            _write_json(path, payload)
+        return payload
+
+    def reset(self) -> None:
+        """Drop every recorded event."""
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+            self.cache.clear()
+            self.origin = time.perf_counter()
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _finish(self, item: Span) -> None:
+        with self._lock:
+            self.spans.append(item)
+
+
+def enable_tracing(tracer: Optional[Tracer] = None) -> Tracer:
+    """
+    Start recording spans and counters.
+
+    Args:
+        tracer: Tracer to record into. Defaults to a new one.
+
+    Returns:
+        The active Tracer.
+    """
+    global _active
+    _active = tracer if tracer is not None else Tracer()
+    return _active
+
+
+def disable_tracing() -> Optional[Tracer]:
+    """
+    Stop recording.
+
+    Returns:
+        The Tracer that was active, or None.
+    """
+    global _active
+    tracer, _active = _active, None
+    return tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Return the active Tracer, or None while tracing is disabled."""
+    return _active
+
+
+@contextmanager
+def tracing(tracer: Optional[Tracer] = None) -> Iterator[Tracer]:
+    """
+    Record spans and counters for the duration of a ``with`` block.
+
+    Args:
+        tracer: Tracer to record into. Defaults to a new one.
+
+    Yields:
+        The active Tracer.
+
+    Example:
+        >>> with tracing() as tracer:
+        ...     compare_years(lon=-122.4, lat=37.8, year1=2017, year2=2024)
+        >>> tracer.to_json("trace.json")
+    """
+    previous = _active
+    active = enable_tracing(tracer)
+    try:
+        yield active
+    finally:
+        if previous is None:
+            disable_tracing()
+        else:
+            enable_tracing(previous)
+
+
+def span(name: str, **attrs: Any) -> Any:
+    """
+    Open a span on the active tracer; a no-op context manager when disabled.
+
+    Args:
+        name: Span name.
+        **attrs: Attributes recorded with the span.
+
+    Returns:
+        A context manager.
+    """
+    tracer = _active
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, **attrs)
+
+
+def count(name: str, value: float = 1) -> None:
+    """Add to a counter on the active tracer, if any."""
+    tracer = _active
+    if tracer is not None:
+        tracer.count(name, value)
+
+
+def cache_lookup(name: str, hit: bool) -> None:
+    """Record a cache hit or miss on the active tracer, if any."""
+    tracer = _active
+    if tracer is not None:
+        tracer.cache_lookup(name, hit)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """
+    Decorate a function so each call is recorded as a span while tracing.
+
+    Args:
+        name: Span name, e.g. "core.compare_years".
+
+    Returns:
+        The decorator.
+    """
+
+    def decorator(function: F) -> F:
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            tracer = _active
+            if tracer is None:
+                return function(*args, **kwargs)
+            with tracer.span(name):
+                return function(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return repr(value)
+
+
+def _write_json(path: str, payload: Dict[str, Any]) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, default=repr)
+    os.replace(tmp_path, path)
@@ -0,0 +1,508 @@
+"""
+Principal-component composites of the 64 embedding bands.
+
+``explore_bands`` shows three hand-picked bands as RGB. The first three
+principal components of a region carry most of its embedding variance, so
+they make a single information-dense composite without trial renders.
+
+:class:`BandCovariance` accumulates the 64x64 covariance in one streaming
+pass; partial sums of chunks or tiles merge exactly, like
+:class:`~alphaearth_viz.stats.BandStatistics`. Its eigenvectors form a
+:class:`PrincipalComponents` basis that projects each tile to three bands
+with one matrix product, and :class:`ComponentCatalog` keeps the basis of
+every region and year on disk.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import hashlib
+import math
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .backends import EmbeddingBackend, get_backend
+from .compute import DEFAULT_MEMORY_BUDGET, block_rows, iter_row_blocks
+from .quantize import Quantization, missing_codes
+from .raster import Raster
+from .store import ChunkStore
+from .geometry import point_bbox
+from .streaming import ChunkGrid, fetch_chunk
+from .utils import DEFAULT_CACHE_DIR, get_all_band_names
+
+
+DEFAULT_PCA_DIR = os.path.join(DEFAULT_CACHE_DIR, "pca")
+
+# Number of components shown as RGB
+DEFAULT_COMPONENTS = 3
+
+# Metres per web-map pixel at zoom 0 on the equator
+_EQUATOR_RESOLUTION = 156543.03392804097
+
+
+class BandCovariance:
+    """
+    Mergeable covariance of the embedding bands.
+
+    Tracks the pixel count, the band means and the co-moment matrix (sum of
+    outer products of deviations from the mean), combined with Chan's
+    parallel update. Pixels with a NaN in any band are ignored.
+
+    Args:
+        band_names: Names of the bands. Defaults to A01-A64.
+
+    Example:
+        >>> cov = BandCovariance().update(tile_2024_a).merge(BandCovariance().update(tile_2024_b))
+        >>> components = cov.components()
+    """
+
+    def __init__(self, band_names: Optional[List[str]] = None):
+        self.band_names = list(band_names) if band_names is not None else get_all_band_names()
+        bands = len(self.band_names)
+        self.count = 0
+        self.mean = np.zeros(bands)
+        self.comoment = np.zeros((bands, bands))
+
+    def __repr__(self) -> str:
+        return f"BandCovariance(bands={len(self.band_names)}, count={self.count})"
+
+    @property
+    def covariance(self) -> np.ndarray:
+        """Population covariance matrix (NaN without data)."""
+        if self.count == 0:
+            return np.full_like(self.comoment, np.nan)
+        return self.comoment / self.count
+
+    def update(
+        self,
+        data: Any,
+        quantization: Optional[Quantization] = None,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    ) -> "BandCovariance":
+        """
+        Add the pixels of a block, tile or ChunkStore.
+
+        Args:
+            data: Raster, ChunkStore or array of shape (..., bands).
+                ChunkStores are read one chunk at a time.
+            quantization: Parameters to decode int8 array input with.
+                Taken from the Raster or store when not given.
+            memory_budget: Working-memory budget in bytes for one block.
+
+        Returns:
+            The covariance, for chaining.
+        """
+        if isinstance(data, ChunkStore):
+            params = data.attrs.get("quantization")
+            if quantization is None and params is not None:
+                quantization = Quantization.from_dict(params)
+            for chunk_row, chunk_col in data.iter_chunks():
+                self.update(data.read_chunk(chunk_row, chunk_col), quantization, memory_budget)
+            return self
+        if isinstance(data, Raster):
+            quantization = quantization or data.quantization
+            data = data.data
+
+        flat = data.reshape(-1, data.shape[-1])
+        if flat.shape[1] != len(self.band_names):
+            raise ValueError(f"Got {flat.shape[1]} bands, expected {len(self.band_names)}")
+        rows = block_rows(1, flat.shape[1], 8, memory_budget)
+        for row0, row1 in iter_row_blocks(flat.shape[0], rows):
+            block = flat[row0:row1]
+            if quantization is not None:
+                block = quantization.dequantize(block)
+            self._add_block(np.array(block, dtype=np.float64))
+        return self
+
+    def merge(self, other: "BandCovariance") -> "BandCovariance":
+        """
+        Combine two covariances of the same bands into a new one.
+
+        Args:
+            other: Covariance of other pixels.
+
+        Returns:
+            The covariance of all pixels of both inputs.
+        """
+        if other.band_names != self.band_names:
+            raise ValueError("Only covariances of the same bands can be merged")
+        merged = BandCovariance(self.band_names)
+        merged.count = self.count + other.count
+        if merged.count == 0:
+            return merged
+        delta = other.mean - self.mean
+        share = other.count / merged.count
+        merged.mean = self.mean + delta * share
+        merged.comoment = (
+            self.comoment + other.comoment + np.outer(delta, delta) * self.count * share
+        )
+        return merged
+
+    def components(self, n: int = DEFAULT_COMPONENTS) -> "PrincipalComponents":
+        """
+        Leading principal components of the covariance.
+
+        Each eigenvector's sign is chosen so its largest loading is
+        positive, so the same data always gives the same colours.
+
+        Args:
+            n: Number of components. Defaults to 3.
+
+        Returns:
+            The PrincipalComponents basis.
+
+        Raises:
+            ValueError: If no pixels have been added.
+        """
+        if self.count == 0:
+            raise ValueError("Cannot compute components without data")
+        variances, vectors = np.linalg.eigh(self.covariance)
+        order = np.argsort(variances)[::-1][:n]
+        vectors = vectors[:, order].T
+        largest = np.abs(vectors).argmax(axis=1)
+        vectors *= np.sign(vectors[np.arange(len(vectors)), largest])[:, None]
+        return PrincipalComponents(
+            self.mean,
+            vectors,
+            np.maximum(variances[order], 0.0),
+            float(np.trace(self.covariance)),
+            self.band_names,
+        )
+
+    def save(self, path: str, **attrs: Any) -> None:
+        """
+        Write the covariance to a compressed .npz file.
+
+        Args:
+            path: Destination file.
+            **attrs: Extra arrays to store, e.g. ``bbox``.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as fh:
+            np.savez_compressed(
+                fh,
+                band_names=np.array(self.band_names, dtype=str),
+                count=np.int64(self.count),
+                mean=self.mean,
+                comoment=self.comoment,
+                **attrs,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Tuple["BandCovariance", Dict[str, np.ndarray]]:
+        """
+        Read a covariance written with :meth:`save`.
+
+        Args:
+            path: File written by :meth:`save`.
+
+        Returns:
+            Tuple of (covariance, dict of extra arrays).
+        """
+        with np.load(path) as saved:
+            cov = cls(saved["band_names"].tolist())
+            cov.count = int(saved["count"])
+            cov.mean = saved["mean"]
+            cov.comoment = saved["comoment"]
+            extra = {
+                name: saved[name]
+                for name in saved.files
+                if name not in ("band_names", "count", "mean", "comoment")
+            }
+        return cov, extra
+
+    def _add_block(self, block: np.ndarray) -> None:
+        # block is a private float64 copy and is centred in place
+        missing = np.isnan(block).any(axis=1)
+        if missing.any():
+            block = block[~missing]
+        if len(block) == 0:
+            return
+        block_cov = BandCovariance(self.band_names)
+        block_cov.count = len(block)
+        block_cov.mean = block.mean(axis=0)
+        block -= block_cov.mean
+        block_cov.comoment = block.T @ block
+
+        merged = self.merge(block_cov)
+        self.count, self.mean, self.comoment = merged.count, merged.mean, merged.comoment
+
+
+class PrincipalComponents:
+    """
+    Basis projecting embeddings onto their leading principal components.
+
+    Args:
+        mean: Band means subtracted before projecting.
+        vectors: Component loadings, shape (components, bands).
+        variances: Variance along each component.
+        total_variance: Total variance of all bands.
+        band_names: Names of the bands the loadings refer to.
+
+    Example:
+        >>> components = BandCovariance().update(raster).components()
+        >>> rgb = components.project(raster)
+        >>> m.add_raster(..., vis_params=components.vis_params())
+    """
+
+    def __init__(
+        self,
+        mean: Sequence[float],
+        vectors: np.ndarray,
+        variances: Sequence[float],
+        total_variance: float,
+        band_names: Optional[List[str]] = None,
+    ):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.vectors = np.asarray(vectors, dtype=np.float64)
+        self.variances = np.asarray(variances, dtype=np.float64)
+        self.total_variance = total_variance
+        self.band_names = list(band_names) if band_names is not None else get_all_band_names()
+
+    def __repr__(self) -> str:
+        explained = ", ".join(f"{ratio:.0%}" for ratio in self.explained_variance_ratio)
+        return f"PrincipalComponents(explained=[{explained}])"
+
+    @property
+    def names(self) -> List[str]:
+        """Band names of the projected components, e.g. ["PC1", "PC2", "PC3"]."""
+        return [f"PC{i + 1}" for i in range(len(self.vectors))]
+
+    @property
+    def explained_variance_ratio(self) -> np.ndarray:
+        """Share of the total variance along each component."""
+        if self.total_variance <= 0:
+            return np.zeros_like(self.variances)
+        return self.variances / self.total_variance
+
+    def project(
+        self,
+        data: Any,
+        quantization: Optional[Quantization] = None,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    ) -> Any:
+        """
+        Project embeddings onto the components.
+
+        Centring (and int8 decoding) is folded into the weights and an
+        offset, so each block costs a single matrix product. Pixels holding
+        a missing int8 code project to NaN.
+
+        Args:
+            data: Raster or array of shape (..., bands).
+            quantization: Parameters of int8 array input. Taken from the
+                Raster when not given.
+            memory_budget: Working-memory budget in bytes for one block.
+
+        Returns:
+            A Raster with one band per component for Raster input,
+            otherwise a float32 array of shape (..., components).
+        """
+        raster = data if isinstance(data, Raster) else None
+        if raster is not None:
+            quantization = quantization or raster.quantization
+            data = raster.data
+
+        weights = self.vectors.T
+        offset = -self.mean @ weights
+        if quantization is not None:
+            offset = offset + quantization.offset @ weights
+            weights = quantization.scale[:, None] * weights
+        weights = weights.astype(np.float32)
+        offset = offset.astype(np.float32)
+
+        flat = data.reshape(-1, data.shape[-1])
+        out = np.empty((flat.shape[0], len(self.vectors)), dtype=np.float32)
+        rows = block_rows(1, flat.shape[1], 4, memory_budget)
+        for row0, row1 in iter_row_blocks(flat.shape[0], rows):
+            block = flat[row0:row1]
+            np.matmul(block.astype(np.float32), weights, out=out[row0:row1])
+            out[row0:row1] += offset
+            if quantization is not None:
+                out[row0:row1][missing_codes(block)] = np.nan
+        out = out.reshape(data.shape[:-1] + (len(self.vectors),))
+
+        if raster is None:
+            return out
+        return Raster(out, raster.bounds, self.names, year=raster.year)
+
+    def vis_params(self, stddevs: float = 2.0) -> Dict[str, Any]:
+        """
+        Visualization parameters stretching each component symmetrically.
+
+        Args:
+            stddevs: Half-width of the stretch in standard deviations of
+                each component. Defaults to 2.
+
+        Returns:
+            Dictionary with "bands", per-band "min" and per-band "max".
+        """
+        half = stddevs * np.sqrt(self.variances[:3])
+        return {
+            "bands": self.names[:3],
+            "min": [float(-h) for h in half],
+            "max": [float(h) for h in half],
+        }
+
+
+def region_covariance(
+    bbox: Sequence[float],
+    year: int,
+    backend: Optional[EmbeddingBackend] = None,
+    scale: float = 10.0,
+    chunk_pixels: Optional[int] = None,
+) -> BandCovariance:
+    """
+    Accumulate the band covariance of a region chunk by chunk.
+
+    Only one chunk of embeddings is held in memory at a time; the partial
+    sums of each chunk are merged into the result.
+
+    Args:
+        bbox: Region as (west, south, east, north) in degrees.
+        year: Year to read.
+        backend: Backend to fetch from. Defaults to the backend set with
+            ``set_backend``.
+        scale: Pixel size in metres. Defaults to 10.
+        chunk_pixels: Chunk side in pixels. Defaults to the backend's
+            ``chunk_pixels()``: 1024, or 384 on Earth Engine.
+
+    Returns:
+        The BandCovariance of the region.
+
+    Example:
+        >>> cov = region_covariance((-122.5, 37.7, -122.3, 37.9), 2024, scale=30)
+    """
+    backend = backend or get_backend()
+    chunk_pixels = chunk_pixels or backend.chunk_pixels()
+    grid = ChunkGrid(bbox, scale=scale, chunk_pixels=chunk_pixels)
+    cov = BandCovariance()
+    for chunk_row, chunk_col in grid:
+        raster = fetch_chunk(backend, grid, chunk_row, chunk_col, year)
+        if raster is not None:
+            cov.update(raster)
+    return cov
+
+
+class ComponentCatalog:
+    """
+    On-disk cache of principal-component bases per region and year.
+
+    The covariance of each region is stored as
+    ``<directory>/<year>/<region key>.npz``, so the basis is computed once
+    per region and year and then loaded.
+
+    Args:
+        directory: Cache directory. Defaults to ``pca`` in the package
+            cache directory.
+
+    Example:
+        >>> catalog = ComponentCatalog()
+        >>> components = catalog.components((-122.5, 37.7, -122.3, 37.9), 2024, scale=30)
+    """
+
+    def __init__(self, directory: str = DEFAULT_PCA_DIR):
+        self.directory = os.path.expanduser(directory)
+        self._entries: Dict[Tuple[int, str], BandCovariance] = {}
+
+    def components(
+        self,
+        bbox: Sequence[float],
+        year: int,
+        backend: Optional[EmbeddingBackend] = None,
+        scale: float = 10.0,
+        chunk_pixels: Optional[int] = None,
+        n: int = DEFAULT_COMPONENTS,
+    ) -> PrincipalComponents:
+        """
+        Get the principal components of a region, computing them on a miss.
+
+        Args:
+            bbox: Region as (west, south, east, north) in degrees.
+            year: Year of the embeddings.
+            backend: Backend to fetch from on a miss. Defaults to the
+                backend set with ``set_backend``.
+            scale: Pixel size in metres of the covariance pass.
+            chunk_pixels: Chunk side in pixels of the covariance pass.
+                Defaults to the backend's ``chunk_pixels()``.
+            n: Number of components. Defaults to 3.
+
+        Returns:
+            The PrincipalComponents basis.
+        """
+        key = (int(year), region_key(bbox, scale))
+        cov = self._entries.get(key)
+        if cov is None:
+            path = os.path.join(self.directory, str(key[0]), f"{key[1]}.npz")
+            if os.path.exists(path):
+                cov, _ = BandCovariance.load(path)
+            else:
+                cov = region_covariance(bbox, year, backend, scale, chunk_pixels)
+                cov.save(path, bbox=np.asarray(bbox, dtype=np.float64), scale=np.float64(scale))
+            self._entries[key] = cov
+        return cov.components(n)
+
+
+_default_catalog: Optional[ComponentCatalog] = None
+
+
+def get_component_catalog() -> ComponentCatalog:
+    """
+    Get the component cache in the package cache directory, shared by callers.
+
+    Returns:
+        The process-wide ComponentCatalog.
+    """
+    global _default_catalog
+    if _default_catalog is None:
+        _default_catalog = ComponentCatalog()
+    return _default_catalog
+
+
+def view_region(
+    lon: float,
+    lat: float,
+    zoom: int,
+    view_pixels: int = 1024,
+    sample_pixels: int = 256,
+) -> Tuple[Tuple[float, float, float, float], float]:
+    """
+    Region shown by a web map and a scale to sample it at.
+
+    Args:
+        lon: Longitude of the map centre (degrees).
+        lat: Latitude of the map centre (degrees).
+        zoom: Web map zoom level.
+        view_pixels: Assumed width of the map view in screen pixels.
+            Defaults to 1024.
+        sample_pixels: Pixels across the region when sampling it.
+            Defaults to 256.
+
+    Returns:
+        Tuple of (bbox, scale in metres, at least 10).
+
+    Example:
+        >>> bbox, scale = view_region(-122.4, 37.8, zoom=12)
+    """
+    resolution = _EQUATOR_RESOLUTION * math.cos(math.radians(lat)) / 2**zoom
+    radius = resolution * view_pixels / 2
+    return point_bbox(lon, lat, radius), max(10.0, 2 * radius / sample_pixels)
+
+
+def region_key(bbox: Sequence[float], scale: float) -> str:
+    """
+    Stable file name for a region sampled at a scale.
+
+    Args:
+        bbox: Region as (west, south, east, north) in degrees.
+        scale: Pixel size in metres.
+
+    Returns:
+        Hex digest of the rounded bounds and scale.
+    """
+    text = ",".join(f"{value:.6f}" for value in (*bbox, scale))
+    return hashlib.sha1(text.encode("ascii")).hexdigest()[:20]
@@ -0,0 +1,317 @@
+"""
+Multi-resolution similarity pyramids and coarse-to-fine hotspot search.
+
+Most of a large change map is stable, so scanning it at full resolution
+for changed pixels is mostly wasted work. A :class:`SimilarityPyramid`
+stores overviews of a similarity map at successive 2x downsamples, each
+with the mean and the minimum of the pixels it covers. A hotspot search
+starts at the coarsest overview and only descends into cells whose
+minimum is below the change threshold, so stable areas are skipped at
+every level and only the pixels under candidate cells are read at full
+resolution.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .compute import DEFAULT_MEMORY_BUDGET, block_rows, iter_row_blocks
+from .geometry import pixel_areas
+from .raster import Raster
+from .store import ChunkStore
+from .utils import DEFAULT_CHANGE_THRESHOLD
+
+
+Source = Union[Raster, ChunkStore]
+
+# Arrays stored for each overview level
+_FIELDS = ("mean", "min", "count")
+
+
+class SimilarityPyramid:
+    """
+    Mean and minimum overviews of a similarity map at 2x downsamples.
+
+    Level 0 is the full-resolution source; overview level ``n`` has cells
+    of 2**n by 2**n source pixels. Use :meth:`build` to create a pyramid
+    and :meth:`load` to open a saved one.
+
+    Args:
+        source: Full-resolution similarity Raster or ChunkStore.
+        levels: One dict per overview level (1, 2, ...) with "mean", "min"
+            and "count" (valid pixels) arrays.
+
+    Example:
+        >>> store = stream_change(bbox, 2017, 2024, "country_change")
+        >>> pyramid = SimilarityPyramid.build(store, path="country_change/pyramid")
+        >>> hotspots = pyramid.hotspots(threshold=0.7)
+        >>> hotspots["fraction_read"]
+        0.013
+    """
+
+    def __init__(self, source: Source, levels: List[Dict[str, np.ndarray]]):
+        self.source = source
+        self.levels = levels
+
+    def __repr__(self) -> str:
+        return f"SimilarityPyramid(shape={self.shape}, levels={len(self.levels)})"
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """Full-resolution (height, width)."""
+        return tuple(self.source.shape[:2])
+
+    @property
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """Extent of the source as (west, south, east, north)."""
+        if isinstance(self.source, Raster):
+            return self.source.bounds
+        return tuple(self.source.attrs["bounds"])
+
+    @classmethod
+    def build(
+        cls,
+        source: Source,
+        path: Optional[str] = None,
+        min_size: int = 1,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    ) -> "SimilarityPyramid":
+        """
+        Build overviews until the coarsest level is at most ``min_size`` cells wide.
+
+        The source is read once, in row blocks, to build the first overview;
+        each further level is built from the previous one.
+
+        Args:
+            source: Single-band similarity Raster (e.g. ``calculate_change``
+                output) or ChunkStore (e.g. ``stream_change`` output).
+            path: Directory to write the overviews to, as memory-mapped
+                ``.npy`` files. Defaults to keeping them in memory.
+            min_size: Largest side of the coarsest level in cells. Defaults to 1.
+            memory_budget: Working-memory budget in bytes for one block.
+
+        Returns:
+            The SimilarityPyramid.
+        """
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        height, width = source.shape[:2]
+        levels: List[Dict[str, np.ndarray]] = []
+
+        level = 1
+        previous = None
+        while max(height, width) > min_size:
+            height, width = -(-height // 2), -(-width // 2)
+            arrays = _allocate(path, level, (height, width))
+            rows = max(1, block_rows(2 * width, 3, 4, memory_budget) // 2)
+            for row0, row1 in iter_row_blocks(height, rows):
+                if previous is None:
+                    values = np.asarray(_read_rows(source, 2 * row0, 2 * row1), dtype=np.float32)
+                    block = _downsample(values, values, (~np.isnan(values)).astype(np.int32))
+                else:
+                    block = _downsample(
+                        *(previous[name][2 * row0:2 * row1] for name in _FIELDS)
+                    )
+                for name, data in zip(_FIELDS, block):
+                    arrays[name][row0:row1] = data
+            levels.append(arrays)
+            previous = arrays
+            level += 1
+
+        pyramid = cls(source, levels)
+        if path is not None:
+            for arrays in levels:
+                for data in arrays.values():
+                    data.flush()
+            pyramid._write_meta(path)
+        return pyramid
+
+    @classmethod
+    def load(cls, path: str, source: Source) -> "SimilarityPyramid":
+        """
+        Open overviews written by :meth:`build`, memory-mapped.
+
+        Args:
+            path: Directory passed to :meth:`build`.
+            source: The full-resolution source the pyramid was built from.
+
+        Returns:
+            The SimilarityPyramid.
+
+        Raises:
+            ValueError: If ``source`` does not match the saved shape.
+        """
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as fh:
+            meta = json.load(fh)
+        if list(source.shape[:2]) != meta["shape"]:
+            raise ValueError(f"{path} was built from a source of shape {meta['shape']}")
+        levels = [
+            {
+                name: np.load(os.path.join(path, f"{level}.{name}.npy"), mmap_mode="r")
+                for name in _FIELDS
+            }
+            for level in range(1, meta["levels"] + 1)
+        ]
+        return cls(source, levels)
+
+    def overview(self, level: int, field: str = "min") -> Raster:
+        """
+        Return one overview level as a Raster.
+
+        Args:
+            level: Overview level, from 1 (half resolution) upwards.
+            field: "mean", "min" or "count". Defaults to "min".
+
+        Returns:
+            The overview Raster covering the source extent.
+        """
+        data = self.levels[level - 1][field]
+        factor = 2**level
+        west, south, east, north = self.bounds
+        height, width = self.shape
+        # Edge cells may extend past the source; keep the same cell size
+        x_size = (east - west) / width * factor
+        y_size = (north - south) / height * factor
+        bounds = (
+            west,
+            north - data.shape[0] * y_size,
+            west + data.shape[1] * x_size,
+            north,
+        )
+        return Raster(np.asarray(data), bounds, band_names=[f"{field}_similarity"])
+
+    def hotspots(
+        self,
+        threshold: float = DEFAULT_CHANGE_THRESHOLD,
+        start_level: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Find the changed pixels by descending only into candidate cells.
+
+        Args:
+            threshold: Similarity below which a pixel counts as changed.
+                Defaults to 0.7, as in the web viewer.
+            start_level: Overview level to start from. Defaults to the coarsest.
+
+        Returns:
+            Dict with "rows", "cols" and "similarity" arrays of the changed
+            pixels, "changed_area_km2", "pixels_read" (full-resolution
+            pixels read) and "fraction_read" (of all source pixels).
+        """
+        height, width = self.shape
+        level = len(self.levels) if start_level is None else start_level
+        if level == 0:
+            rows, cols = np.indices((height, width)).reshape(2, -1)
+        else:
+            candidates = self.levels[level - 1]["min"] < threshold
+            rows, cols = np.nonzero(candidates)
+
+        while level > 0:
+            level -= 1
+            limit = (
+                self.levels[level - 1]["min"].shape if level else (height, width)
+            )
+            rows, cols = _children(rows, cols, limit)
+            if level:
+                keep = self.levels[level - 1]["min"][rows, cols] < threshold
+                rows, cols = rows[keep], cols[keep]
+
+        values = _gather(self.source, rows, cols)
+        changed = values < threshold
+        rows, cols, values = rows[changed], cols[changed], values[changed]
+        areas = pixel_areas(self.bounds, self.shape)
+
+        return {
+            "rows": rows,
+            "cols": cols,
+            "similarity": values,
+            "changed_area_km2": float(areas[rows].sum()) / 1e6,
+            "pixels_read": int(changed.size),
+            "fraction_read": changed.size / float(height * width),
+        }
+
+    def _write_meta(self, path: str) -> None:
+        meta = {"shape": list(self.shape), "levels": len(self.levels)}
+        tmp_path = os.path.join(path, "meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp_path, os.path.join(path, "meta.json"))
+
+
+def _allocate(path: Optional[str], level: int, shape: Tuple[int, int]) -> Dict[str, np.ndarray]:
+    dtypes = {"mean": np.float32, "min": np.float32, "count": np.int32}
+    if path is None:
+        return {name: np.empty(shape, dtype=dtypes[name]) for name in _FIELDS}
+    return {
+        name: np.lib.format.open_memmap(
+            os.path.join(path, f"{level}.{name}.npy"), "w+", dtypes[name], shape
+        )
+        for name in _FIELDS
+    }
+
+
+def _read_rows(source: Source, row0: int, row1: int) -> np.ndarray:
+    height, width = source.shape[:2]
+    window = (min(row0, height), min(row1, height), 0, width)
+    if isinstance(source, Raster):
+        return source.read(window).data
+    return source.read(window)
+
+
+def _downsample(
+    mean: np.ndarray,
+    minimum: np.ndarray,
+    count: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Combine 2x2 blocks, padding odd edges with empty cells
+    height, width = -(-mean.shape[0] // 2) * 2, -(-mean.shape[1] // 2) * 2
+    pad = ((0, height - mean.shape[0]), (0, width - mean.shape[1]))
+    mean = np.pad(mean, pad, constant_values=np.nan)
+    minimum = np.pad(minimum, pad, constant_values=np.nan)
+    count = np.pad(count, pad)
+
+    shape = (height // 2, 2, width // 2, 2)
+    weighted = np.where(count > 0, mean * count, 0).reshape(shape).sum(axis=(1, 3))
+    count = count.reshape(shape).sum(axis=(1, 3))
+    minimum = np.fmin.reduce(np.fmin.reduce(minimum.reshape(shape), axis=3), axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(count > 0, weighted / count, np.nan)
+    return mean.astype(np.float32), minimum.astype(np.float32), count.astype(np.int32)
+
+
+def _children(
+    rows: np.ndarray,
+    cols: np.ndarray,
+    shape: Tuple[int, int],
+) -> Tuple[np.ndarray, np.ndarray]:
+    # The 2x2 cells one level down, dropping those past the edge
+    rows = (2 * rows[:, np.newaxis] + np.array([0, 0, 1, 1])).ravel()
+    cols = (2 * cols[:, np.newaxis] + np.array([0, 1, 0, 1])).ravel()
+    keep = (rows < shape[0]) & (cols < shape[1])
+    return rows[keep], cols[keep]
+
+
+def _gather(source: Source, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    # Read individual full-resolution pixels, one memory-mapped chunk at a time
+    if isinstance(source, Raster):
+        return np.asarray(source.data[rows, cols], dtype=np.float32)
+
+    values = np.empty(rows.size, dtype=np.float32)
+    chunk_rows, chunk_cols = source.chunks
+    chunk_ids = (rows // chunk_rows) * source.grid_shape[1] + cols // chunk_cols
+    order = np.argsort(chunk_ids, kind="stable")
+    boundaries = np.flatnonzero(np.diff(chunk_ids[order])) + 1
+    for group in np.split(order, boundaries):
+        if not group.size:
+            continue
+        chunk_row, chunk_col = divmod(int(chunk_ids[group[0]]), source.grid_shape[1])
+        chunk = source.read_chunk(chunk_row, chunk_col)
+        values[group] = chunk[
+            rows[group] - chunk_row * chunk_rows, cols[group] - chunk_col * chunk_cols
+        ]
+    return values
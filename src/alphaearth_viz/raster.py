@@ -0,0 +1,196 @@
+"""
+In-memory raster container for locally held AlphaEarth data.
+
+Local backends return :class:`Raster` objects in place of ``ee.Image``. A
+Raster pairs a NumPy array with its geographic bounds on a regular
+longitude/latitude grid whose first row is the northern edge.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .quantize import Quantization
+from .utils import NUM_BANDS, get_all_band_names
+
+
+Bounds = Tuple[float, float, float, float]
+Window = Tuple[int, int, int, int]
+
+
+def bbox_window(bounds: Sequence[float], shape: Tuple[int, int], bbox: Sequence[float]) -> Window:
+    """
+    Convert a bounding box to a pixel window of a grid, clipped to the grid.
+
+    Args:
+        bounds: Grid footprint as (west, south, east, north).
+        shape: Grid shape as (height, width).
+        bbox: Bounding box as (west, south, east, north) in degrees.
+
+    Returns:
+        The (row0, row1, col0, col1) window. Empty if there is no overlap.
+    """
+    west, south, east, north = bounds
+    height, width = shape[:2]
+    x_size, y_size = (east - west) / width, (north - south) / height
+
+    col0 = math.floor((bbox[0] - west) / x_size)
+    col1 = math.ceil((bbox[2] - west) / x_size)
+    row0 = math.floor((north - bbox[3]) / y_size)
+    row1 = math.ceil((north - bbox[1]) / y_size)
+
+    row0, row1 = min(max(row0, 0), height), min(max(row1, 0), height)
+    col0, col1 = min(max(col0, 0), width), min(max(col1, 0), width)
+    return (row0, max(row0, row1), col0, max(col0, col1))
+
+
+def window_bounds(bounds: Sequence[float], shape: Tuple[int, int], window: Window) -> Bounds:
+    """Return the geographic bounds of a pixel window of a grid."""
+    west, south, east, north = bounds
+    height, width = shape[:2]
+    x_size, y_size = (east - west) / width, (north - south) / height
+    row0, row1, col0, col1 = window
+    return (
+        west + col0 * x_size,
+        north - row1 * y_size,
+        west + col1 * x_size,
+        north - row0 * y_size,
+    )
+
+
+class Raster:
+    """
+    A georeferenced array of shape (height, width) or (height, width, bands).
+
+    Args:
+        data: Pixel values. May be a memory-mapped array.
+        bounds: Extent as (west, south, east, north) in degrees.
+        band_names: Names of the bands. Defaults to A01-A64 for 64-band data,
+            or ``["band"]`` for a 2-D array.
+        year: Optional year the data belongs to.
+        quantization: Per-band parameters when ``data`` holds int8 codes.
+
+    Example:
+        >>> raster = Raster(array, bounds=(-122.5, 37.7, -122.3, 37.9))
+        >>> raster.crop((-122.45, 37.75, -122.35, 37.85)).shape
+    """
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        bounds: Sequence[float],
+        band_names: Optional[List[str]] = None,
+        year: Optional[int] = None,
+        quantization: Optional[Quantization] = None,
+    ):
+        if data.ndim not in (2, 3):
+            raise ValueError("Raster data must be 2-D or 3-D")
+        num_bands = 1 if data.ndim == 2 else data.shape[2]
+        if band_names is None:
+            if num_bands == NUM_BANDS:
+                band_names = get_all_band_names()
+            elif num_bands == 1:
+                band_names = ["band"]
+            else:
+                band_names = [f"b{i + 1}" for i in range(num_bands)]
+        if len(band_names) != num_bands:
+            raise ValueError(
+                f"Got {len(band_names)} band names for {num_bands} bands"
+            )
+
+        self.data = data
+        self.bounds: Bounds = tuple(float(v) for v in bounds)
+        self.band_names = list(band_names)
+        self.year = year
+        self.quantization = quantization
+
+    def __repr__(self) -> str:
+        return (
+            f"Raster(shape={self.data.shape}, dtype={self.data.dtype}, "
+            f"bounds={self.bounds}, year={self.year})"
+        )
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """Pixel dimensions as (height, width)."""
+        return self.data.shape[:2]
+
+    @property
+    def pixel_size(self) -> Tuple[float, float]:
+        """Pixel size in degrees as (x_size, y_size)."""
+        west, south, east, north = self.bounds
+        height, width = self.shape
+        return ((east - west) / width, (north - south) / height)
+
+    def values(self) -> np.ndarray:
+        """Pixel values as floats, dequantizing int8 codes if needed."""
+        if self.quantization is None:
+            return self.data
+        return self.quantization.dequantize(self.data)
+
+    def window(self, bbox: Sequence[float]) -> Window:
+        """
+        Convert a bounding box to a pixel window clipped to the raster.
+
+        Args:
+            bbox: Bounding box as (west, south, east, north) in degrees.
+
+        Returns:
+            The (row0, row1, col0, col1) window. Empty if there is no overlap.
+        """
+        return bbox_window(self.bounds, self.shape, bbox)
+
+    def window_bounds(self, window: Window) -> Bounds:
+        """Return the geographic bounds of a pixel window."""
+        return window_bounds(self.bounds, self.shape, window)
+
+    def read(self, window: Window) -> "Raster":
+        """Return the sub-raster covering a pixel window (a view, not a copy)."""
+        row0, row1, col0, col1 = window
+        return Raster(
+            self.data[row0:row1, col0:col1],
+            self.window_bounds(window),
+            band_names=self.band_names,
+            year=self.year,
+            quantization=self.quantization,
+        )
+
+    def crop(self, bbox: Sequence[float]) -> "Raster":
+        """Return the sub-raster covering a bounding box."""
+        return self.read(self.window(bbox))
+
+    def select(self, bands: List[str]) -> "Raster":
+        """
+        Select bands by name.
+
+        Args:
+            bands: Band names to keep, in output order.
+
+        Returns:
+            A Raster with only the selected bands.
+        """
+        if list(bands) == self.band_names:
+            return self
+        if self.data.ndim == 2:
+            raise ValueError(f"Raster only has band {self.band_names[0]}")
+        indexes = [self.band_names.index(band) for band in bands]
+        quantization = self.quantization
+        if quantization is not None:
+            quantization = quantization.select(indexes)
+        return Raster(
+            self.data[:, :, indexes],
+            self.bounds,
+            band_names=bands,
+            year=self.year,
+            quantization=quantization,
+        )
+
+    def row_latitudes(self) -> np.ndarray:
+        """Latitude of the centre of each pixel row, north to south."""
+        _, _, _, north = self.bounds
+        _, y_size = self.pixel_size
+        return north - (np.arange(self.shape[0]) + 0.5) * y_size
@@ -0,0 +1,150 @@
+"""
+Local rendering of AlphaEarth rasters to RGBA images.
+
+These functions apply Earth Engine style visualization parameters (as
+returned by ``get_vis_params`` and ``get_similarity_vis``) to local
+:class:`~alphaearth_viz.raster.Raster` data.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .raster import Raster
+
+
+# CSS colour names accepted in palettes, in addition to hex strings
+NAMED_COLORS = {
+    "black": "000000",
+    "white": "ffffff",
+    "red": "ff0000",
+    "green": "008000",
+    "lime": "00ff00",
+    "blue": "0000ff",
+    "yellow": "ffff00",
+    "cyan": "00ffff",
+    "magenta": "ff00ff",
+    "orange": "ffa500",
+    "purple": "800080",
+    "gray": "808080",
+    "grey": "808080",
+    "brown": "a52a2a",
+    "darkgreen": "006400",
+    "navy": "000080",
+}
+
+
+def parse_color(color: str) -> Tuple[int, int, int]:
+    """
+    Convert a palette entry to an (r, g, b) tuple.
+
+    Args:
+        color: A colour name (e.g. "white") or hex string ("#ff0000",
+            "ff0000" or "f00").
+
+    Returns:
+        Tuple of 0-255 channel values.
+
+    Raises:
+        ValueError: If the colour is not recognised.
+
+    Example:
+        >>> parse_color("#ff8000")
+        (255, 128, 0)
+    """
+    value = NAMED_COLORS.get(color.lower(), color).lstrip("#")
+    if len(value) == 3:
+        value = "".join(ch * 2 for ch in value)
+    if len(value) != 6:
+        raise ValueError(f"Unrecognised colour: {color}")
+    try:
+        return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+    except ValueError:
+        raise ValueError(f"Unrecognised colour: {color}") from None
+
+
+def stretch(data: np.ndarray, min_val: Any, max_val: Any) -> np.ndarray:
+    """
+    Linearly stretch values to 0-1, clipping outside ``[min_val, max_val]``.
+
+    Args:
+        data: Array to stretch. The last axis holds bands when ``min_val``
+            and ``max_val`` are per-band sequences.
+        min_val: Lower bound, scalar or per band.
+        max_val: Upper bound, scalar or per band.
+
+    Returns:
+        Float32 array of the same shape with values in [0, 1].
+    """
+    low = np.asarray(min_val, dtype=np.float32)
+    high = np.asarray(max_val, dtype=np.float32)
+    scale = np.where(high > low, high - low, 1).astype(np.float32)
+    return np.clip((data.astype(np.float32) - low) / scale, 0, 1)
+
+
+def apply_palette(values: np.ndarray, palette: Sequence[str]) -> np.ndarray:
+    """
+    Map 0-1 values onto a palette with linear interpolation.
+
+    Args:
+        values: 2-D array of values in [0, 1].
+        palette: Colours as accepted by :func:`parse_color`.
+
+    Returns:
+        Array of shape values.shape + (3,) with float 0-255 channels.
+    """
+    colors = np.array([parse_color(c) for c in palette], dtype=np.float32)
+    if len(colors) == 1:
+        return np.broadcast_to(colors[0], values.shape + (3,)).copy()
+    stops = np.linspace(0, 1, len(colors))
+    flat = np.nan_to_num(values.ravel())
+    channels = [np.interp(flat, stops, colors[:, i]) for i in range(3)]
+    return np.stack(channels, axis=-1).reshape(values.shape + (3,))
+
+
+def render(raster: Raster, vis_params: Dict[str, Any]) -> np.ndarray:
+    """
+    Render a raster to an RGBA image using visualization parameters.
+
+    Three selected bands are shown as RGB; a single band is shown in
+    greyscale, or through ``palette`` when one is given. Pixels that are NaN
+    in any rendered band become transparent.
+
+    Args:
+        raster: Raster to render.
+        vis_params: Dictionary with optional "bands", "min", "max" and
+            "palette" keys, as for Earth Engine.
+
+    Returns:
+        Array of shape (height, width, 4) with dtype uint8.
+
+    Example:
+        >>> rgba = render(raster, get_vis_params(["A01", "A16", "A09"]))
+    """
+    bands: List[str] = vis_params.get("bands") or raster.band_names[:1]
+    if len(bands) not in (1, 3):
+        raise ValueError("Visualization needs either 1 or 3 bands")
+
+    data = raster.select(bands).values()
+    if data.ndim == 2:
+        data = data[:, :, np.newaxis]
+
+    values = stretch(data, vis_params.get("min", 0), vis_params.get("max", 1))
+    valid = ~np.isnan(data).any(axis=-1)
+
+    if len(bands) == 1:
+        palette = vis_params.get("palette")
+        if palette:
+            rgb = apply_palette(values[:, :, 0], palette)
+        else:
+            rgb = np.repeat(values, 3, axis=-1) * 255
+    else:
+        rgb = values * 255
+
+    rgba = np.empty(raster.shape + (4,), dtype=np.uint8)
+    rgba[:, :, :3] = np.nan_to_num(rgb).round().astype(np.uint8)
+    rgba[:, :, 3] = np.where(valid, 255, 0)
+    return rgba
@@ -0,0 +1,445 @@
+"""
+Batch HTML reports for many sites.
+
+``Map.to_html`` embeds the whole map library and layer configuration in
+every file, so hundreds of per-site reports repeat the same megabytes.
+:func:`export_reports` builds the layers of ``compare_years`` or
+``analyze_location`` for each site and writes:
+
+    <directory>/assets/report.js, report.css   shared bundle, written once
+    <directory>/sites/<slug>.js                 per-site layer description
+    <directory>/assets/layers/<hash>.png        rendered layers (local backends)
+    <directory>/<slug>.html                     small per-site page
+    <directory>/index.html                      one page switching between sites
+    <directory>/report.json                     content hash of every site
+
+MapLibre itself is loaded from a CDN, so browsers cache it across pages.
+Rendered layers are named by content hash, so sites on the same cached
+tile share one image.
+Sites are built in parallel, and a site whose definition, options and
+backend data version hash to the value in ``report.json`` is skipped.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import hashlib
+import html
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Union
+
+from .backends import EmbeddingBackend, get_backend
+from .core import comparison_layers
+from .instrumentation import traced
+from .utils import validate_year
+
+
+MAPLIBRE_VERSION = "4.7.1"
+
+# Bumped whenever the bundle or the site description format changes, so
+# every site is rebuilt against the new bundle
+REPORT_FORMAT = 1
+
+USGS_IMAGERY_TILES = (
+    "https://basemap.nationalmap.gov/arcgis/rest/services/"
+    "USGSImageryOnly/MapServer/tile/{z}/{y}/{x}"
+)
+
+_MAPLIBRE_URL = f"https://unpkg.com/maplibre-gl@{MAPLIBRE_VERSION}/dist/maplibre-gl"
+
+_REPORT_JS = """\
+(function () {
+  "use strict";
+  var sites = {};
+  var map = null;
+  var ready = false;
+  var current = null;
+  var shown = [];
+
+  function add(spec) {
+    sites[spec.slug] = spec;
+  }
+
+  function clear() {
+    shown.forEach(function (id) {
+      map.removeLayer(id);
+      map.removeSource(id);
+    });
+    shown = [];
+  }
+
+  function control(spec) {
+    var panel = document.getElementById("layers");
+    panel.innerHTML = "<strong></strong>";
+    panel.firstChild.textContent = spec.name;
+    spec.layers.forEach(function (layer, i) {
+      var label = document.createElement("label");
+      var box = document.createElement("input");
+      box.type = "checkbox";
+      box.checked = true;
+      box.onchange = function () {
+        map.setLayoutProperty("site-" + i, "visibility", box.checked ? "visible" : "none");
+      };
+      label.appendChild(box);
+      label.appendChild(document.createTextNode(" " + layer.name));
+      panel.appendChild(label);
+    });
+  }
+
+  function draw(spec) {
+    clear();
+    spec.layers.forEach(function (layer, i) {
+      var id = "site-" + i;
+      map.addSource(id, layer.source);
+      map.addLayer({id: id, type: "raster", source: id});
+      shown.push(id);
+    });
+    control(spec);
+    map.jumpTo({center: spec.center, zoom: spec.zoom});
+    document.title = spec.name;
+  }
+
+  function show(slug) {
+    current = sites[slug];
+    if (map === null) {
+      map = new maplibregl.Map({
+        container: "map",
+        center: current.center,
+        zoom: current.zoom,
+        style: {
+          version: 8,
+          sources: {basemap: {type: "raster", tiles: [BASEMAP], tileSize: 256,
+                              attribution: "USGS The National Map"}},
+          layers: [{id: "basemap", type: "raster", source: "basemap"}]
+        }
+      });
+      map.addControl(new maplibregl.NavigationControl());
+      map.on("load", function () {
+        ready = true;
+        draw(current);
+      });
+    } else if (ready) {
+      draw(current);
+    }
+  }
+
+  function index() {
+    var list = document.getElementById("sites");
+    Object.keys(sites).forEach(function (slug) {
+      var item = document.createElement("li");
+      var link = document.createElement("a");
+      link.href = "#" + slug;
+      link.textContent = sites[slug].name;
+      item.appendChild(link);
+      list.appendChild(item);
+    });
+    function route() {
+      var slug = decodeURIComponent(location.hash.slice(1));
+      show(sites[slug] ? slug : Object.keys(sites)[0]);
+    }
+    window.addEventListener("hashchange", route);
+    route();
+  }
+
+  window.AlphaEarthReport = {add: add, show: show, index: index};
+})();
+"""
+
+_REPORT_CSS = """\
+html, body { margin: 0; height: 100%; font: 13px/1.4 sans-serif; }
+body { display: flex; }
+#sites { width: 220px; margin: 0; padding: 8px 8px 8px 24px; overflow-y: auto; }
+#map { flex: 1; }
+#layers { position: absolute; top: 10px; left: 10px; z-index: 1; padding: 6px 10px;
+          background: rgba(255, 255, 255, 0.9); border-radius: 4px; }
+#layers label { display: block; }
+body.index #layers { left: 254px; }
+"""
+
+_PAGE = """\
+<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<link rel="stylesheet" href="{maplibre}.css">
+<link rel="stylesheet" href="assets/report.css">
+<script src="{maplibre}.js"></script>
+<script src="assets/report.js"></script>
+{scripts}
+</head>
+<body{body_class}>
+{sidebar}<div id="map"></div>
+<div id="layers"></div>
+<script>{call}</script>
+</body>
+</html>
+"""
+
+Site = Union[Mapping[str, Any], Sequence[float]]
+
+
+def site_slug(name: Any) -> str:
+    """
+    Turn a site name into a file name.
+
+    Args:
+        name: Site name.
+
+    Returns:
+        Lowercase name with runs of other characters replaced by "-".
+
+    Example:
+        >>> site_slug("San Francisco")
+        'san-francisco'
+    """
+    return re.sub(r"[^a-z0-9]+", "-", str(name).lower()).strip("-") or "site"
+
+
+@traced("report.export_reports")
+def export_reports(
+    sites: Union[Mapping[str, Site], Sequence[Site]],
+    directory: str = "reports",
+    year1: int = 2017,
+    year2: int = 2024,
+    bands: Optional[List[str]] = None,
+    zoom: int = 12,
+    change: bool = True,
+    backend: Optional[EmbeddingBackend] = None,
+    pages: bool = True,
+    index: bool = True,
+    max_workers: int = 8,
+    force: bool = False,
+    progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Write HTML reports for many sites sharing one asset bundle.
+
+    Each site gets the layers of ``analyze_location`` (or ``compare_years``
+    when ``change`` is False). Earth Engine layers are stored as tile URL
+    templates; local rasters are rendered to PNG in the shared assets.
+
+    A site is rebuilt only when its name, location, years, bands, zoom or
+    layer options change, or when the backend or the tiles under the site
+    do (see ``EmbeddingBackend.data_version``). Earth Engine tile URLs are
+    issued per export and expire like those in ``Map.to_html`` output;
+    pass ``force=True`` to refresh them.
+
+    Args:
+        sites: Dict of name to site, or a sequence of sites. A site is a
+            ``(lon, lat)`` pair or a mapping with "lon" and "lat" and
+            optional "name", "zoom", "year1" and "year2" keys, as in the
+            notebook ``locations`` dictionary.
+        directory: Output directory. Defaults to "reports".
+        year1: First year for comparison. Defaults to 2017.
+        year2: Second year for comparison. Defaults to 2024.
+        bands: Band names shown as RGB. Defaults to ["A01", "A16", "A09"].
+        zoom: Initial zoom level. Defaults to 12.
+        change: Add the change detection layer. Defaults to True.
+        backend: Backend to load embeddings from. Defaults to the backend
+            set with ``set_backend``.
+        pages: Write a page per site. Defaults to True.
+        index: Write ``index.html`` listing every site. Defaults to True.
+        max_workers: Sites built concurrently. Defaults to 8.
+        force: Rebuild every site regardless of its hash.
+        progress: Optional callback called with each site slug as it is
+            written.
+
+    Returns:
+        Dict with "written" and "skipped" lists of site slugs.
+
+    Example:
+        >>> locations = {"San Francisco": {"lat": 37.8, "lon": -122.4},
+        ...              "Tokyo": {"lat": 35.7, "lon": 139.7}}
+        >>> export_reports(locations, "reports", year1=2017, year2=2024)
+        {'written': ['san-francisco', 'tokyo'], 'skipped': []}
+    """
+    backend = backend or get_backend()
+    specs = _normalize(sites, year1, year2, bands or ["A01", "A16", "A09"], zoom, change, backend)
+    for spec in specs:
+        validate_year(spec["year1"])
+        validate_year(spec["year2"])
+
+    os.makedirs(os.path.join(directory, "sites"), exist_ok=True)
+    _write_text(os.path.join(directory, "assets", "report.js"), _bundle())
+    _write_text(os.path.join(directory, "assets", "report.css"), _REPORT_CSS)
+
+    manifest_path = os.path.join(directory, "report.json")
+    hashes: Dict[str, str] = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as fh:
+            hashes = json.load(fh).get("sites", {})
+
+    pending = []
+    skipped = []
+    for spec in specs:
+        script = os.path.join(directory, "sites", f"{spec['slug']}.js")
+        if not force and hashes.get(spec["slug"]) == spec["hash"] and os.path.exists(script):
+            skipped.append(spec["slug"])
+        else:
+            pending.append(spec)
+
+    written = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = [pool.submit(_build_site, spec, backend, directory) for spec in pending]
+        for future in as_completed(futures):
+            spec = future.result()
+            hashes[spec["slug"]] = spec["hash"]
+            _write_text(manifest_path, json.dumps({"format": REPORT_FORMAT, "sites": hashes}, indent=1))
+            written.append(spec["slug"])
+            if progress is not None:
+                progress(spec["slug"])
+
+    for spec in specs:
+        if pages:
+            _write_text(
+                os.path.join(directory, f"{spec['slug']}.html"),
+                _page(spec["name"], [spec["slug"]], f"AlphaEarthReport.show({json.dumps(spec['slug'])});"),
+            )
+    if index:
+        _write_text(
+            os.path.join(directory, "index.html"),
+            _page(
+                "AlphaEarth sites",
+                [spec["slug"] for spec in specs],
+                "AlphaEarthReport.index();",
+                sidebar=True,
+            ),
+        )
+
+    order = {spec["slug"]: i for i, spec in enumerate(specs)}
+    return {"written": sorted(written, key=order.get), "skipped": skipped}
+
+
+def _normalize(
+    sites: Union[Mapping[str, Site], Sequence[Site]],
+    year1: int,
+    year2: int,
+    bands: List[str],
+    zoom: int,
+    change: bool,
+    backend: EmbeddingBackend,
+) -> List[Dict[str, Any]]:
+    # Site descriptions with unique slugs and a hash of everything the
+    # rendered site depends on, including the data the backend serves there
+    if isinstance(sites, Mapping):
+        items = list(sites.items())
+    else:
+        items = [
+            (site.get("name", f"Site {i + 1}") if isinstance(site, Mapping) else f"Site {i + 1}", site)
+            for i, site in enumerate(sites)
+        ]
+
+    specs = []
+    used = set()
+    for name, site in items:
+        if isinstance(site, Mapping):
+            lon, lat = site["lon"], site["lat"]
+        else:
+            lon, lat = site
+            site = {}
+        slug = base = site_slug(name)
+        suffix = 2
+        while slug in used:
+            slug = f"{base}-{suffix}"
+            suffix += 1
+        used.add(slug)
+        spec = {
+            "name": str(name),
+            "slug": slug,
+            "lon": float(lon),
+            "lat": float(lat),
+            "year1": int(site.get("year1", year1)),
+            "year2": int(site.get("year2", year2)),
+            "zoom": site.get("zoom", zoom),
+            "bands": list(bands),
+            "change": change,
+        }
+        data = backend.data_version(
+            (spec["lon"], spec["lat"], spec["lon"], spec["lat"]), [spec["year1"], spec["year2"]]
+        )
+        key = json.dumps({"format": REPORT_FORMAT, "data": data, **spec}, sort_keys=True)
+        spec["hash"] = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        specs.append(spec)
+    return specs
+
+
+def _build_site(spec: Dict[str, Any], backend: EmbeddingBackend, directory: str) -> Dict[str, Any]:
+    # Export one site's layers and write its site script
+    slug = spec["slug"]
+    layer_dir = os.path.join(directory, "assets", "layers")
+    os.makedirs(layer_dir, exist_ok=True)
+    layers = comparison_layers(
+        spec["lon"], spec["lat"], spec["year1"], spec["year2"],
+        spec["bands"], backend=backend, change=spec["change"],
+    )
+
+    exported = []
+    for i, (image, vis_params, name) in enumerate(layers):
+        source = backend.export_layer(image, vis_params, os.path.join(layer_dir, f".{slug}-{i}"))
+        if "url" in source:
+            path = _store_by_hash(source["url"])
+            # Pages sit in the output directory, so URLs are relative to it
+            relative = os.path.relpath(path, directory)
+            source = {**source, "url": relative.replace(os.sep, "/")}
+        exported.append({"name": name, "source": source})
+
+    payload = {
+        "slug": slug,
+        "name": spec["name"],
+        "center": [spec["lon"], spec["lat"]],
+        "zoom": spec["zoom"],
+        "layers": exported,
+    }
+    _write_text(
+        os.path.join(directory, "sites", f"{slug}.js"),
+        f"AlphaEarthReport.add({json.dumps(payload, separators=(',', ':'))});\n",
+    )
+    return spec
+
+
+def _store_by_hash(path: str) -> str:
+    # Rename an exported file after its content, dropping it if an
+    # identical layer is already stored
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    target = os.path.join(os.path.dirname(path), digest.hexdigest()[:32] + os.path.splitext(path)[1])
+    if os.path.exists(target):
+        os.remove(path)
+    else:
+        os.replace(path, target)
+    return target
+
+
+def _bundle() -> str:
+    return _REPORT_JS.replace("BASEMAP", json.dumps(USGS_IMAGERY_TILES))
+
+
+def _page(title: str, slugs: List[str], call: str, sidebar: bool = False) -> str:
+    scripts = "\n".join(f'<script src="sites/{slug}.js"></script>' for slug in slugs)
+    return _PAGE.format(
+        title=html.escape(title),
+        maplibre=_MAPLIBRE_URL,
+        scripts=scripts,
+        body_class=' class="index"' if sidebar else "",
+        sidebar='<ul id="sites"></ul>\n' if sidebar else "",
+        call=call,
+    )
+
+
+def _write_text(path: str, text: str) -> None:
+    # Atomic write that leaves unchanged files (and their mtimes) alone
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as fh:
+            if fh.read() == text:
+                return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        fh.write(text)
+    os.replace(tmp_path, path)
@@ -0,0 +1,275 @@
+"""
+Parallel fetch/compute scheduling for multi-tile jobs.
+
+:class:`TileScheduler` runs a fetch step on a thread pool (network or disk
+I/O) and a compute step on a process pool, so fetching tile N+1 overlaps
+with computing tile N. The number of items in flight is bounded, which
+applies backpressure to both the input iterator and the pools, and failed
+fetches are retried with exponential backoff.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import multiprocessing
+import random
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple, Type
+
+from .backends import EmbeddingBackend, get_backend
+from .raster import Raster
+from .streaming import ChunkGrid, chunk_similarity, fetch_chunk
+from .utils import validate_year
+
+
+# Errors worth retrying: network failures and timeouts. Errors such as
+# NoDataError or ValueError fail the same way on every attempt.
+TRANSIENT_ERRORS: Tuple[Type[BaseException], ...] = (ConnectionError, TimeoutError, OSError)
+
+
+class TileScheduler:
+    """
+    Pipelined, bounded-concurrency executor for fetch-then-compute jobs.
+
+    Args:
+        fetch: Function called with each item on an I/O thread.
+        compute: Optional function called with each fetched value. It must be
+            picklable (a module-level function) when ``use_processes`` is True.
+        fetch_workers: Number of fetch threads. Defaults to 4.
+        compute_workers: Number of compute workers. Defaults to the pool's
+            default (the CPU count).
+        max_in_flight: Maximum number of items being fetched, computed or
+            waiting to be yielded. Defaults to twice ``fetch_workers``.
+        retries: Fetch attempts after the first failure. Defaults to 3.
+        backoff: Initial retry delay in seconds, doubled on each attempt
+            with random jitter. Defaults to 0.5.
+        max_backoff: Upper bound on the retry delay in seconds. Defaults to 30.
+        retry_on: Exception types that trigger a retry. Defaults to
+            :data:`TRANSIENT_ERRORS` (ConnectionError, TimeoutError and
+            OSError); other errors propagate on the first attempt.
+        use_processes: Run ``compute`` in a process pool rather than a
+            thread pool. Defaults to True. Workers are started with the
+            "forkserver" method where available, because the fetch threads
+            are already running when the pool first forks.
+
+    Example:
+        >>> scheduler = TileScheduler(fetch_pair, compute_similarity, fetch_workers=8)
+        >>> for item, result in scheduler.run(chunks):
+        ...     store.write_chunk(*item, result)
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[Any], Any],
+        compute: Optional[Callable[[Any], Any]] = None,
+        fetch_workers: int = 4,
+        compute_workers: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        retry_on: Tuple[Type[BaseException], ...] = TRANSIENT_ERRORS,
+        use_processes: bool = True,
+    ):
+        if fetch_workers < 1:
+            raise ValueError("fetch_workers must be at least 1")
+        self.fetch = fetch
+        self.compute = compute
+        self.fetch_workers = fetch_workers
+        self.compute_workers = compute_workers
+        self.max_in_flight = max_in_flight or 2 * fetch_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_on = retry_on
+        self.use_processes = use_processes
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"fetched": 0, "computed": 0, "retries": 0}
+
+    def run(self, items: Iterable[Any], ordered: bool = False) -> Iterator[Tuple[Any, Any]]:
+        """
+        Process items and yield their results as they complete.
+
+        New items are only taken from ``items`` while fewer than
+        ``max_in_flight`` are outstanding. If a fetch still fails after all
+        retries, or a compute raises, the exception propagates and pending
+        work is cancelled.
+
+        Args:
+            items: Items to process.
+            ordered: Yield results in input order instead of completion order.
+
+        Yields:
+            Tuples of (item, result).
+        """
+        source = iter(items)
+        exhausted = False
+        pending: Dict[Future, Tuple[int, Any, str]] = {}
+        finished: Dict[int, Tuple[Any, Any]] = {}
+        next_index = 0
+        next_to_yield = 0
+        in_flight = 0
+
+        cpu_pool = self._compute_pool()
+        io_pool = ThreadPoolExecutor(
+            self.fetch_workers, thread_name_prefix="alphaearth-fetch"
+        )
+        try:
+            while True:
+                while not exhausted and in_flight < self.max_in_flight:
+                    try:
+                        item = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    future = io_pool.submit(self._fetch_with_retry, item)
+                    pending[future] = (next_index, item, "fetch")
+                    next_index += 1
+                    in_flight += 1
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, item, stage = pending.pop(future)
+                    value = future.result()
+                    if stage == "fetch" and self.compute is not None:
+                        with self._lock:
+                            self.stats["fetched"] += 1
+                        pending[cpu_pool.submit(self.compute, value)] = (index, item, "compute")
+                        continue
+
+                    with self._lock:
+                        self.stats["computed" if stage == "compute" else "fetched"] += 1
+                    finished[index] = (item, value)
+
+                if ordered:
+                    while next_to_yield in finished:
+                        in_flight -= 1
+                        yield finished.pop(next_to_yield)
+                        next_to_yield += 1
+                else:
+                    for index in sorted(finished):
+                        in_flight -= 1
+                        yield finished.pop(index)
+        finally:
+            for future in pending:
+                future.cancel()
+            io_pool.shutdown(wait=True)
+            if cpu_pool is not None:
+                cpu_pool.shutdown(wait=True)
+
+    def map(self, items: Iterable[Any]) -> list:
+        """Process items and return their results in input order."""
+        return [result for _, result in self.run(items, ordered=True)]
+
+    def _compute_pool(self) -> Optional[Executor]:
+        if self.compute is None:
+            return None
+        if self.use_processes:
+            # Forking while fetch threads hold locks can deadlock the child
+            methods = multiprocessing.get_all_start_methods()
+            method = "forkserver" if "forkserver" in methods else None
+            return ProcessPoolExecutor(
+                self.compute_workers, mp_context=multiprocessing.get_context(method)
+            )
+        return ThreadPoolExecutor(
+            self.compute_workers, thread_name_prefix="alphaearth-compute"
+        )
+
+    def _fetch_with_retry(self, item: Any) -> Any:
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                return self.fetch(item)
+            except self.retry_on:
+                if attempt == self.retries:
+                    raise
+                with self._lock:
+                    self.stats["retries"] += 1
+                time.sleep(min(delay, self.max_backoff) * (0.5 + random.random()))
+                delay *= 2
+
+
+def parallel_change_chunks(
+    bbox: Sequence[float],
+    year1: int,
+    year2: int,
+    scale: float = 10.0,
+    chunk_pixels: Optional[int] = None,
+    backend: Optional[EmbeddingBackend] = None,
+    skip: Optional[Callable[[int, int], bool]] = None,
+    fetch_workers: int = 4,
+    compute_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    retries: int = 3,
+    use_processes: bool = True,
+) -> Iterator[Tuple[int, int, Raster]]:
+    """
+    Parallel counterpart of :func:`~alphaearth_viz.streaming.iter_change_chunks`.
+
+    Both years of each chunk are fetched on I/O threads while earlier chunks
+    are compared on compute workers. Chunks are yielded as they complete.
+
+    Args:
+        bbox: Region as (west, south, east, north) in degrees.
+        year1: First year for comparison.
+        year2: Second year for comparison.
+        scale: Pixel size in metres at the equator. Defaults to 10.
+        chunk_pixels: Chunk side in pixels. Defaults to the backend's
+            ``chunk_pixels()``: 1024, or 384 on Earth Engine.
+        backend: Backend to read embeddings from. Defaults to the backend
+            set with ``set_backend``.
+        skip: Optional predicate; chunks for which it returns True are skipped.
+        fetch_workers: Number of fetch threads. Defaults to 4.
+        compute_workers: Number of compute workers. Defaults to the CPU count.
+        max_in_flight: Maximum outstanding chunks. Defaults to twice
+            ``fetch_workers``.
+        retries: Fetch attempts after the first failure. Defaults to 3.
+        use_processes: Compare chunks in a process pool. Defaults to True.
+
+    Yields:
+        Tuples of (chunk_row, chunk_col, similarity Raster on the chunk grid).
+    """
+    validate_year(year1)
+    validate_year(year2)
+    backend = backend or get_backend()
+    chunk_pixels = chunk_pixels or backend.chunk_pixels()
+    grid = ChunkGrid(bbox, scale=scale, chunk_pixels=chunk_pixels)
+
+    def fetch(chunk: Tuple[int, int]) -> Tuple[Optional[Raster], Optional[Raster], Tuple[int, int]]:
+        row0, row1, col0, col1 = grid.chunk_window(*chunk)
+        return (
+            fetch_chunk(backend, grid, *chunk, year1),
+            fetch_chunk(backend, grid, *chunk, year2),
+            (row1 - row0, col1 - col0),
+        )
+
+    chunks = (chunk for chunk in grid if skip is None or not skip(*chunk))
+    scheduler = TileScheduler(
+        fetch,
+        _chunk_similarity,
+        fetch_workers=fetch_workers,
+        compute_workers=compute_workers,
+        max_in_flight=max_in_flight,
+        retries=retries,
+        use_processes=use_processes,
+    )
+    for (chunk_row, chunk_col), data in scheduler.run(chunks):
+        chunk_bbox = grid.chunk_bounds(chunk_row, chunk_col)
+        yield chunk_row, chunk_col, Raster(data, chunk_bbox, band_names=["similarity"])
+
+
+def _chunk_similarity(fetched: Tuple[Optional[Raster], Optional[Raster], Tuple[int, int]]) -> Any:
+    # Runs on a compute worker
+    return chunk_similarity(*fetched)
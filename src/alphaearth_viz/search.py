@@ -0,0 +1,326 @@
+"""
+Approximate nearest-neighbour search over AlphaEarth embeddings.
+
+:class:`SimilarityIndex` answers "find pixels like this one" queries for a
+region and year. It is an inverted-file (IVF) index: pixels are grouped
+by their nearest k-means centroid and stored contiguously per group, so a
+query only scans the few groups whose centroids are closest to it instead
+of every pixel. Indexes are saved as plain ``.npy`` files and memory-mapped
+on load, so indexes of millions of pixels open instantly.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .clustering import KMeans
+from .compute import DEFAULT_MEMORY_BUDGET, block_rows, iter_row_blocks
+from .raster import Raster
+
+
+class SimilarityIndex:
+    """
+    Inverted-file index for top-k cosine similarity queries.
+
+    Use :meth:`build` to create an index from a Raster and :meth:`load` to
+    open a saved one.
+
+    Args:
+        centroids: Float32 (lists, bands) coarse centroids.
+        offsets: Start of each list in ``vectors``, with a final end offset.
+        vectors: Float32 (pixels, bands) unit vectors, grouped by list.
+        ids: Flat pixel index (row * width + col) of each vector.
+        meta: Raster metadata: "bounds", "shape", "band_names" and "year".
+
+    Example:
+        >>> index = SimilarityIndex.build(raster, path="sf_2024.index")
+        >>> index = SimilarityIndex.load("sf_2024.index")
+        >>> index.query_point(-122.42, 37.77, k=10)
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        vectors: np.ndarray,
+        ids: np.ndarray,
+        meta: Dict[str, Any],
+    ):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.vectors = vectors
+        self.ids = ids
+        self.meta = meta
+        # Row of each flat pixel index in vectors (-1 if not indexed),
+        # built on the first point lookup
+        self._rows: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return int(self.ids.shape[0])
+
+    def __repr__(self) -> str:
+        return (
+            f"SimilarityIndex(pixels={len(self)}, lists={self.n_lists}, "
+            f"year={self.meta.get('year')})"
+        )
+
+    @property
+    def n_lists(self) -> int:
+        """Number of inverted lists."""
+        return int(self.centroids.shape[0])
+
+    @classmethod
+    def build(
+        cls,
+        raster: Raster,
+        path: Optional[str] = None,
+        n_lists: Optional[int] = None,
+        sample_size: int = 100_000,
+        seed: Optional[int] = None,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    ) -> "SimilarityIndex":
+        """
+        Build an index over every valid pixel of a raster.
+
+        Args:
+            raster: 64-band embedding Raster. May be memory-mapped or quantized.
+            path: Directory to write the index to. When given, vectors are
+                written straight to memory-mapped files, so rasters larger
+                than RAM can be indexed. Defaults to an in-memory index.
+            n_lists: Number of inverted lists. Defaults to about the square
+                root of the number of pixels.
+            sample_size: Pixels used to train the coarse centroids.
+                Defaults to 100,000.
+            seed: Seed for sampling and initialisation.
+            memory_budget: Working-memory budget in bytes for one block.
+
+        Returns:
+            The SimilarityIndex.
+        """
+        height, width = raster.shape
+        n_lists = n_lists or max(1, int(math.sqrt(height * width)))
+        coarse = KMeans(n_lists, max_samples=sample_size, seed=seed)
+        coarse.partial_fit(raster)
+        labels = coarse.predict(raster, memory_budget=memory_budget).data.reshape(-1)
+
+        valid = np.flatnonzero(labels >= 0)
+        order = valid[np.argsort(labels[valid], kind="stable")]
+        counts = np.bincount(labels[valid], minlength=n_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        bands = len(raster.band_names)
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            vectors = np.lib.format.open_memmap(
+                os.path.join(path, "vectors.npy"), "w+", np.float32, (order.size, bands)
+            )
+        else:
+            vectors = np.empty((order.size, bands), dtype=np.float32)
+
+        flat = raster.data.reshape(-1, bands)
+        rows = block_rows(1, bands, 4, memory_budget)
+        for start, stop in iter_row_blocks(order.size, rows):
+            block = flat[order[start:stop]]
+            if raster.quantization is not None:
+                block = raster.quantization.dequantize(block)
+            vectors[start:stop] = _normalize(np.asarray(block, dtype=np.float32))
+
+        meta = {
+            "bounds": list(raster.bounds),
+            "shape": [height, width],
+            "band_names": raster.band_names,
+            "year": raster.year,
+        }
+        index = cls(
+            _normalize(coarse.centroids), offsets, vectors, order.astype(np.int64), meta
+        )
+        if path is not None:
+            vectors.flush()
+            index.save(path)
+        return index
+
+    def save(self, path: str) -> None:
+        """
+        Write the index to a directory of ``.npy`` files and ``meta.json``.
+
+        Args:
+            path: Destination directory.
+        """
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            "centroids": self.centroids,
+            "offsets": self.offsets,
+            "vectors": self.vectors,
+            "ids": self.ids,
+        }
+        for name, array in arrays.items():
+            target = os.path.join(path, f"{name}.npy")
+            if isinstance(array, np.memmap) and os.path.abspath(array.filename) == (
+                os.path.abspath(target)
+            ):
+                continue
+            tmp_path = f"{target}.tmp.npy"
+            np.save(tmp_path, np.ascontiguousarray(array))
+            os.replace(tmp_path, target)
+
+        tmp_path = os.path.join(path, "meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(self.meta, fh)
+        os.replace(tmp_path, os.path.join(path, "meta.json"))
+
+    @classmethod
+    def load(cls, path: str) -> "SimilarityIndex":
+        """
+        Open a saved index with its vectors and ids memory-mapped.
+
+        Args:
+            path: Directory written by :meth:`build` or :meth:`save`.
+
+        Returns:
+            The SimilarityIndex.
+        """
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as fh:
+            meta = json.load(fh)
+        return cls(
+            np.load(os.path.join(path, "centroids.npy")),
+            np.load(os.path.join(path, "offsets.npy")),
+            np.load(os.path.join(path, "vectors.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "ids.npy"), mmap_mode="r"),
+            meta,
+        )
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        n_probe: int = 8,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k most similar pixels to each query vector.
+
+        Args:
+            queries: Query embeddings of shape (bands,) or (queries, bands).
+            k: Number of neighbours per query. Defaults to 10.
+            n_probe: Number of inverted lists scanned per query. Higher
+                values are slower but more accurate. Defaults to 8.
+
+        Returns:
+            Tuple of (similarities, ids), each of shape (queries, k), sorted
+            by decreasing cosine similarity. Missing results (fewer than k
+            pixels scanned) have similarity -inf and id -1.
+        """
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        n_probe = min(n_probe, self.n_lists)
+        probes = np.argpartition(-(queries @ self.centroids.T), n_probe - 1, axis=1)
+
+        similarities = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        ids = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        for q, query in enumerate(queries):
+            lists = probes[q, :n_probe]
+            positions = np.concatenate(
+                [np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists]
+            )
+            if not positions.size:
+                continue
+            scores = np.concatenate(
+                [self.vectors[self.offsets[i]:self.offsets[i + 1]] @ query for i in lists]
+            )
+            top = min(k, scores.size)
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            similarities[q, :top] = scores[best]
+            ids[q, :top] = self.ids[positions[best]]
+        return similarities, ids
+
+    def query(
+        self,
+        vector: Sequence[float],
+        k: int = 10,
+        n_probe: int = 8,
+    ) -> List[Dict[str, Any]]:
+        """
+        Find the k pixels most similar to an embedding vector.
+
+        Args:
+            vector: Query embedding.
+            k: Number of results. Defaults to 10.
+            n_probe: Number of inverted lists scanned. Defaults to 8.
+
+        Returns:
+            List of dicts with "lon", "lat", "row", "col" and "similarity",
+            most similar first.
+        """
+        similarities, ids = self.search(np.asarray(vector), k=k, n_probe=n_probe)
+        results = []
+        for similarity, pixel in zip(similarities[0], ids[0]):
+            if pixel < 0:
+                break
+            row, col = divmod(int(pixel), self.meta["shape"][1])
+            lon, lat = self.pixel_center(row, col)
+            results.append(
+                {"lon": lon, "lat": lat, "row": row, "col": col, "similarity": float(similarity)}
+            )
+        return results
+
+    def query_point(
+        self,
+        lon: float,
+        lat: float,
+        k: int = 10,
+        n_probe: int = 8,
+    ) -> List[Dict[str, Any]]:
+        """
+        Find the k pixels most similar to the pixel at a location.
+
+        The location's own pixel is included in the results.
+
+        Args:
+            lon: Longitude of the query pixel (degrees).
+            lat: Latitude of the query pixel (degrees).
+            k: Number of results. Defaults to 10.
+            n_probe: Number of inverted lists scanned. Defaults to 8.
+
+        Returns:
+            List of result dicts as returned by :meth:`query`.
+
+        Raises:
+            ValueError: If the location is outside the index or has no data.
+        """
+        return self.query(self.vector_at(lon, lat), k=k, n_probe=n_probe)
+
+    def vector_at(self, lon: float, lat: float) -> np.ndarray:
+        """Return the indexed unit embedding of the pixel at a location."""
+        west, south, east, north = self.meta["bounds"]
+        height, width = self.meta["shape"]
+        if not (west <= lon <= east and south <= lat <= north):
+            raise ValueError(f"Location ({lon}, {lat}) is outside the index")
+        row = min(int((north - lat) / (north - south) * height), height - 1)
+        col = min(int((lon - west) / (east - west) * width), width - 1)
+
+        if self._rows is None:
+            self._rows = np.full(height * width, -1, dtype=np.int64)
+            self._rows[self.ids] = np.arange(len(self.ids))
+        position = self._rows[row * width + col]
+        if position < 0:
+            raise ValueError(f"Location ({lon}, {lat}) has no data")
+        return np.asarray(self.vectors[position])
+
+    def pixel_center(self, row: int, col: int) -> Tuple[float, float]:
+        """Return the (lon, lat) centre of an indexed pixel."""
+        west, south, east, north = self.meta["bounds"]
+        height, width = self.meta["shape"]
+        return (
+            west + (col + 0.5) * (east - west) / width,
+            north - (row + 0.5) * (north - south) / height,
+        )
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
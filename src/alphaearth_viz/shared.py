@@ -0,0 +1,339 @@
+"""
+Shared-memory embedding tiles for multi-process workers.
+
+Sending a Raster to a process pool pickles its pixels, so every worker
+holds its own copy of the same 64-band arrays and memory grows with the
+worker count. :class:`SharedEmbeddingStore` copies each cached (year, tile)
+block of a LocalBackend into a ``multiprocessing.shared_memory`` segment
+once. Tasks carry a small picklable :class:`SharedTile` descriptor instead,
+and workers attach to the segment as a read-only NumPy view without
+copying.
+
+Segments are reference counted by the owning process: each
+:meth:`~SharedEmbeddingStore.acquire` must be matched by a
+:meth:`~SharedEmbeddingStore.release`, and a segment is unlinked when its
+count drops to zero. Workers keep their mappings open until
+:meth:`SharedTile.detach` (or process exit), so a segment released by the
+owner stays valid in workers still using it.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .backends import LocalBackend, get_backend
+from .instrumentation import count
+from .quantize import Quantization
+from .raster import Raster
+from .utils import validate_year
+
+
+class SharedTile:
+    """
+    Picklable handle of a tile held in shared memory.
+
+    Args:
+        name: Name of the shared memory segment.
+        shape: Array shape (height, width, bands).
+        dtype: Array dtype name.
+        bounds: Tile footprint as (west, south, east, north).
+        year: Year of the tile.
+        tile_id: Identifier of the tile.
+        quantization: Quantization parameters as a dict, for int8 tiles.
+
+    Example:
+        >>> raster = tile.attach()  # in a worker: zero-copy view
+        >>> tile.detach()
+    """
+
+    def __init__(
+        self,
+        name: str,
+        shape: Tuple[int, ...],
+        dtype: str,
+        bounds: Sequence[float],
+        year: int,
+        tile_id: str,
+        quantization: Optional[Dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.bounds = tuple(bounds)
+        self.year = year
+        self.tile_id = tile_id
+        self.quantization = quantization
+
+    def __repr__(self) -> str:
+        return f"SharedTile({self.year}, {self.tile_id!r}, shape={self.shape}, name={self.name!r})"
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the tile's pixels in bytes."""
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+    def attach(self) -> Raster:
+        """
+        Map the segment and wrap it in a Raster without copying.
+
+        Repeated attaches in one process share a single mapping.
+
+        Returns:
+            A Raster whose data is a read-only view of the shared buffer.
+        """
+        with _attached_lock:
+            entry = _attached.get(self.name)
+            if entry is None:
+                entry = [_open_segment(self.name), 0]
+                _attached[self.name] = entry
+            entry[1] += 1
+        count("shared.attaches")
+        data = np.ndarray(self.shape, dtype=self.dtype, buffer=entry[0].buf)
+        data.flags.writeable = False
+        quantization = (
+            Quantization.from_dict(self.quantization) if self.quantization is not None else None
+        )
+        return Raster(data, self.bounds, year=self.year, quantization=quantization)
+
+    def detach(self) -> None:
+        """
+        Drop one attachment, unmapping the segment after the last one.
+
+        Views returned by :meth:`attach` must no longer be used; while any
+        of them is still alive the mapping is kept open.
+        """
+        with _attached_lock:
+            entry = _attached.get(self.name)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            try:
+                entry[0].close()
+            except BufferError:
+                # A view is still referenced; keep the mapping for reuse
+                entry[1] = 0
+                return
+            del _attached[self.name]
+
+
+class SharedEmbeddingStore:
+    """
+    Owner of shared-memory copies of cached embedding tiles.
+
+    Args:
+        backend: LocalBackend whose tiles are shared. Defaults to the
+            backend set with ``set_backend``.
+
+    Example:
+        >>> with SharedEmbeddingStore(LocalBackend("~/alphaearth_cache")) as store:
+        ...     tile = store.acquire(2024, "sf")
+        ...     result = pool.submit(analyse, tile).result()  # worker calls tile.attach()
+        ...     store.release(tile)
+    """
+
+    def __init__(self, backend: Optional[LocalBackend] = None):
+        backend = backend or get_backend()
+        if not isinstance(backend, LocalBackend):
+            raise TypeError("SharedEmbeddingStore needs a LocalBackend")
+        self.backend = backend
+        self._segments: Dict[Tuple[int, str], shared_memory.SharedMemory] = {}
+        self._tiles: Dict[Tuple[int, str], SharedTile] = {}
+        self._refs: Dict[Tuple[int, str], int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    def __contains__(self, key: Tuple[int, str]) -> bool:
+        return key in self._tiles
+
+    def __enter__(self) -> "SharedEmbeddingStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of pixels currently held in shared memory."""
+        return sum(tile.nbytes for tile in self._tiles.values())
+
+    def acquire(self, year: int, tile_id: str) -> SharedTile:
+        """
+        Get a tile's shared handle, loading it on first use.
+
+        Args:
+            year: Year of the tile.
+            tile_id: Identifier of the cached tile.
+
+        Returns:
+            The SharedTile handle. Pass it to :meth:`release` when the work
+            using it is done.
+        """
+        key = (int(year), tile_id)
+        with self._lock:
+            if key not in self._tiles:
+                self._load(*key)
+            self._refs[key] += 1
+            return self._tiles[key]
+
+    def release(self, tile: SharedTile) -> None:
+        """
+        Drop one reference to a tile, unlinking it after the last one.
+
+        Args:
+            tile: Handle returned by :meth:`acquire`.
+        """
+        key = (tile.year, tile.tile_id)
+        with self._lock:
+            refs = self._refs.get(key)
+            if refs is None:
+                raise KeyError(f"Tile {key} is not held by this store")
+            if refs > 1:
+                self._refs[key] = refs - 1
+                return
+            self._unlink(key)
+
+    def refcount(self, year: int, tile_id: str) -> int:
+        """Number of unreleased acquires of a tile (0 if not loaded)."""
+        return self._refs.get((int(year), tile_id), 0)
+
+    def close(self) -> None:
+        """Unlink every segment regardless of its reference count."""
+        with self._lock:
+            for key in list(self._segments):
+                self._unlink(key)
+
+    def _load(self, year: int, tile_id: str) -> None:
+        # Copy the tile chunk by chunk from its memory-mapped files straight
+        # into the segment, without an intermediate full-size array
+        store = self.backend.open_tile(year, tile_id)
+        segment = shared_memory.SharedMemory(
+            create=True, size=max(1, int(np.prod(store.shape)) * store.dtype.itemsize)
+        )
+        try:
+            data = np.ndarray(store.shape, dtype=store.dtype, buffer=segment.buf)
+            for chunk_row, chunk_col in store.iter_chunks():
+                row0, row1, col0, col1 = store.chunk_window(chunk_row, chunk_col)
+                data[row0:row1, col0:col1] = store.read_chunk(chunk_row, chunk_col)
+            del data
+        except BaseException:
+            segment.close()
+            segment.unlink()
+            raise
+
+        count("shared.tiles_loaded")
+        count("shared.bytes_loaded", segment.size)
+        self._segments[(year, tile_id)] = segment
+        self._tiles[(year, tile_id)] = SharedTile(
+            segment.name,
+            store.shape,
+            store.dtype.name,
+            store.attrs["bounds"],
+            year,
+            tile_id,
+            store.attrs.get("quantization"),
+        )
+        self._refs[(year, tile_id)] = 0
+
+    def _unlink(self, key: Tuple[int, str]) -> None:
+        segment = self._segments.pop(key)
+        del self._tiles[key]
+        del self._refs[key]
+        segment.close()
+        segment.unlink()
+
+
+def shared_change(
+    year1: int,
+    year2: int,
+    tile_ids: Optional[Sequence[str]] = None,
+    backend: Optional[LocalBackend] = None,
+    max_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[Tuple[str, Raster]]:
+    """
+    Compare cached tiles of two years on a process pool via shared memory.
+
+    Each tile is loaded into shared memory once and released as soon as its
+    comparison returns, so host memory stays at about ``max_in_flight``
+    tile pairs however many workers run.
+
+    Args:
+        year1: First year for comparison.
+        year2: Second year for comparison.
+        tile_ids: Tiles to compare. Defaults to every tile cached for both
+            years.
+        backend: LocalBackend holding the tiles. Defaults to the backend
+            set with ``set_backend``.
+        max_workers: Number of worker processes. Defaults to the CPU count.
+        max_in_flight: Maximum tile pairs held in shared memory. Defaults
+            to twice the number of workers.
+
+    Yields:
+        Tuples of (tile_id, similarity Raster), in completion order.
+
+    Example:
+        >>> for tile_id, change in shared_change(2017, 2024, backend=LocalBackend("~/cache")):
+        ...     print(tile_id, float(change.data.mean()))
+    """
+    validate_year(year1)
+    validate_year(year2)
+    backend = backend or get_backend()
+    if tile_ids is None:
+        ids1 = {tile_id for tile_id, _ in backend.tile_index.tiles(year1)}
+        tile_ids = [tile_id for tile_id, _ in backend.tile_index.tiles(year2) if tile_id in ids1]
+
+    workers = max_workers or os.cpu_count() or 1
+    limit = max_in_flight or 2 * workers
+    with SharedEmbeddingStore(backend) as store, ProcessPoolExecutor(workers) as pool:
+        pending: Dict[Any, Tuple[str, SharedTile, SharedTile]] = {}
+        remaining: List[str] = list(tile_ids)[::-1]
+        while remaining or pending:
+            while remaining and len(pending) < limit:
+                tile_id = remaining.pop()
+                tile1 = store.acquire(year1, tile_id)
+                tile2 = store.acquire(year2, tile_id)
+                pending[pool.submit(_shared_similarity, tile1, tile2)] = (tile_id, tile1, tile2)
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                tile_id, tile1, tile2 = pending.pop(future)
+                store.release(tile1)
+                store.release(tile2)
+                yield tile_id, Raster(future.result(), tile1.bounds, band_names=["similarity"])
+
+
+def _shared_similarity(tile1: SharedTile, tile2: SharedTile) -> np.ndarray:
+    # Runs in a worker: compare two attached tiles without copying them
+    image1, image2 = tile1.attach(), tile2.attach()
+    try:
+        return LocalBackend().calculate_change(image1, image2).data
+    finally:
+        del image1, image2
+        tile1.detach()
+        tile2.detach()
+
+
+def _open_segment(name: str) -> shared_memory.SharedMemory:
+    # Attach without registering the segment for cleanup on exit; only the
+    # owner unlinks it. Before 3.13 the attach registers it with the
+    # resource tracker shared with the owner, which is harmless because
+    # the owner's unlink unregisters it.
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+# Mappings attached in this process: segment name -> [SharedMemory, count]
+_attached: Dict[str, List[Any]] = {}
+_attached_lock = threading.Lock()
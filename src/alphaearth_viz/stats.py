@@ -0,0 +1,517 @@
+"""
+Per-band statistics catalogue for AlphaEarth tiles.
+
+``get_vis_params`` stretches every band over a fixed [-0.3, 0.3] range,
+which suits some regions and washes out others. The catalogue here holds,
+for each (year, tile), per-band counts, min/max, mean/variance and a
+fixed-bin histogram, computed in one streaming pass over the tile. These
+sketches merge exactly, so statistics for a whole year are the merge of
+its tiles, and percentile stretches are looked up instead of recomputed.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .compute import DEFAULT_MEMORY_BUDGET, block_rows, iter_row_blocks
+from .quantize import Quantization
+from .raster import Raster
+from .store import ChunkStore
+from .tile_index import TileIndex
+from .utils import DEFAULT_CACHE_DIR, get_all_band_names
+
+
+DEFAULT_STATS_DIR = os.path.join(DEFAULT_CACHE_DIR, "band_stats")
+
+# Histogram range; AlphaEarth embeddings are unit vectors, so every band
+# lies in [-1, 1]
+HISTOGRAM_RANGE = (-1.0, 1.0)
+DEFAULT_BINS = 1024
+
+
+class BandStatistics:
+    """
+    Mergeable per-band summary of embedding values.
+
+    Tracks count, min, max, mean and variance (with Chan's parallel
+    update) and a fixed-bin histogram over [-1, 1] from which percentiles
+    are interpolated to within one bin width (about 0.002 by default).
+    NaNs are ignored.
+
+    Args:
+        band_names: Names of the bands. Defaults to A01-A64.
+        bins: Number of histogram bins. Defaults to 1024.
+
+    Example:
+        >>> stats = BandStatistics().update(raster)
+        >>> stats.percentile(98, ["A01"])
+    """
+
+    def __init__(self, band_names: Optional[List[str]] = None, bins: int = DEFAULT_BINS):
+        self.band_names = list(band_names) if band_names is not None else get_all_band_names()
+        self.bins = bins
+        bands = len(self.band_names)
+        self.count = np.zeros(bands, dtype=np.int64)
+        self.mean = np.zeros(bands)
+        self.m2 = np.zeros(bands)
+        self.min = np.full(bands, np.inf)
+        self.max = np.full(bands, -np.inf)
+        self.histogram = np.zeros((bands, bins), dtype=np.int64)
+
+    def __repr__(self) -> str:
+        return f"BandStatistics(bands={len(self.band_names)}, count={int(self.count.max(initial=0))})"
+
+    @property
+    def std(self) -> np.ndarray:
+        """Per-band population standard deviation."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt(np.where(self.count > 0, self.m2 / self.count, np.nan))
+
+    def update(
+        self,
+        data: Any,
+        quantization: Optional[Quantization] = None,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    ) -> "BandStatistics":
+        """
+        Add the pixels of a block, tile or ChunkStore to the statistics.
+
+        Args:
+            data: Raster, ChunkStore or array of shape (..., bands).
+                ChunkStores are read one chunk at a time.
+            quantization: Parameters to decode int8 array input with.
+                Taken from the Raster or store when not given.
+            memory_budget: Working-memory budget in bytes for one block.
+
+        Returns:
+            The statistics, for chaining.
+        """
+        if isinstance(data, ChunkStore):
+            params = data.attrs.get("quantization")
+            if quantization is None and params is not None:
+                quantization = Quantization.from_dict(params)
+            for chunk_row, chunk_col in data.iter_chunks():
+                self.update(data.read_chunk(chunk_row, chunk_col), quantization, memory_budget)
+            return self
+        if isinstance(data, Raster):
+            quantization = quantization or data.quantization
+            data = data.data
+
+        flat = data.reshape(-1, data.shape[-1])
+        if flat.shape[1] != len(self.band_names):
+            raise ValueError(f"Got {flat.shape[1]} bands, expected {len(self.band_names)}")
+        rows = block_rows(1, flat.shape[1], 4, memory_budget)
+        for row0, row1 in iter_row_blocks(flat.shape[0], rows):
+            block = flat[row0:row1]
+            if quantization is not None:
+                block = quantization.dequantize(block)
+            self._add_block(np.asarray(block, dtype=np.float32))
+        return self
+
+    def merge(self, other: "BandStatistics") -> "BandStatistics":
+        """
+        Combine two summaries of the same bands into a new one.
+
+        Args:
+            other: Statistics of other pixels.
+
+        Returns:
+            Statistics equal to those of all pixels of both inputs.
+        """
+        if other.band_names != self.band_names or other.bins != self.bins:
+            raise ValueError("Only statistics of the same bands and bins can be merged")
+        merged = BandStatistics(self.band_names, self.bins)
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.where(count > 0, other.count / count, 0.0)
+        merged.count = count
+        merged.mean = self.mean + delta * share
+        merged.m2 = self.m2 + other.m2 + delta**2 * self.count * share
+        merged.min = np.fmin(self.min, other.min)
+        merged.max = np.fmax(self.max, other.max)
+        merged.histogram = self.histogram + other.histogram
+        return merged
+
+    def select(self, bands: Sequence[str]) -> "BandStatistics":
+        """Return the statistics of a subset of bands."""
+        indexes = [self.band_names.index(band) for band in bands]
+        selected = BandStatistics(list(bands), self.bins)
+        for name in ("count", "mean", "m2", "min", "max", "histogram"):
+            setattr(selected, name, getattr(self, name)[indexes])
+        return selected
+
+    def percentile(self, q: float, bands: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Approximate per-band percentiles from the histogram.
+
+        Args:
+            q: Percentile in [0, 100].
+            bands: Bands to report. Defaults to all bands.
+
+        Returns:
+            Array with one value per band (NaN for bands without data).
+        """
+        stats = self.select(bands) if bands is not None else self
+        low, high = HISTOGRAM_RANGE
+        width = (high - low) / stats.bins
+
+        cumulative = np.cumsum(stats.histogram, axis=1)
+        target = q / 100.0 * stats.count
+        index = np.array(
+            [np.searchsorted(row, t, side="left") for row, t in zip(cumulative, target)]
+        )
+        index = np.minimum(index, stats.bins - 1)
+        bands_range = np.arange(len(index))
+        before = np.where(index > 0, cumulative[bands_range, np.maximum(index - 1, 0)], 0)
+        in_bin = stats.histogram[bands_range, index]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fraction = np.where(in_bin > 0, (target - before) / in_bin, 0.0)
+        values = low + (index + np.clip(fraction, 0, 1)) * width
+        values = np.clip(values, stats.min, stats.max)
+        return np.where(stats.count > 0, values, np.nan)
+
+    def stretch(
+        self,
+        bands: Sequence[str],
+        percentiles: Tuple[float, float] = (2, 98),
+    ) -> Tuple[float, float]:
+        """
+        Common display range for a band combination.
+
+        Args:
+            bands: Bands shown together, e.g. an RGB combination.
+            percentiles: Lower and upper percentiles. Defaults to (2, 98).
+
+        Returns:
+            Tuple of (min, max): the lowest lower percentile and the highest
+            upper percentile across the bands.
+        """
+        low = np.nanmin(self.percentile(percentiles[0], bands))
+        high = np.nanmax(self.percentile(percentiles[1], bands))
+        return float(low), float(high)
+
+    def summary(self, percentiles: Sequence[float] = (2, 50, 98)) -> Dict[str, Dict[str, float]]:
+        """
+        Per-band summary as a dict of band name to statistics.
+
+        Args:
+            percentiles: Percentiles to include as "p<N>" keys.
+
+        Returns:
+            Dict mapping each band to "count", "min", "max", "mean", "std"
+            and percentile values.
+        """
+        values = {f"p{q}": self.percentile(q) for q in percentiles}
+        std = self.std
+        result = {}
+        for i, band in enumerate(self.band_names):
+            row = {
+                "count": int(self.count[i]),
+                "min": float(self.min[i]),
+                "max": float(self.max[i]),
+                "mean": float(self.mean[i]),
+                "std": float(std[i]),
+            }
+            row.update({key: float(value[i]) for key, value in values.items()})
+            result[band] = row
+        return result
+
+    def save(self, path: str, **attrs: Any) -> None:
+        """
+        Write the statistics to a compressed .npz file.
+
+        Args:
+            path: Destination file.
+            **attrs: Extra arrays to store, e.g. ``bounds``.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as fh:
+            np.savez_compressed(
+                fh,
+                band_names=np.array(self.band_names, dtype=str),
+                count=self.count,
+                mean=self.mean,
+                m2=self.m2,
+                min=self.min,
+                max=self.max,
+                histogram=self.histogram,
+                **attrs,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Tuple["BandStatistics", Dict[str, np.ndarray]]:
+        """
+        Read statistics written with :meth:`save`.
+
+        Args:
+            path: File written by :meth:`save`.
+
+        Returns:
+            Tuple of (statistics, dict of extra arrays).
+        """
+        with np.load(path) as saved:
+            stats = cls(saved["band_names"].tolist(), saved["histogram"].shape[1])
+            for name in ("count", "mean", "m2", "min", "max", "histogram"):
+                setattr(stats, name, saved[name])
+            extra = {
+                name: saved[name]
+                for name in saved.files
+                if name not in ("band_names", "count", "mean", "m2", "min", "max", "histogram")
+            }
+        return stats, extra
+
+    def _add_block(self, block: np.ndarray) -> None:
+        # block may be a read-only view; sums are accumulated in float64
+        # without float64 copies, and one float32 and one int32 scratch
+        # array are reused for the deviations and histogram bins
+        valid = ~np.isnan(block)
+        count = valid.sum(axis=0)
+        if not count.any():
+            return
+        total = np.add.reduce(block, axis=0, dtype=np.float64, where=valid)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, total / count, 0.0)
+        scratch = np.subtract(block, mean.astype(np.float32))
+        np.square(scratch, out=scratch)
+        m2 = np.add.reduce(scratch, axis=0, dtype=np.float64, where=valid)
+
+        block_stats = BandStatistics(self.band_names, self.bins)
+        block_stats.count = count
+        block_stats.mean = mean
+        block_stats.m2 = m2
+        block_stats.min = np.fmin.reduce(block, axis=0, initial=np.inf, where=valid)
+        block_stats.max = np.fmax.reduce(block, axis=0, initial=-np.inf, where=valid)
+
+        # Bin index of each value, offset per band; missing values go to an
+        # extra bin that is dropped. With the default range the scale is a
+        # power of two and the offset an integer, so floor(x * scale) +
+        # offset is exact in float32.
+        low, high = HISTOGRAM_RANGE
+        bands = block.shape[1]
+        scale = self.bins / (high - low)
+        offset = -low * scale
+        np.multiply(block, scale, out=scratch)
+        if float(offset).is_integer():
+            np.floor(scratch, out=scratch)
+            scratch += offset
+        else:
+            scratch += offset
+            np.floor(scratch, out=scratch)
+        np.clip(scratch, 0, self.bins - 1, out=scratch)
+        np.copyto(scratch, 0, where=~valid)
+        bins = scratch.astype(np.int32)
+        bins += np.arange(bands, dtype=np.int32) * self.bins
+        bins[~valid] = bands * self.bins
+        block_stats.histogram = np.bincount(
+            bins.ravel(), minlength=bands * self.bins + 1
+        )[:-1].reshape(bands, self.bins)
+
+        merged = self.merge(block_stats)
+        for name in ("count", "mean", "m2", "min", "max", "histogram"):
+            setattr(self, name, getattr(merged, name))
+
+
+class StatsCatalog:
+    """
+    On-disk catalogue of BandStatistics per (year, tile).
+
+    Entries are stored as ``<directory>/<year>/<tile_id>.npz`` together with
+    the tile footprint, and loaded on first use. Opening a catalogue only
+    lists the entry files; footprints are read when the first location
+    lookup needs the spatial index. Year-wide statistics are merged from the
+    tiles once and then served from memory.
+
+    Args:
+        directory: Catalogue directory. Defaults to ``band_stats`` in the
+            package cache directory.
+
+    Example:
+        >>> catalog = StatsCatalog()
+        >>> catalog.build(LocalBackend("~/alphaearth_cache"))
+        >>> get_vis_params(["A01", "A16", "A09"], stats=catalog.lookup(-122.4, 37.8, 2024))
+    """
+
+    def __init__(self, directory: str = DEFAULT_STATS_DIR):
+        self.directory = os.path.expanduser(directory)
+        # Footprint of every catalogued (year, tile), None until read
+        self._footprints: Dict[Tuple[int, str], Optional[List[float]]] = {}
+        self._tile_index: Optional[TileIndex] = None
+        self._entries: Dict[Tuple[int, str], BandStatistics] = {}
+        self._merged: Dict[int, BandStatistics] = {}
+        if os.path.isdir(self.directory):
+            self._scan()
+
+    def __len__(self) -> int:
+        return len(self._footprints)
+
+    def __contains__(self, key: Tuple[int, str]) -> bool:
+        year, tile_id = key
+        return (int(year), tile_id) in self._footprints
+
+    @property
+    def tile_index(self) -> TileIndex:
+        """Spatial index of the catalogued tiles, built on first use."""
+        if self._tile_index is None:
+            index = TileIndex()
+            for (year, tile_id), bounds in sorted(self._footprints.items()):
+                if bounds is None:
+                    with np.load(self._entry_path(year, tile_id)) as saved:
+                        bounds = saved["bounds"].tolist()
+                    self._footprints[(year, tile_id)] = bounds
+                index.add(year, tile_id, bounds)
+            self._tile_index = index
+        return self._tile_index
+
+    def add(
+        self,
+        year: int,
+        tile_id: str,
+        stats: BandStatistics,
+        bounds: Sequence[float],
+    ) -> None:
+        """
+        Store the statistics of one tile.
+
+        Args:
+            year: Year of the tile.
+            tile_id: Identifier of the tile.
+            stats: Statistics of the tile.
+            bounds: Tile footprint as (west, south, east, north).
+        """
+        stats.save(self._entry_path(year, tile_id), bounds=np.asarray(bounds, dtype=np.float64))
+        if (year, tile_id) not in self:
+            if self._tile_index is not None:
+                self._tile_index.add(year, tile_id, bounds)
+            self._footprints[(int(year), tile_id)] = list(bounds)
+        self._entries[(year, tile_id)] = stats
+        self._merged.pop(year, None)
+
+    def compute(
+        self,
+        data: Any,
+        year: int,
+        tile_id: str,
+        bounds: Optional[Sequence[float]] = None,
+    ) -> BandStatistics:
+        """
+        Compute and store the statistics of a tile in one streaming pass.
+
+        Args:
+            data: Raster or ChunkStore of the tile.
+            year: Year of the tile.
+            tile_id: Identifier of the tile.
+            bounds: Tile footprint. Taken from the Raster or the store's
+                "bounds" attribute when not given.
+
+        Returns:
+            The tile's BandStatistics.
+        """
+        if bounds is None:
+            bounds = data.bounds if isinstance(data, Raster) else data.attrs["bounds"]
+        band_names = data.band_names if isinstance(data, Raster) else None
+        stats = BandStatistics(band_names).update(data)
+        self.add(year, tile_id, stats, bounds)
+        return stats
+
+    def build(self, backend: Any, years: Optional[Sequence[int]] = None) -> int:
+        """
+        Add statistics for every tile of a LocalBackend not yet catalogued.
+
+        Args:
+            backend: LocalBackend whose tiles to summarise.
+            years: Years to include. Defaults to all years of the backend.
+
+        Returns:
+            Number of tiles added.
+        """
+        added = 0
+        for year in years if years is not None else backend.tile_index.years:
+            for tile_id, bounds in backend.tile_index.tiles(year):
+                if (year, tile_id) in self:
+                    continue
+                self.compute(backend.open_tile(year, tile_id), year, tile_id, bounds)
+                added += 1
+        return added
+
+    def get(self, year: int, tile_id: Optional[str] = None) -> Optional[BandStatistics]:
+        """
+        Statistics of one tile, or of all tiles of a year merged.
+
+        Args:
+            year: Year to look up.
+            tile_id: Tile to look up. Defaults to the whole year.
+
+        Returns:
+            The BandStatistics, or None if nothing is catalogued.
+        """
+        if tile_id is not None:
+            if (year, tile_id) not in self:
+                return None
+            if (year, tile_id) not in self._entries:
+                self._entries[(year, tile_id)], _ = BandStatistics.load(
+                    self._entry_path(year, tile_id)
+                )
+            return self._entries[(year, tile_id)]
+
+        if year not in self._merged:
+            tile_ids = sorted(tile_id for key_year, tile_id in self._footprints if key_year == year)
+            tiles = [self.get(year, tile_id) for tile_id in tile_ids]
+            if not tiles:
+                return None
+            merged = tiles[0]
+            for stats in tiles[1:]:
+                merged = merged.merge(stats)
+            self._merged[year] = merged
+        return self._merged[year]
+
+    def lookup(self, lon: float, lat: float, year: int) -> Optional[BandStatistics]:
+        """
+        Statistics of the tile covering a location, falling back to the year.
+
+        Args:
+            lon: Longitude of the location (degrees).
+            lat: Latitude of the location (degrees).
+            year: Year to look up.
+
+        Returns:
+            The BandStatistics, or None if nothing is catalogued for the year.
+        """
+        tile_ids = self.tile_index.lookup(lon, lat, year)
+        if tile_ids:
+            return self.get(year, tile_ids[0])
+        return self.get(year)
+
+    def _entry_path(self, year: int, tile_id: str) -> str:
+        return os.path.join(self.directory, str(year), f"{tile_id}.npz")
+
+    def _scan(self) -> None:
+        for year_dir in sorted(os.listdir(self.directory)):
+            year_path = os.path.join(self.directory, year_dir)
+            if not (year_dir.isdigit() and os.path.isdir(year_path)):
+                continue
+            for name in sorted(os.listdir(year_path)):
+                if name.endswith(".npz"):
+                    self._footprints[(int(year_dir), name[:-4])] = None
+
+
+_default_catalog: Optional[StatsCatalog] = None
+
+
+def get_stats_catalog() -> StatsCatalog:
+    """
+    Get the catalogue in the package cache directory, shared by callers.
+
+    Returns:
+        The process-wide StatsCatalog, opened on first use.
+    """
+    global _default_catalog
+    if _default_catalog is None:
+        _default_catalog = StatsCatalog()
+    return _default_catalog
@@ -0,0 +1,266 @@
+"""
+Chunked on-disk array storage for AlphaEarth rasters.
+
+A ChunkStore is a Zarr-style directory holding a ``meta.json`` descriptor and
+one ``.npy`` file per (row, column) chunk. Chunks are opened memory-mapped, so
+reading a window only touches the bytes it covers.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+Window = Tuple[int, int, int, int]
+
+META_FILE = "meta.json"
+
+
+class ChunkStore:
+    """
+    A 2-D (optionally multi-band) array split into fixed-size chunk files.
+
+    The array has shape (height, width) or (height, width, bands) and is
+    chunked along the first two axes only. Chunks that were never written
+    read back as ``fill_value``.
+
+    Use :meth:`create` to make a new store and :meth:`open` to open an
+    existing one.
+
+    Example:
+        >>> store = ChunkStore.create("tile", (1024, 1024, 64), "float32")
+        >>> store.write(array, row=0, col=0)
+        >>> block = store.read((0, 256, 0, 256))
+    """
+
+    def __init__(self, path: str, meta: Dict[str, Any]):
+        self.path = path
+        self._meta = meta
+
+    @classmethod
+    def create(
+        cls,
+        path: str,
+        shape: Sequence[int],
+        dtype: Any = "float32",
+        chunks: Sequence[int] = (512, 512),
+        fill_value: Optional[float] = None,
+        attrs: Optional[Dict[str, Any]] = None,
+    ) -> "ChunkStore":
+        """
+        Create an empty store on disk.
+
+        Args:
+            path: Directory for the store. Created if missing.
+            shape: Array shape, (height, width) or (height, width, bands).
+            dtype: NumPy dtype of the stored values. Defaults to float32.
+            chunks: Chunk size as (rows, columns). Defaults to (512, 512).
+            fill_value: Value returned for unwritten chunks. Defaults to NaN
+                for floating dtypes and 0 otherwise.
+            attrs: Optional JSON-serialisable metadata (bounds, year, ...).
+
+        Returns:
+            The new ChunkStore.
+        """
+        if len(shape) not in (2, 3):
+            raise ValueError("shape must be (height, width) or (height, width, bands)")
+        dtype = np.dtype(dtype)
+        if fill_value is None:
+            fill_value = float("nan") if dtype.kind == "f" else 0
+
+        meta = {
+            "shape": [int(v) for v in shape],
+            "dtype": dtype.str,
+            "chunks": [int(chunks[0]), int(chunks[1])],
+            "fill_value": fill_value if fill_value == fill_value else "NaN",
+            "attrs": attrs or {},
+        }
+        os.makedirs(path, exist_ok=True)
+        store = cls(path, meta)
+        store._write_meta()
+        return store
+
+    @classmethod
+    def open(cls, path: str) -> "ChunkStore":
+        """
+        Open an existing store.
+
+        Args:
+            path: Directory containing the store's ``meta.json``.
+
+        Returns:
+            The opened ChunkStore.
+        """
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        return cls(path, meta)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """Return True if ``path`` holds a ChunkStore."""
+        return os.path.exists(os.path.join(path, META_FILE))
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return tuple(self._meta["shape"])
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(self._meta["dtype"])
+
+    @property
+    def chunks(self) -> Tuple[int, int]:
+        return tuple(self._meta["chunks"])
+
+    @property
+    def fill_value(self) -> float:
+        value = self._meta["fill_value"]
+        return float("nan") if value == "NaN" else value
+
+    @property
+    def attrs(self) -> Dict[str, Any]:
+        return self._meta["attrs"]
+
+    @property
+    def grid_shape(self) -> Tuple[int, int]:
+        """Number of chunks along the row and column axes."""
+        height, width = self.shape[:2]
+        rows, cols = self.chunks
+        return (-(-height // rows), -(-width // cols))
+
+    def update_attrs(self, **attrs: Any) -> None:
+        """Merge ``attrs`` into the stored metadata and persist it."""
+        self._meta["attrs"].update(attrs)
+        self._write_meta()
+
+    def chunk_window(self, chunk_row: int, chunk_col: int) -> Window:
+        """Return the (row0, row1, col0, col1) pixel window of a chunk."""
+        height, width = self.shape[:2]
+        rows, cols = self.chunks
+        row0, col0 = chunk_row * rows, chunk_col * cols
+        return (row0, min(row0 + rows, height), col0, min(col0 + cols, width))
+
+    def iter_chunks(self) -> Iterator[Tuple[int, int]]:
+        """Yield every (chunk_row, chunk_col) in row-major order."""
+        grid_rows, grid_cols = self.grid_shape
+        for chunk_row in range(grid_rows):
+            for chunk_col in range(grid_cols):
+                yield chunk_row, chunk_col
+
+    def has_chunk(self, chunk_row: int, chunk_col: int) -> bool:
+        """Return True if the chunk has been written."""
+        return os.path.exists(self._chunk_path(chunk_row, chunk_col))
+
+    def read_chunk(self, chunk_row: int, chunk_col: int) -> np.ndarray:
+        """
+        Read a single chunk, memory-mapped when it exists on disk.
+
+        Args:
+            chunk_row: Chunk row number.
+            chunk_col: Chunk column number.
+
+        Returns:
+            The chunk array. Unwritten chunks are filled with ``fill_value``.
+        """
+        path = self._chunk_path(chunk_row, chunk_col)
+        if os.path.exists(path):
+            return np.load(path, mmap_mode="r")
+        row0, row1, col0, col1 = self.chunk_window(chunk_row, chunk_col)
+        return np.full(
+            (row1 - row0, col1 - col0) + self.shape[2:], self.fill_value, self.dtype
+        )
+
+    def write_chunk(self, chunk_row: int, chunk_col: int, data: np.ndarray) -> None:
+        """
+        Write a single chunk atomically.
+
+        Args:
+            chunk_row: Chunk row number.
+            chunk_col: Chunk column number.
+            data: Array matching the chunk's window shape.
+        """
+        row0, row1, col0, col1 = self.chunk_window(chunk_row, chunk_col)
+        expected = (row1 - row0, col1 - col0) + self.shape[2:]
+        if data.shape != expected:
+            raise ValueError(f"Chunk data has shape {data.shape}, expected {expected}")
+
+        path = self._chunk_path(chunk_row, chunk_col)
+        tmp_path = f"{path}.tmp.npy"
+        np.save(tmp_path, np.ascontiguousarray(data, dtype=self.dtype))
+        os.replace(tmp_path, path)
+
+    def read(self, window: Optional[Window] = None) -> np.ndarray:
+        """
+        Read a pixel window, assembling it from the chunks it overlaps.
+
+        A window inside a single chunk is returned as a memory-mapped view.
+
+        Args:
+            window: (row0, row1, col0, col1) to read. Defaults to the full array.
+
+        Returns:
+            The requested block.
+        """
+        height, width = self.shape[:2]
+        row0, row1, col0, col1 = window or (0, height, 0, width)
+        if not (0 <= row0 <= row1 <= height and 0 <= col0 <= col1 <= width):
+            raise ValueError(f"Window {window} is outside array of shape {self.shape}")
+
+        rows, cols = self.chunks
+        first_row, last_row = row0 // rows, max(row1 - 1, row0) // rows
+        first_col, last_col = col0 // cols, max(col1 - 1, col0) // cols
+
+        if first_row == last_row and first_col == last_col:
+            chunk = self.read_chunk(first_row, first_col)
+            r, c = first_row * rows, first_col * cols
+            return chunk[row0 - r:row1 - r, col0 - c:col1 - c]
+
+        out = np.empty((row1 - row0, col1 - col0) + self.shape[2:], self.dtype)
+        for chunk_row in range(first_row, last_row + 1):
+            for chunk_col in range(first_col, last_col + 1):
+                c_row0, c_row1, c_col0, c_col1 = self.chunk_window(chunk_row, chunk_col)
+                r0, r1 = max(row0, c_row0), min(row1, c_row1)
+                k0, k1 = max(col0, c_col0), min(col1, c_col1)
+                chunk = self.read_chunk(chunk_row, chunk_col)
+                out[r0 - row0:r1 - row0, k0 - col0:k1 - col0] = chunk[
+                    r0 - c_row0:r1 - c_row0, k0 - c_col0:k1 - c_col0
+                ]
+        return out
+
+    def write(self, data: np.ndarray, row: int = 0, col: int = 0) -> None:
+        """
+        Write a block whose origin is chunk-aligned.
+
+        Args:
+            data: Block to write. It may span several chunks.
+            row: Row offset of the block; must be a multiple of the chunk rows.
+            col: Column offset of the block; must be a multiple of the chunk columns.
+        """
+        rows, cols = self.chunks
+        if row % rows or col % cols:
+            raise ValueError("write offsets must be aligned to the chunk grid")
+
+        for r in range(row, row + data.shape[0], rows):
+            for c in range(col, col + data.shape[1], cols):
+                chunk_row, chunk_col = r // rows, c // cols
+                c_row0, c_row1, c_col0, c_col1 = self.chunk_window(chunk_row, chunk_col)
+                self.write_chunk(
+                    chunk_row,
+                    chunk_col,
+                    data[c_row0 - row:c_row1 - row, c_col0 - col:c_col1 - col],
+                )
+
+    def _chunk_path(self, chunk_row: int, chunk_col: int) -> str:
+        return os.path.join(self.path, f"{chunk_row}.{chunk_col}.npy")
+
+    def _write_meta(self) -> None:
+        path = os.path.join(self.path, META_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(self._meta, fh)
+        os.replace(tmp_path, path)
@@ -0,0 +1,457 @@
+"""
+Out-of-core change maps for large regions.
+
+Instead of exporting one large image, the region is walked in fixed-size
+chunks on a regular longitude/latitude grid. Each chunk is fetched, compared
+and written to a :class:`~alphaearth_viz.store.ChunkStore` before the next
+one is read, so memory use does not depend on the size of the region.
+Chunks already present in the output are skipped, so an interrupted run
+resumes where it stopped. Chunks the backend has no data for are written
+as NaN, so regions reaching into uncovered areas such as the ocean still
+complete.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import math
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .backends import (
+    DEFAULT_CHUNK_PIXELS,
+    METERS_PER_DEGREE,
+    EmbeddingBackend,
+    NoDataError,
+    backend_for,
+    get_backend,
+)
+from .quantize import NODATA
+from .raster import Raster
+from .store import ChunkStore
+from .utils import validate_year
+
+
+Bounds = Tuple[float, float, float, float]
+
+
+class ChunkGrid:
+    """
+    Regular pixel grid over a region, split into square chunks.
+
+    Args:
+        bbox: Region as (west, south, east, north) in degrees.
+        scale: Pixel size in metres at the equator. Defaults to 10.
+        chunk_pixels: Chunk side in pixels. Defaults to 1024, the
+            local backend default.
+
+    Example:
+        >>> grid = ChunkGrid((-123.0, 37.0, -121.0, 39.0), scale=10)
+        >>> grid.shape, grid.grid_shape
+    """
+
+    def __init__(
+        self,
+        bbox: Sequence[float],
+        scale: float = 10.0,
+        chunk_pixels: int = DEFAULT_CHUNK_PIXELS,
+    ):
+        west, south, east, north = bbox
+        self.step = scale / METERS_PER_DEGREE
+        self.scale = scale
+        self.chunk_pixels = chunk_pixels
+        width = max(1, math.ceil((east - west) / self.step - 1e-9))
+        height = max(1, math.ceil((north - south) / self.step - 1e-9))
+        self.shape = (height, width)
+        self.bounds: Bounds = (
+            west,
+            north - height * self.step,
+            west + width * self.step,
+            north,
+        )
+
+    @property
+    def grid_shape(self) -> Tuple[int, int]:
+        """Number of chunks along the row and column axes."""
+        return (
+            -(-self.shape[0] // self.chunk_pixels),
+            -(-self.shape[1] // self.chunk_pixels),
+        )
+
+    def chunk_bounds(self, chunk_row: int, chunk_col: int) -> Bounds:
+        """Geographic bounds of a chunk."""
+        west, _, _, north = self.bounds
+        row0, row1, col0, col1 = self.chunk_window(chunk_row, chunk_col)
+        return (
+            west + col0 * self.step,
+            north - row1 * self.step,
+            west + col1 * self.step,
+            north - row0 * self.step,
+        )
+
+    def chunk_window(self, chunk_row: int, chunk_col: int) -> Tuple[int, int, int, int]:
+        """Pixel window (row0, row1, col0, col1) of a chunk."""
+        size = self.chunk_pixels
+        row0, col0 = chunk_row * size, chunk_col * size
+        return (
+            row0,
+            min(row0 + size, self.shape[0]),
+            col0,
+            min(col0 + size, self.shape[1]),
+        )
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        rows, cols = self.grid_shape
+        for chunk_row in range(rows):
+            for chunk_col in range(cols):
+                yield chunk_row, chunk_col
+
+    def __len__(self) -> int:
+        rows, cols = self.grid_shape
+        return rows * cols
+
+
+def fit_to_shape(raster: Raster, shape: Sequence[int]) -> np.ndarray:
+    """
+    Resample a raster's data to an exact shape with nearest-neighbour lookup.
+
+    Used by :func:`fit_to_grid` when the source covers the same area as
+    the grid and only its resolution or rounding differs slightly.
+
+    Args:
+        raster: Raster to resample.
+        shape: Target (height, width).
+
+    Returns:
+        The resampled array (the original data when shapes already match).
+    """
+    height, width = shape[:2]
+    if raster.shape == (height, width):
+        return np.asarray(raster.data)
+    src_height, src_width = raster.shape
+    rows = ((np.arange(height) + 0.5) * src_height / height).astype(np.intp)
+    cols = ((np.arange(width) + 0.5) * src_width / width).astype(np.intp)
+    return np.asarray(raster.data)[rows[:, np.newaxis], cols]
+
+
+def fit_to_grid(raster: Raster, bounds: Sequence[float], shape: Sequence[int]) -> np.ndarray:
+    """
+    Place a raster's data on a pixel grid by geographic position.
+
+    Each grid pixel takes the source pixel under its centre. Grid pixels
+    outside the raster, e.g. where a chunk runs past the edge of a cached
+    tile, are NaN, or the :data:`~alphaearth_viz.quantize.NODATA` code for
+    int8 rasters.
+
+    Args:
+        raster: Raster to place.
+        bounds: Grid footprint as (west, south, east, north) in degrees.
+        shape: Grid (height, width).
+
+    Returns:
+        Array of shape (height, width, ...) on the grid.
+    """
+    height, width = shape[:2]
+    west, south, east, north = bounds
+    x_step, y_step = (east - west) / width, (north - south) / height
+    tolerance = 0.5 * min(x_step, y_step)
+    if all(abs(a - b) <= tolerance for a, b in zip(raster.bounds, bounds)):
+        return fit_to_shape(raster, shape)
+
+    data = np.asarray(raster.data)
+    src_west, _, _, src_north = raster.bounds
+    src_x, src_y = raster.pixel_size
+    src_height, src_width = raster.shape
+    cols = (west + (np.arange(width) + 0.5) * x_step - src_west) / src_x
+    cols = np.floor(cols).astype(np.intp)
+    rows = (src_north - north + (np.arange(height) + 0.5) * y_step) / src_y
+    rows = np.floor(rows).astype(np.intp)
+    col_ok = np.flatnonzero((cols >= 0) & (cols < src_width))
+    row_ok = np.flatnonzero((rows >= 0) & (rows < src_height))
+
+    if raster.quantization is not None:
+        out = np.full((height, width) + data.shape[2:], NODATA, dtype=data.dtype)
+    else:
+        out = np.full((height, width) + data.shape[2:], np.nan, dtype=np.float32)
+    if len(row_ok) and len(col_ok):
+        # Source indices grow with grid indices, so the covered part is one block
+        out[row_ok[0]:row_ok[-1] + 1, col_ok[0]:col_ok[-1] + 1] = data[
+            rows[row_ok][:, np.newaxis], cols[col_ok]
+        ]
+    return out
+
+
+def fetch_chunk(
+    backend: EmbeddingBackend,
+    grid: "ChunkGrid",
+    chunk_row: int,
+    chunk_col: int,
+    year: int,
+) -> Optional[Raster]:
+    """
+    Fetch the embeddings of one chunk, placed on the chunk grid.
+
+    Args:
+        backend: Backend to read embeddings from.
+        grid: Grid the chunk belongs to.
+        chunk_row: Chunk row.
+        chunk_col: Chunk column.
+        year: Year to read.
+
+    Returns:
+        A Raster exactly covering the chunk, NaN (or NODATA) where the
+        backend has no data, or None when no data intersects the chunk.
+    """
+    chunk_bbox = grid.chunk_bounds(chunk_row, chunk_col)
+    row0, row1, col0, col1 = grid.chunk_window(chunk_row, chunk_col)
+    try:
+        raster = backend.fetch_region(chunk_bbox, year, scale=grid.scale)
+    except NoDataError:
+        return None
+    return Raster(
+        fit_to_grid(raster, chunk_bbox, (row1 - row0, col1 - col0)),
+        chunk_bbox,
+        band_names=raster.band_names,
+        year=year,
+        quantization=raster.quantization,
+    )
+
+
+def chunk_similarity(
+    image1: Optional[Raster], image2: Optional[Raster], shape: Sequence[int]
+) -> np.ndarray:
+    """
+    Similarity of two chunks from :func:`fetch_chunk`, NaN if either is None.
+
+    Args:
+        image1: Chunk of the first year.
+        image2: Chunk of the second year.
+        shape: Chunk (height, width).
+
+    Returns:
+        Float32 array of shape (height, width).
+    """
+    if image1 is None or image2 is None:
+        return np.full(tuple(shape[:2]), np.nan, dtype=np.float32)
+    return np.asarray(backend_for(image1).calculate_change(image1, image2).data)
+
+
+def iter_change_chunks(
+    bbox: Sequence[float],
+    year1: int,
+    year2: int,
+    scale: float = 10.0,
+    chunk_pixels: Optional[int] = None,
+    backend: Optional[EmbeddingBackend] = None,
+    skip: Optional[Callable[[int, int], bool]] = None,
+) -> Iterator[Tuple[int, int, Raster]]:
+    """
+    Yield change similarity for a region one chunk at a time.
+
+    Args:
+        bbox: Region as (west, south, east, north) in degrees.
+        year1: First year for comparison.
+        year2: Second year for comparison.
+        scale: Pixel size in metres at the equator. Defaults to 10.
+        chunk_pixels: Chunk side in pixels. Defaults to the backend's
+            ``chunk_pixels()``: 1024, or 384 on Earth Engine.
+        backend: Backend to read embeddings from. Defaults to the backend
+            set with ``set_backend``.
+        skip: Optional predicate called with (chunk_row, chunk_col); chunks
+            for which it returns True are not computed.
+
+    Yields:
+        Tuples of (chunk_row, chunk_col, similarity Raster on the chunk grid),
+        NaN where either year has no data.
+    """
+    validate_year(year1)
+    validate_year(year2)
+    backend = backend or get_backend()
+    chunk_pixels = chunk_pixels or backend.chunk_pixels()
+    grid = ChunkGrid(bbox, scale=scale, chunk_pixels=chunk_pixels)
+
+    for chunk_row, chunk_col in grid:
+        if skip is not None and skip(chunk_row, chunk_col):
+            continue
+        row0, row1, col0, col1 = grid.chunk_window(chunk_row, chunk_col)
+        data = chunk_similarity(
+            fetch_chunk(backend, grid, chunk_row, chunk_col, year1),
+            fetch_chunk(backend, grid, chunk_row, chunk_col, year2),
+            (row1 - row0, col1 - col0),
+        )
+        chunk_bbox = grid.chunk_bounds(chunk_row, chunk_col)
+        yield chunk_row, chunk_col, Raster(data, chunk_bbox, band_names=["similarity"])
+
+
+def stream_change(
+    bbox: Sequence[float],
+    year1: int,
+    year2: int,
+    path: str,
+    scale: float = 10.0,
+    chunk_pixels: Optional[int] = None,
+    backend: Optional[EmbeddingBackend] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    max_workers: int = 1,
+) -> ChunkStore:
+    """
+    Compute a change map for a large region into a chunked store.
+
+    Re-running with the same arguments resumes an interrupted run: chunks
+    already written are skipped.
+
+    Args:
+        bbox: Region as (west, south, east, north) in degrees.
+        year1: First year for comparison.
+        year2: Second year for comparison.
+        path: Directory of the output ChunkStore.
+        scale: Pixel size in metres at the equator. Defaults to 10.
+        chunk_pixels: Chunk side in pixels. Defaults to the backend's
+            ``chunk_pixels()``: 1024, or 384 on Earth Engine.
+        backend: Backend to read embeddings from. Defaults to the backend
+            set with ``set_backend``.
+        progress: Optional callback called with (chunks_done, chunks_total)
+            after each chunk is written.
+        max_workers: Number of chunks fetched concurrently. Values above 1
+            pipeline fetching and computing with a TileScheduler.
+
+    Returns:
+        The output ChunkStore of float32 similarity values.
+
+    Raises:
+        ValueError: If ``path`` holds a store made with different arguments.
+
+    Example:
+        >>> store = stream_change((-123.0, 37.0, -121.0, 39.0), 2017, 2024, "sf_change")
+        >>> store.read((0, 512, 0, 512))
+    """
+    backend = backend or get_backend()
+    chunk_pixels = chunk_pixels or backend.chunk_pixels()
+    grid = ChunkGrid(bbox, scale=scale, chunk_pixels=chunk_pixels)
+    attrs: Dict[str, Any] = {
+        "bounds": list(grid.bounds),
+        "year1": year1,
+        "year2": year2,
+        "scale": scale,
+        "band_names": ["similarity"],
+    }
+
+    if ChunkStore.exists(path):
+        store = ChunkStore.open(path)
+        matches = (
+            store.shape == grid.shape
+            and store.chunks == (chunk_pixels, chunk_pixels)
+            and all(store.attrs.get(key) == value for key, value in attrs.items())
+        )
+        if not matches:
+            raise ValueError(f"{path} holds a change map made with different arguments")
+    else:
+        store = ChunkStore.create(
+            path, grid.shape, "float32", chunks=(chunk_pixels, chunk_pixels), attrs=attrs
+        )
+
+    total = len(grid)
+    done = sum(store.has_chunk(r, c) for r, c in grid)
+    if max_workers > 1:
+        from .scheduler import parallel_change_chunks
+
+        chunks = parallel_change_chunks(
+            bbox,
+            year1,
+            year2,
+            scale=scale,
+            chunk_pixels=chunk_pixels,
+            backend=backend,
+            skip=store.has_chunk,
+            fetch_workers=max_workers,
+        )
+    else:
+        chunks = iter_change_chunks(
+            bbox,
+            year1,
+            year2,
+            scale=scale,
+            chunk_pixels=chunk_pixels,
+            backend=backend,
+            skip=store.has_chunk,
+        )
+
+    for chunk_row, chunk_col, chunk in chunks:
+        store.write_chunk(chunk_row, chunk_col, chunk.data.astype(np.float32, copy=False))
+        done += 1
+        if progress is not None:
+            progress(done, total)
+
+    return store
+
+
+def store_raster(store: ChunkStore, window: Optional[Tuple[int, int, int, int]] = None) -> Raster:
+    """
+    Read a georeferenced window of a ChunkStore as a Raster.
+
+    Args:
+        store: Store with a "bounds" attribute.
+        window: Pixel window (row0, row1, col0, col1). Defaults to the full store.
+
+    Returns:
+        The Raster covering the window.
+    """
+    height, width = store.shape[:2]
+    window = window or (0, height, 0, width)
+    west, south, east, north = store.attrs["bounds"]
+    x_size, y_size = (east - west) / width, (north - south) / height
+    row0, row1, col0, col1 = window
+    bounds = (
+        west + col0 * x_size,
+        north - row1 * y_size,
+        west + col1 * x_size,
+        north - row0 * y_size,
+    )
+    return Raster(
+        store.read(window),
+        bounds,
+        band_names=store.attrs.get("band_names"),
+    )
+
+
+def to_geotiff(store: ChunkStore, path: str) -> None:
+    """
+    Write a change-map store to a tiled GeoTIFF, one chunk at a time.
+
+    Requires ``rasterio`` (the ``local`` extra).
+
+    Args:
+        store: Output of :func:`stream_change`.
+        path: Destination GeoTIFF file.
+    """
+    import rasterio
+    from rasterio.transform import from_bounds
+    from rasterio.windows import Window
+
+    height, width = store.shape[:2]
+    rows, cols = store.chunks
+    tile = min(rows, cols) // 16 * 16 or 256
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=height,
+        width=width,
+        count=1,
+        dtype="float32",
+        crs="EPSG:4326",
+        transform=from_bounds(*store.attrs["bounds"], width, height),
+        tiled=True,
+        blockxsize=tile,
+        blockysize=tile,
+        compress="deflate",
+        nodata=float("nan"),
+    ) as dst:
+        for chunk_row, chunk_col in store.iter_chunks():
+            row0, row1, col0, col1 = store.chunk_window(chunk_row, chunk_col)
+            dst.write(
+                np.asarray(store.read_chunk(chunk_row, chunk_col), dtype=np.float32),
+                1,
+                window=Window(col0, row0, col1 - col0, row1 - row0),
+            )
@@ -0,0 +1,215 @@
+"""
+Temporal analysis over the full stack of annual AlphaEarth layers.
+
+Comparing every pair of years with ``calculate_change`` reloads both images
+for each of the 28 pairs between 2017 and 2024. Here each year is loaded
+once into a :class:`TemporalStack` and the change products are computed in
+a single streaming pass over row blocks:
+
+- similarity between consecutive years,
+- similarity of every year to a baseline year,
+- the year in which the largest change happened.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from .backends import EmbeddingBackend, get_backend
+from .compute import DEFAULT_MEMORY_BUDGET, block_rows, dot_product, iter_row_blocks
+from .quantize import quantized_dot_product
+from .raster import Raster
+from .utils import register_years, validate_year
+
+
+# Largest bounds difference between years, as a fraction of a pixel
+BOUNDS_TOLERANCE = 0.01
+
+
+class TemporalStack:
+    """
+    Embeddings of one region for several years on a shared pixel grid.
+
+    Args:
+        rasters: One 64-band Raster per year, all on the same grid (shape
+            and bounds).
+        years: Year of each raster, in increasing order.
+
+    Example:
+        >>> stack = load_year_stack((-122.45, 37.75, -122.35, 37.85))
+        >>> stack.shape
+        (8, 1113, 1113, 64)
+    """
+
+    def __init__(self, rasters: Sequence[Raster], years: Sequence[int]):
+        if len(rasters) != len(years) or len(rasters) < 2:
+            raise ValueError(
+                "A temporal stack needs one raster per year and at least two years"
+            )
+        if list(years) != sorted(years):
+            raise ValueError("Years must be in increasing order")
+        shapes = {raster.data.shape for raster in rasters}
+        if len(shapes) != 1:
+            raise ValueError(f"Rasters do not share a grid: {sorted(shapes)}")
+        # Bounds may differ by rounding, but not by a noticeable part of a pixel
+        tolerance = BOUNDS_TOLERANCE * min(rasters[0].pixel_size)
+        for year, raster in zip(years, rasters):
+            if not np.allclose(raster.bounds, rasters[0].bounds, rtol=0, atol=tolerance):
+                raise ValueError(
+                    f"Raster of {year} covers {raster.bounds}, "
+                    f"expected {rasters[0].bounds}"
+                )
+
+        self.rasters = list(rasters)
+        self.years = list(years)
+
+    def __len__(self) -> int:
+        return len(self.years)
+
+    @property
+    def bounds(self):
+        """Extent of the stack as (west, south, east, north)."""
+        return self.rasters[0].bounds
+
+    @property
+    def shape(self):
+        """Stack dimensions as (years, height, width, bands)."""
+        return (len(self.years),) + self.rasters[0].data.shape
+
+    def to_array(self) -> np.ndarray:
+        """Materialise the stack as one float32 (years, height, width, bands) array."""
+        return np.stack([raster.values() for raster in self.rasters]).astype(
+            np.float32, copy=False
+        )
+
+    def year_raster(self, year: int) -> Raster:
+        """Return the raster of one year."""
+        return self.rasters[self.years.index(year)]
+
+
+def load_year_stack(
+    bbox: Sequence[float],
+    years: Optional[Sequence[int]] = None,
+    scale: float = 10.0,
+    backend: Optional[EmbeddingBackend] = None,
+) -> TemporalStack:
+    """
+    Load the embeddings of a region for every requested year, once each.
+
+    Args:
+        bbox: Region as (west, south, east, north) in degrees.
+        years: Years to load. Defaults to every year the backend holds.
+        scale: Pixel size in metres for backends that resample. Defaults to 10.
+        backend: Backend to load from. Defaults to the backend set with
+            ``set_backend``.
+
+    Returns:
+        A TemporalStack of the region.
+    """
+    backend = backend or get_backend()
+    if years is None:
+        # Years the backend actually holds are accepted even if newer than
+        # the release-time year list
+        years = sorted(backend.available_years())
+        register_years(years)
+    years = sorted(years)
+    for year in years:
+        validate_year(year)
+
+    rasters = [backend.fetch_region(bbox, year, scale=scale) for year in years]
+    return TemporalStack(rasters, years)
+
+
+def temporal_change(
+    stack: TemporalStack,
+    baseline: Optional[int] = None,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+) -> Dict[str, Raster]:
+    """
+    Compute temporal change products in one streaming pass.
+
+    Each row block of every year is read once; all dot products for that
+    block are computed before moving on.
+
+    Args:
+        stack: The TemporalStack to analyse.
+        baseline: Year the other years are compared with. Defaults to the
+            first year of the stack.
+        memory_budget: Working-memory budget in bytes for one block of all years.
+
+    Returns:
+        Dictionary of Rasters:
+
+        - "consecutive": similarity between each pair of consecutive years,
+          one band per pair named "<year1>_<year2>".
+        - "baseline": similarity of each other year to the baseline year,
+          one band per year named "<baseline>_<year>".
+        - "min_similarity": the lowest consecutive-year similarity.
+        - "largest_change_year": the later year of the consecutive pair with
+          the lowest similarity (0 where there is no data).
+
+    Example:
+        >>> products = temporal_change(stack)
+        >>> products["largest_change_year"].data
+    """
+    years = stack.years
+    baseline = years[0] if baseline is None else baseline
+    if baseline not in years:
+        raise ValueError(f"Baseline year {baseline} is not in the stack")
+    base_index = years.index(baseline)
+    others = [i for i in range(len(years)) if i != base_index]
+
+    height, width = stack.rasters[0].shape
+    pairs = len(years) - 1
+    consecutive = np.empty((height, width, pairs), dtype=np.float32)
+    to_baseline = np.empty((height, width, len(others)), dtype=np.float32)
+
+    rows = block_rows(width, stack.shape[-1] * len(years) // 2, 4, memory_budget)
+    for row0, row1 in iter_row_blocks(height, rows):
+        blocks = [raster.read((row0, row1, 0, width)) for raster in stack.rasters]
+        for i in range(pairs):
+            consecutive[row0:row1, :, i] = _similarity(blocks[i], blocks[i + 1])
+        for k, i in enumerate(others):
+            if i == base_index + 1:
+                to_baseline[row0:row1, :, k] = consecutive[row0:row1, :, base_index]
+            elif i == base_index - 1:
+                to_baseline[row0:row1, :, k] = consecutive[row0:row1, :, i]
+            else:
+                to_baseline[row0:row1, :, k] = _similarity(blocks[base_index], blocks[i])
+
+    valid = ~np.isnan(consecutive).all(axis=-1)
+    filled = np.where(np.isnan(consecutive), np.inf, consecutive)
+    worst = filled.argmin(axis=-1)
+    pair_years = np.array(years[1:], dtype=np.int16)
+    largest_change_year = np.where(valid, pair_years[worst], 0).astype(np.int16)
+    min_similarity = np.where(valid, filled.min(axis=-1), np.nan).astype(np.float32)
+
+    bounds = stack.bounds
+    return {
+        "consecutive": Raster(
+            consecutive,
+            bounds,
+            band_names=[f"{a}_{b}" for a, b in zip(years[:-1], years[1:])],
+        ),
+        "baseline": Raster(
+            to_baseline, bounds, band_names=[f"{baseline}_{years[i]}" for i in others]
+        ),
+        "min_similarity": Raster(min_similarity, bounds, band_names=["min_similarity"]),
+        "largest_change_year": Raster(
+            largest_change_year, bounds, band_names=["largest_change_year"]
+        ),
+    }
+
+
+def _similarity(block1: Raster, block2: Raster) -> np.ndarray:
+    if block1.quantization is not None and block2.quantization is not None:
+        result = quantized_dot_product(
+            block1.data, block2.data, block1.quantization, block2.quantization
+        )
+    else:
+        result = dot_product(block1.values(), block2.values())
+    return np.clip(result, 0, 1, out=result)
+
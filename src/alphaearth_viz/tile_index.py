@@ -0,0 +1,264 @@
+"""
+Spatial index over AlphaEarth annual tile footprints.
+
+The AlphaEarth annual collection is made of many image tiles per year. This
+module keeps a local, persistable index of every tile footprint so a
+coordinate or bounding box can be resolved to the covering tile IDs without
+asking Earth Engine to scan the collection.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import json
+import math
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .utils import DEFAULT_CACHE_DIR, get_available_years, validate_year
+
+
+Bounds = Tuple[float, float, float, float]
+
+DEFAULT_TILE_INDEX_PATH = os.path.join(DEFAULT_CACHE_DIR, "tile_index.json")
+
+# Number of footprints requested from Earth Engine per getInfo() call
+_FETCH_PAGE_SIZE = 2000
+
+
+class TileIndex:
+    """
+    Grid-bucketed index of tile footprints, keyed by year.
+
+    Each footprint is stored as a (west, south, east, north) bounding box in
+    degrees. Footprints are bucketed into a regular grid of ``cell_size``
+    degrees so a lookup only tests the handful of tiles sharing a cell.
+
+    Args:
+        cell_size: Size of the bucketing grid cells in degrees. Defaults to 1.0.
+
+    Example:
+        >>> index = TileIndex.load_or_build()
+        >>> index.lookup(lon=-122.4, lat=37.8, year=2024)
+        ['...']
+    """
+
+    def __init__(self, cell_size: float = 1.0):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        self._tiles: Dict[int, List[Tuple[str, Bounds]]] = {}
+        self._grid: Dict[int, Dict[Tuple[int, int], List[int]]] = {}
+
+    @property
+    def years(self) -> List[int]:
+        """Sorted list of years present in the index."""
+        return sorted(self._tiles)
+
+    def __len__(self) -> int:
+        return sum(len(tiles) for tiles in self._tiles.values())
+
+    def add(self, year: int, tile_id: str, bounds: Sequence[float]) -> None:
+        """
+        Add a tile footprint to the index.
+
+        Args:
+            year: Year of the annual tile.
+            tile_id: Earth Engine ``system:index`` of the tile.
+            bounds: Footprint as (west, south, east, north) in degrees.
+        """
+        west, south, east, north = (float(v) for v in bounds)
+        if west > east or south > north:
+            raise ValueError(f"Invalid bounds for tile {tile_id}: {bounds}")
+
+        tiles = self._tiles.setdefault(year, [])
+        grid = self._grid.setdefault(year, {})
+        position = len(tiles)
+        tiles.append((tile_id, (west, south, east, north)))
+
+        for cell in self._cells((west, south, east, north)):
+            grid.setdefault(cell, []).append(position)
+
+    def lookup(self, lon: float, lat: float, year: int) -> List[str]:
+        """
+        Find the tiles whose footprint contains a point.
+
+        Args:
+            lon: Longitude of the point (degrees).
+            lat: Latitude of the point (degrees).
+            year: Year to search.
+
+        Returns:
+            List of covering tile IDs (empty if none cover the point).
+        """
+        return self.lookup_bbox((lon, lat, lon, lat), year)
+
+    def lookup_bbox(self, bbox: Sequence[float], year: int) -> List[str]:
+        """
+        Find the tiles whose footprint intersects a bounding box.
+
+        Args:
+            bbox: Bounding box as (west, south, east, north) in degrees.
+            year: Year to search.
+
+        Returns:
+            List of intersecting tile IDs in insertion order.
+        """
+        tiles = self._tiles.get(year)
+        if not tiles:
+            return []
+        grid = self._grid[year]
+        west, south, east, north = bbox
+
+        positions = set()
+        for cell in self._cells((west, south, east, north)):
+            positions.update(grid.get(cell, ()))
+
+        result = []
+        for position in sorted(positions):
+            tile_id, (t_west, t_south, t_east, t_north) = tiles[position]
+            if t_west <= east and west <= t_east and t_south <= north and south <= t_north:
+                result.append(tile_id)
+        return result
+
+    def tiles(self, year: int) -> List[Tuple[str, Bounds]]:
+        """List the (tile_id, bounds) pairs indexed for a year, in insertion order."""
+        return list(self._tiles.get(year, ()))
+
+    def bounds(self, tile_id: str, year: int) -> Bounds:
+        """
+        Get the footprint of a tile.
+
+        Args:
+            tile_id: Tile ID to look up.
+            year: Year of the tile.
+
+        Returns:
+            The tile footprint as (west, south, east, north).
+
+        Raises:
+            KeyError: If the tile is not in the index.
+        """
+        for candidate, bounds in self._tiles.get(year, ()):
+            if candidate == tile_id:
+                return bounds
+        raise KeyError(f"Tile {tile_id} is not indexed for {year}")
+
+    def save(self, path: str = DEFAULT_TILE_INDEX_PATH) -> None:
+        """
+        Persist the index to a JSON file.
+
+        Args:
+            path: Destination file. Parent directories are created as needed.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        payload = {
+            "version": 1,
+            "cell_size": self.cell_size,
+            "tiles": {
+                str(year): [[tile_id, *bounds] for tile_id, bounds in tiles]
+                for year, tiles in self._tiles.items()
+            },
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(payload, fh)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_TILE_INDEX_PATH) -> "TileIndex":
+        """
+        Load an index previously written with :meth:`save`.
+
+        Args:
+            path: JSON file to read.
+
+        Returns:
+            The loaded TileIndex.
+        """
+        with open(path, "r", encoding="utf-8") as fh:
+            payload = json.load(fh)
+
+        index = cls(cell_size=payload.get("cell_size", 1.0))
+        for year, tiles in payload["tiles"].items():
+            for tile_id, *bounds in tiles:
+                index.add(int(year), tile_id, bounds)
+        return index
+
+    @classmethod
+    def build(
+        cls,
+        years: Optional[Iterable[int]] = None,
+        cell_size: float = 1.0,
+    ) -> "TileIndex":
+        """
+        Build an index from the tile footprints published in Earth Engine.
+
+        This issues a few paged ``getInfo`` requests per year and should be
+        done once; use :meth:`save` or :meth:`load_or_build` to keep the result.
+
+        Args:
+            years: Years to index. Defaults to all available years.
+            cell_size: Size of the bucketing grid cells in degrees.
+
+        Returns:
+            A populated TileIndex.
+        """
+        import ee
+
+        from .utils import get_dataset
+
+        index = cls(cell_size=cell_size)
+        for year in years if years is not None else get_available_years():
+            validate_year(year)
+            collection = get_dataset().filter(ee.Filter.eq("year", year))
+            footprints = collection.map(
+                lambda image: ee.Feature(
+                    image.geometry().bounds(),
+                    {"tile_id": image.get("system:index")},
+                )
+            )
+
+            count = collection.size().getInfo()
+            for offset in range(0, count, _FETCH_PAGE_SIZE):
+                page = footprints.toList(_FETCH_PAGE_SIZE, offset).getInfo()
+                for feature in page:
+                    ring = feature["geometry"]["coordinates"][0]
+                    lons = [point[0] for point in ring]
+                    lats = [point[1] for point in ring]
+                    index.add(
+                        year,
+                        feature["properties"]["tile_id"],
+                        (min(lons), min(lats), max(lons), max(lats)),
+                    )
+        return index
+
+    @classmethod
+    def load_or_build(
+        cls,
+        path: str = DEFAULT_TILE_INDEX_PATH,
+        years: Optional[Iterable[int]] = None,
+    ) -> "TileIndex":
+        """
+        Load the persisted index, building and saving it on first use.
+
+        Args:
+            path: JSON file holding the persisted index.
+            years: Years to index when building. Defaults to all available years.
+
+        Returns:
+            The loaded or freshly built TileIndex.
+        """
+        if os.path.exists(path):
+            return cls.load(path)
+        index = cls.build(years=years)
+        index.save(path)
+        return index
+
+    def _cells(self, bounds: Bounds) -> Iterable[Tuple[int, int]]:
+        west, south, east, north = bounds
+        size = self.cell_size
+        for i in range(math.floor(west / size), math.floor(east / size) + 1):
+            for j in range(math.floor(south / size), math.floor(north / size) + 1):
+                yield (i, j)
@@ -0,0 +1,662 @@
+"""
+Local XYZ map tiles rendered from cached AlphaEarth embeddings.
+
+``add_ee_layer`` hands every layer to Earth Engine, which renders each
+tile remotely on every pan and zoom. :class:`TileRenderer` renders band
+composites and change layers into 256x256 Web Mercator PNG (or WebP)
+tiles from any backend, keeping the encoded tiles in an in-memory LRU
+and an on-disk cache. :class:`TileServer` serves them over HTTP so a
+leafmap ``Map`` can show them with ``add_tile_layer``, and
+:func:`seed_case_studies` pre-renders the viewer's case-study locations.
+
+The AlphaEarth Foundations Satellite Embedding dataset is produced by
+Google and Google DeepMind.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .backends import EmbeddingBackend, LocalBackend, NoDataError, backend_for, get_backend
+from .raster import Raster
+from .render import render
+from .instrumentation import cache_lookup, traced
+from .utils import (
+    DEFAULT_CACHE_DIR,
+    format_band_names,
+    get_similarity_vis,
+    get_vis_params,
+    validate_year,
+)
+
+
+DEFAULT_RENDERED_TILE_DIR = os.path.join(DEFAULT_CACHE_DIR, "rendered_tiles")
+
+TILE_SIZE = 256
+
+# Web Mercator latitude limit
+MAX_LATITUDE = 85.0511287798
+
+# Metres per pixel at zoom 0 on the equator
+_EQUATOR_RESOLUTION = 156543.03392804097
+
+# Case-study database of the web viewer, relative to a source checkout
+DEFAULT_CASE_STUDIES_PATH = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, "js", "case-studies.js"
+)
+
+_CONTENT_TYPES = {"png": "image/png", "webp": "image/webp"}
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """
+    Geographic bounds of an XYZ tile.
+
+    Args:
+        z: Zoom level.
+        x: Tile column.
+        y: Tile row, counted from the north.
+
+    Returns:
+        Bounds as (west, south, east, north) in degrees.
+    """
+    n = 2**z
+    return (
+        x / n * 360.0 - 180.0,
+        _tile_latitude(y + 1, n),
+        (x + 1) / n * 360.0 - 180.0,
+        _tile_latitude(y, n),
+    )
+
+
+def lonlat_to_tile(lon: float, lat: float, z: int) -> Tuple[int, int]:
+    """Return the (x, y) of the tile containing a location at a zoom level."""
+    n = 2**z
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_for_bbox(bbox: Sequence[float], z: int) -> Iterator[Tuple[int, int, int]]:
+    """
+    Yield the (z, x, y) tiles covering a bounding box.
+
+    Args:
+        bbox: Bounding box as (west, south, east, north) in degrees.
+        z: Zoom level.
+
+    Yields:
+        Tile coordinates, row by row.
+    """
+    west, south, east, north = bbox
+    x0, y0 = lonlat_to_tile(west, north, z)
+    x1, y1 = lonlat_to_tile(east, south, z)
+    for y in range(y0, y1 + 1):
+        for x in range(x0, x1 + 1):
+            yield z, x, y
+
+
+def encode_png(rgba: np.ndarray, level: int = 6) -> bytes:
+    """
+    Encode an RGBA image as PNG using only zlib.
+
+    Rows use the PNG "up" filter, which compresses the smooth fields of
+    embedding composites well.
+
+    Args:
+        rgba: Array of shape (height, width, 4) with dtype uint8.
+        level: zlib compression level. Defaults to 6.
+
+    Returns:
+        The PNG file contents.
+    """
+    height, width = rgba.shape[:2]
+    rows = rgba.reshape(height, width * 4)
+    filtered = np.empty((height, width * 4 + 1), dtype=np.uint8)
+    filtered[:, 0] = 2
+    filtered[0, 1:] = rows[0]
+    filtered[1:, 1:] = rows[1:] - rows[:-1]
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        crc = zlib.crc32(tag + data) & 0xFFFFFFFF
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", crc)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(filtered.tobytes(), level))
+        + chunk(b"IEND", b"")
+    )
+
+
+def encode_webp(rgba: np.ndarray, quality: int = 80) -> bytes:
+    """
+    Encode an RGBA image as WebP.
+
+    Requires ``Pillow`` (the ``webp`` extra).
+
+    Args:
+        rgba: Array of shape (height, width, 4) with dtype uint8.
+        quality: WebP quality from 0 to 100. Defaults to 80.
+
+    Returns:
+        The WebP file contents.
+    """
+    import io
+
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(rgba, "RGBA").save(buffer, format="WEBP", quality=quality)
+    return buffer.getvalue()
+
+
+def composite_layer(
+    year: int,
+    band_combo: Optional[List[int]] = None,
+    vis_params: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Describe an RGB band composite layer, as shown by ``explore_bands``.
+
+    Args:
+        year: Year of the embeddings (2017-2024).
+        band_combo: Three band numbers (1-64). Defaults to [1, 16, 9].
+        vis_params: Visualization parameters. Defaults to
+            ``get_vis_params`` for the bands.
+
+    Returns:
+        Layer description for :class:`TileRenderer`.
+    """
+    validate_year(year)
+    bands = format_band_names(band_combo or [1, 16, 9])
+    return {
+        "kind": "composite",
+        "year": year,
+        "vis_params": vis_params or get_vis_params(bands),
+    }
+
+
+def change_layer(
+    year1: int,
+    year2: int,
+    vis_params: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Describe a change-detection similarity layer, as shown by ``compare_years``.
+
+    Args:
+        year1: First year for comparison.
+        year2: Second year for comparison.
+        vis_params: Visualization parameters. Defaults to ``get_similarity_vis()``.
+
+    Returns:
+        Layer description for :class:`TileRenderer`.
+    """
+    validate_year(year1)
+    validate_year(year2)
+    return {
+        "kind": "change",
+        "year1": year1,
+        "year2": year2,
+        "vis_params": vis_params or get_similarity_vis(),
+    }
+
+
+def layer_key(layer: Dict[str, Any]) -> str:
+    """Stable short identifier of a layer description, used in cache paths."""
+    return _digest(json.dumps(layer, sort_keys=True, default=str))
+
+
+class TileRenderer:
+    """
+    Render and cache XYZ tiles of AlphaEarth layers.
+
+    Tiles are looked up in an in-memory LRU, then on disk, and rendered
+    only when missing from both. Cache keys include the backend's
+    ``data_version`` of the tile, so tiles are re-rendered after the
+    backend or the embeddings under them change. Tiles without data are
+    rendered fully transparent and kept in memory only, so they are
+    rendered again once data arrives.
+
+    Args:
+        backend: Backend to read embeddings from. Defaults to the backend
+            set with ``set_backend``.
+        cache_dir: Directory of the on-disk tile cache, or None to keep
+            tiles in memory only. Defaults to ``rendered_tiles`` in the
+            package cache directory.
+        memory_tiles: Number of encoded tiles kept in memory. Defaults to 1024.
+        image_format: "png" or "webp" (which requires Pillow). Defaults to "png".
+
+    Example:
+        >>> renderer = TileRenderer(LocalBackend("~/alphaearth_cache"))
+        >>> png = renderer.get_tile(change_layer(2017, 2024), 12, 655, 1583)
+    """
+
+    def __init__(
+        self,
+        backend: Optional[EmbeddingBackend] = None,
+        cache_dir: Optional[str] = DEFAULT_RENDERED_TILE_DIR,
+        memory_tiles: int = 1024,
+        image_format: str = "png",
+    ):
+        if image_format not in _CONTENT_TYPES:
+            raise ValueError(f"image_format must be one of {sorted(_CONTENT_TYPES)}")
+        self._backend = backend
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir is not None else None
+        self.memory_tiles = memory_tiles
+        self.image_format = image_format
+        self._memory: "OrderedDict[Tuple[str, str, int, int, int], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "rendered": 0}
+
+    @property
+    def backend(self) -> EmbeddingBackend:
+        """Backend the tiles are rendered from."""
+        return self._backend or get_backend()
+
+    @property
+    def content_type(self) -> str:
+        """MIME type of the encoded tiles."""
+        return _CONTENT_TYPES[self.image_format]
+
+    def get_tile(self, layer: Dict[str, Any], z: int, x: int, y: int) -> bytes:
+        """
+        Return an encoded tile, rendering it if it is not cached.
+
+        Args:
+            layer: Layer description from :func:`composite_layer` or
+                :func:`change_layer`.
+            z: Zoom level.
+            x: Tile column.
+            y: Tile row.
+
+        Returns:
+            The encoded image.
+        """
+        version = self.backend.data_version(tile_bounds(z, x, y), _layer_years(layer))
+        key = (layer_key(layer), _digest(version), z, x, y)
+        with self._lock:
+            tile = self._memory.get(key)
+            if tile is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                cache_lookup("rendered_tiles", True)
+                return tile
+
+        path = self._tile_path(key)
+        if path is not None and os.path.exists(path):
+            with open(path, "rb") as fh:
+                tile = fh.read()
+            with self._lock:
+                self.stats["disk_hits"] += 1
+            cache_lookup("rendered_tiles", True)
+        else:
+            try:
+                tile = self._encode(self._render(layer, z, x, y))
+            except NoDataError:
+                tile = self._encode(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+                path = None
+            if path is not None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as fh:
+                    fh.write(tile)
+                os.replace(tmp_path, path)
+            with self._lock:
+                self.stats["rendered"] += 1
+            cache_lookup("rendered_tiles", False)
+
+        with self._lock:
+            self._memory[key] = tile
+            while len(self._memory) > self.memory_tiles:
+                self._memory.popitem(last=False)
+        return tile
+
+    def render_tile(self, layer: Dict[str, Any], z: int, x: int, y: int) -> np.ndarray:
+        """
+        Render a tile to an RGBA array without caching.
+
+        Args:
+            layer: Layer description.
+            z: Zoom level.
+            x: Tile column.
+            y: Tile row.
+
+        Returns:
+            Array of shape (256, 256, 4) with dtype uint8, fully transparent
+            where the backend has no data.
+        """
+        try:
+            return self._render(layer, z, x, y)
+        except NoDataError:
+            return np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+
+    @traced("tiles.render_tile")
+    def _render(self, layer: Dict[str, Any], z: int, x: int, y: int) -> np.ndarray:
+        # Render a tile, raising NoDataError when nothing covers it
+        bounds = tile_bounds(z, x, y)
+        lons, lats = _pixel_centers(z, x, y)
+        scale = max(10.0, _EQUATOR_RESOLUTION * math.cos(math.radians(lats.mean())) / 2**z)
+        vis_params = layer["vis_params"]
+
+        if layer["kind"] == "composite":
+            bands = vis_params.get("bands")
+            image = self._fetch(bounds, lons, lats, layer["year"], scale, bands)
+            if bands:
+                image = image.select(bands)
+        elif layer["kind"] == "change":
+            image1, image2 = (
+                self._fetch(bounds, lons, lats, year, scale)
+                for year in (layer["year1"], layer["year2"])
+            )
+            image = backend_for(image1).calculate_change(image1, image2)
+        else:
+            raise ValueError(f"Unknown layer kind: {layer['kind']}")
+        return render(image, vis_params)
+
+    def seed(
+        self,
+        layer: Dict[str, Any],
+        bbox: Sequence[float],
+        zooms: Sequence[int],
+        max_workers: int = 4,
+    ) -> int:
+        """
+        Render every tile of a layer covering a region at some zoom levels.
+
+        Args:
+            layer: Layer description.
+            bbox: Region as (west, south, east, north) in degrees.
+            zooms: Zoom levels to render.
+            max_workers: Number of rendering threads. Defaults to 4.
+
+        Returns:
+            Number of tiles seeded.
+        """
+        tiles = [tile for z in zooms for tile in tiles_for_bbox(bbox, z)]
+        with ThreadPoolExecutor(max_workers, thread_name_prefix="alphaearth-seed") as pool:
+            list(pool.map(lambda tile: self.get_tile(layer, *tile), tiles))
+        return len(tiles)
+
+    def clear(self) -> None:
+        """Drop the in-memory tiles. The on-disk cache is left in place."""
+        with self._lock:
+            self._memory.clear()
+
+    def _fetch(
+        self,
+        bounds: Sequence[float],
+        lons: np.ndarray,
+        lats: np.ndarray,
+        year: int,
+        scale: float,
+        bands: Optional[List[str]] = None,
+    ) -> Raster:
+        # Embeddings at the tile's pixel centres. Local tiles are sampled
+        # chunk by chunk, copying only the 256x256 pixels needed however
+        # large the native-resolution area under a low-zoom tile is
+        backend = self.backend
+        if isinstance(backend, LocalBackend):
+            return backend.sample_grid(bounds, lons, lats, year)
+        raster = backend.fetch_region(bounds, year, scale=scale, bands=bands)
+        return _sample(raster, lons, lats, bounds)
+
+    def _encode(self, rgba: np.ndarray) -> bytes:
+        if self.image_format == "webp":
+            return encode_webp(rgba)
+        return encode_png(rgba)
+
+    def _tile_path(self, key: Tuple[str, str, int, int, int]) -> Optional[str]:
+        if self.cache_dir is None:
+            return None
+        name, version, z, x, y = key
+        return os.path.join(
+            self.cache_dir, name, str(z), str(x), f"{y}.{version}.{self.image_format}"
+        )
+
+
+class TileServer:
+    """
+    Minimal HTTP server for rendered tiles.
+
+    Tiles are served at ``/<layer name>/<z>/<x>/<y>.<format>`` from a
+    background thread.
+
+    Args:
+        renderer: Renderer producing the tiles.
+        layers: Dict of layer name to layer description.
+        host: Interface to listen on. Defaults to "127.0.0.1".
+        port: Port to listen on. Defaults to 0 (any free port).
+
+    Example:
+        >>> server = TileServer(renderer, {"change": change_layer(2017, 2024)}).start()
+        >>> m.add_tile_layer(server.url("change"), name="Change 2017-2024")
+    """
+
+    def __init__(
+        self,
+        renderer: TileRenderer,
+        layers: Optional[Dict[str, Dict[str, Any]]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.renderer = renderer
+        self.layers: Dict[str, Dict[str, Any]] = dict(layers or {})
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "TileServer":
+        """Start serving in a daemon thread."""
+        if self._server is not None:
+            return self
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                match = re.fullmatch(r"/([^/]+)/(\d+)/(\d+)/(\d+)\.\w+", self.path.split("?")[0])
+                layer = server.layers.get(match.group(1)) if match else None
+                if layer is None:
+                    self.send_error(404)
+                    return
+                z, x, y = (int(v) for v in match.groups()[1:])
+                body = server.renderer.get_tile(layer, z, x, y)
+                self.send_response(200)
+                self.send_header("Content-Type", server.renderer.content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="alphaearth-tiles", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def url(self, name: str) -> str:
+        """XYZ URL template of a layer."""
+        ext = self.renderer.image_format
+        return f"http://{self.host}:{self.port}/{name}/{{z}}/{{x}}/{{y}}.{ext}"
+
+    def add_to_map(self, map_object: Any, layer: Dict[str, Any], name: str) -> None:
+        """
+        Register a layer and add it to a leafmap Map as a tile layer.
+
+        Args:
+            map_object: leafmap Map to add the layer to.
+            layer: Layer description.
+            name: Layer name shown in the map's layer control.
+        """
+        key = layer_key(layer)
+        self.layers[key] = layer
+        self.start()
+        map_object.add_tile_layer(
+            self.url(key), name=name, attribution="Google/DeepMind AlphaEarth"
+        )
+
+
+def load_case_studies(path: str = DEFAULT_CASE_STUDIES_PATH) -> List[Dict[str, Any]]:
+    """
+    Read the case-study scenarios of the web viewer.
+
+    The viewer numbers bands from A00; band names are converted to the
+    package's 1-based numbering (A00 becomes band 1).
+
+    Args:
+        path: Path of ``js/case-studies.js``. Defaults to the copy in a
+            source checkout.
+
+    Returns:
+        List of dicts with "id", "name", "lat", "lon", "zoom", "year1",
+        "year2", "band_combo" and "mode".
+    """
+    with open(path, encoding="utf-8") as fh:
+        source = fh.read()
+
+    pattern = re.compile(
+        r"\{\s*id:\s*(\d+),\s*name:\s*'((?:[^'\\]|\\.)*)',\s*lat:\s*(-?[\d.]+),"
+        r"\s*lon:\s*(-?[\d.]+),\s*zoom:\s*(\d+),\s*year1:\s*(\d+),\s*year2:\s*(\d+),"
+        r".*?bands:\s*\[([^\]]*)\],\s*mode:\s*'(\w+)'"
+    )
+    scenarios = []
+    for match in pattern.finditer(source):
+        bands = re.findall(r"A(\d+)", match.group(8))
+        scenarios.append({
+            "id": int(match.group(1)),
+            "name": match.group(2).replace("\\'", "'"),
+            "lat": float(match.group(3)),
+            "lon": float(match.group(4)),
+            "zoom": int(match.group(5)),
+            "year1": int(match.group(6)),
+            "year2": int(match.group(7)),
+            "band_combo": [int(band) + 1 for band in bands],
+            "mode": match.group(9),
+        })
+    return scenarios
+
+
+def case_study_layer(scenario: Dict[str, Any]) -> Dict[str, Any]:
+    """Layer description matching how the viewer shows a case study."""
+    if scenario["mode"] == "change" and scenario["year1"] != scenario["year2"]:
+        return change_layer(scenario["year1"], scenario["year2"])
+    return composite_layer(scenario["year1"], scenario["band_combo"])
+
+
+def seed_case_studies(
+    renderer: TileRenderer,
+    ids: Optional[Sequence[int]] = None,
+    radius: int = 1,
+    extra_zooms: int = 0,
+    path: str = DEFAULT_CASE_STUDIES_PATH,
+    max_workers: int = 4,
+) -> int:
+    """
+    Pre-render tiles around the case-study locations of the web viewer.
+
+    For each scenario, the tiles within ``radius`` tiles of its centre are
+    rendered at its initial zoom level (and ``extra_zooms`` levels
+    beyond), with the layer the viewer shows for it.
+
+    Args:
+        renderer: Renderer whose caches to fill.
+        ids: Scenario IDs to seed. Defaults to all scenarios.
+        radius: Tiles around the centre tile in each direction. Defaults to 1.
+        extra_zooms: Further zoom levels to seed. Defaults to 0.
+        path: Path of ``js/case-studies.js``.
+        max_workers: Number of rendering threads. Defaults to 4.
+
+    Returns:
+        Number of tiles seeded.
+
+    Example:
+        >>> seed_case_studies(TileRenderer(LocalBackend("~/alphaearth_cache")), ids=range(1, 21))
+    """
+    wanted = set(ids) if ids is not None else None
+    jobs = []
+    for scenario in load_case_studies(path):
+        if wanted is not None and scenario["id"] not in wanted:
+            continue
+        layer = case_study_layer(scenario)
+        for z in range(scenario["zoom"], scenario["zoom"] + extra_zooms + 1):
+            x, y = lonlat_to_tile(scenario["lon"], scenario["lat"], z)
+            n = 2**z
+            for ty in range(max(0, y - radius), min(n, y + radius + 1)):
+                for tx in range(x - radius, x + radius + 1):
+                    jobs.append((layer, z, tx % n, ty))
+
+    with ThreadPoolExecutor(max_workers, thread_name_prefix="alphaearth-seed") as pool:
+        list(pool.map(lambda job: renderer.get_tile(*job), jobs))
+    return len(jobs)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _layer_years(layer: Dict[str, Any]) -> List[int]:
+    if layer["kind"] == "change":
+        return [layer["year1"], layer["year2"]]
+    return [layer["year"]]
+
+
+def _tile_latitude(y: float, n: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+
+
+def _pixel_centers(z: int, x: int, y: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Longitudes are linear across a tile; latitudes follow the Mercator curve
+    n = 2**z
+    offsets = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    lons = (x + offsets) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+    return lons, lats
+
+
+def _sample(
+    raster: Raster,
+    lons: np.ndarray,
+    lats: np.ndarray,
+    bounds: Sequence[float],
+) -> Raster:
+    # Nearest-neighbour lookup of the tile's pixel centres, NaN outside the data
+    west, south, east, north = raster.bounds
+    x_size, y_size = raster.pixel_size
+    height, width = raster.shape
+    cols = np.floor((lons - west) / x_size).astype(np.int64)
+    rows = np.floor((north - lats) / y_size).astype(np.int64)
+    col_ok = (cols >= 0) & (cols < width)
+    row_ok = (rows >= 0) & (rows < height)
+
+    data = raster.data[np.clip(rows, 0, height - 1)[:, np.newaxis], np.clip(cols, 0, width - 1)]
+    values = raster.quantization.dequantize(data) if raster.quantization is not None else data
+    values = np.array(values, dtype=np.float32)
+    values[~(row_ok[:, np.newaxis] & col_ok)] = np.nan
+    return Raster(values, bounds, band_names=raster.band_names, year=raster.year)
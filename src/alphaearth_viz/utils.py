@@ -8,17 +8,34 @@ The AlphaEarth Foundations Satellite Embedding dataset is produced by
 Google and Google DeepMind.
 """
 
-from typing import Dict, List, Any
+import os
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
 
-import ee
+from .instrumentation import traced
 
+if TYPE_CHECKING:
+    import ee
 
-# AlphaEarth dataset constants
+
+# AlphaEarth dataset constants. The year range is the range published when
+# this package was released; register_years extends it as new years appear.
 ALPHAEARTH_DATASET_ID = "GOOGLE/SATELLITE_EMBEDDING/V1/ANNUAL"
 MIN_YEAR = 2017
 MAX_YEAR = 2024
 NUM_BANDS = 64
 
+# Similarity below which a pixel is counted as changed (as in the web viewer)
+DEFAULT_CHANGE_THRESHOLD = 0.7
+
+# Directory for locally persisted indexes and caches
+DEFAULT_CACHE_DIR = os.environ.get(
+    "ALPHAEARTH_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "alphaearth_viz"),
+)
+
+# Collection handle returned by get_dataset, created on first use
+_dataset: Optional["ee.ImageCollection"] = None
+
 
 def format_band_names(band_numbers: List[int]) -> List[str]:
     """
@@ -49,6 +66,8 @@ def get_vis_params(
     bands: List[str],
     min_val: float = -0.3,
     max_val: float = 0.3,
+    stats: Optional[Any] = None,
+    percentiles: Tuple[float, float] = (2, 98),
 ) -> Dict[str, Any]:
     """
     Get visualization parameters for AlphaEarth embeddings.
@@ -57,6 +76,12 @@ def get_vis_params(
         bands: List of band names (e.g., ["A01", "A16", "A09"]).
         min_val: Minimum value for visualization. Defaults to -0.3.
         max_val: Maximum value for visualization. Defaults to 0.3.
+        stats: Optional precomputed BandStatistics (see
+            :class:`alphaearth_viz.stats.StatsCatalog`). When given, the
+            range is stretched to the given percentiles of the bands
+            instead of ``min_val`` and ``max_val``.
+        percentiles: Lower and upper percentiles of the auto-stretch.
+            Defaults to (2, 98).
 
     Returns:
         Dictionary of visualization parameters for Earth Engine.
@@ -65,6 +90,9 @@ def get_vis_params(
         >>> get_vis_params(["A01", "A16", "A09"])
         {'bands': ['A01', 'A16', 'A09'], 'min': -0.3, 'max': 0.3}
     """
+    if stats is not None:
+        min_val, max_val = stats.stretch(bands, percentiles)
+
     return {
         "bands": bands,
         "min": min_val,
@@ -123,10 +151,14 @@ def validate_year(year: int) -> None:
         )
 
 
-def get_dataset() -> ee.ImageCollection:
+@traced("utils.get_dataset")
+def get_dataset() -> "ee.ImageCollection":
     """
     Get the AlphaEarth ImageCollection from Earth Engine.
 
+    The collection handle is created once and reused; Earth Engine
+    expressions are immutable, so callers can filter it freely.
+
     Returns:
         The AlphaEarth annual satellite embedding ImageCollection.
 
@@ -134,7 +166,12 @@ def get_dataset() -> ee.ImageCollection:
         >>> dataset = get_dataset()
         >>> print(dataset.size().getInfo())  # Number of images in collection
     """
-    return ee.ImageCollection(ALPHAEARTH_DATASET_ID)
+    global _dataset
+    if _dataset is None:
+        import ee
+
+        _dataset = ee.ImageCollection(ALPHAEARTH_DATASET_ID)
+    return _dataset
 
 
 def get_all_band_names() -> List[str]:
@@ -164,3 +201,25 @@ def get_available_years() -> List[int]:
         [2017, 2018, 2019, 2020, 2021, 2022, 2023, 2024]
     """
     return list(range(MIN_YEAR, MAX_YEAR + 1))
+
+
+def register_years(years: Iterable[int]) -> None:
+    """
+    Extend the valid year range to include newly published years.
+
+    Used when years are discovered from a backend, e.g. by
+    ``discover_years``, so that :func:`validate_year` and
+    :func:`get_available_years` accept a year added after this release.
+
+    Args:
+        years: Years known to be available.
+
+    Example:
+        >>> register_years([2025])
+        >>> validate_year(2025)  # No error
+    """
+    global MIN_YEAR, MAX_YEAR
+    years = [int(year) for year in years]
+    if years:
+        MIN_YEAR = min(MIN_YEAR, min(years))
+        MAX_YEAR = max(MAX_YEAR, max(years))